@@ -15,16 +15,28 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import fcntl
+import fnmatch
+import glob
+import hashlib
 import os
-import shlex
 import shutil
 import subprocess
-from typing import Optional
+import tempfile
+import threading
+from typing import Dict, List, Optional
 
+from bottles.backend.globals import Paths
 from bottles.backend.logger import Logger
+from bottles.backend.utils import json
+from bottles.backend.utils.command import Command
+from bottles.backend.utils.file import FileUtils
 
 logging = Logger()
 
+_FICLONE = 0x40049409
+_MEMBERS = ".members.json"
+
 
 class CabExtract:
     """
@@ -32,6 +44,9 @@ class CabExtract:
     It takes the cabinet file path and the destination name as input. Then it
     extracts the file in a new directory with the input name under the Bottles'
     temp directory.
+    Extracted members are kept in a store keyed by the checksum of the
+    cabinet, later extractions of the same cabinet copy them from there.
+    The least recently used stores are evicted past the quota.
     """
 
     requirements: bool = False
@@ -40,6 +55,13 @@ class CabExtract:
     files: list
     destination: str
 
+    # bytes, 0 disables the eviction
+    quota = 1024 * 1024 * 1024
+
+    # (path, size, mtime) -> sha256 of the cabinet
+    _digests: Dict[tuple, str] = {}
+    _lock = threading.Lock()
+
     def __init__(self):
         self.cabextract_bin = shutil.which("cabextract")
 
@@ -56,7 +78,7 @@ class CabExtract:
         self.path = path
         self.name = name
         self.files = files
-        self.destination = shlex.quote(destination)
+        self.destination = destination
         self.name = self.name.replace(".", "_")
 
         if not self.__checks():
@@ -70,46 +92,41 @@ class CabExtract:
 
         return True
 
+    def __get_cabinets(self) -> list:
+        # the path may be a pattern, expanded like the shell does
+        if "*" in self.path:
+            return sorted(glob.glob(self.path)) or [self.path]
+        return [self.path]
+
     def __extract(self) -> bool:
         if not os.path.exists(self.destination):
             os.makedirs(self.destination)
 
         try:
-            if len(self.files) > 0:
-                for file in self.files:
-                    """
-                    if file already exists as a symlink, remove it
-                    preventing broken symlinks
-                    """
-                    if os.path.exists(os.path.join(self.destination, file)):
-                        if os.path.islink(os.path.join(self.destination, file)):
-                            os.unlink(os.path.join(self.destination, file))
-
-                    command = [
-                        self.cabextract_bin,
-                        f"-F '*{file}*'",
-                        f"-d {self.destination}",
-                        f"-q {self.path}",
-                    ]
-                    command = " ".join(command)
-                    subprocess.Popen(command, shell=True).communicate()
-
-                    if len(file.split("/")) > 1:
-                        _file = file.split("/")[-1]
-                        _dir = file.replace(_file, "")
-                        if not os.path.exists(f"{self.destination}/{_file}"):
-                            shutil.move(
-                                f"{self.destination}/{_dir}/{_file}",
-                                f"{self.destination}/{_file}",
-                            )
-            else:
-                command_list = [
-                    self.cabextract_bin,
-                    f"-d {self.destination}",
-                    f"-q {self.path}",
-                ]
-                command = " ".join(command_list)
-                subprocess.Popen(command, shell=True).communicate()
+            for file in self.files:
+                """
+                if file already exists as a symlink, remove it
+                preventing broken symlinks
+                """
+                if os.path.exists(os.path.join(self.destination, file)):
+                    if os.path.islink(os.path.join(self.destination, file)):
+                        os.unlink(os.path.join(self.destination, file))
+
+            # all the files are extracted in a single pass over each cabinet
+            filters = [f"*{file}*" for file in self.files]
+            for cabinet in self.__get_cabinets():
+                if not self.__extract_cabinet(cabinet, filters):
+                    return False
+
+            for file in self.files:
+                if len(file.split("/")) > 1:
+                    _file = file.split("/")[-1]
+                    _dir = file.replace(_file, "")
+                    if not os.path.exists(f"{self.destination}/{_file}"):
+                        shutil.move(
+                            f"{self.destination}/{_dir}/{_file}",
+                            f"{self.destination}/{_file}",
+                        )
 
             logging.info(f"Cabinet {self.name} extracted successfully")
             return True
@@ -117,3 +134,184 @@ class CabExtract:
             logging.error(f"Error while extracting cab file {self.path}:\n{exception}")
 
         return False
+
+    def __extract_cabinet(self, cabinet: str, filters: List[str]) -> bool:
+        store = self.get_store(cabinet)
+        members = self.__get_members(cabinet, store) if store else None
+        if members is None:
+            return self.__cabextract(cabinet, filters, self.destination) is not None
+
+        # cabextract matches brackets literally, fnmatch as a character class
+        patterns = [f.lower().replace("[", "[[]") for f in filters]
+        wanted = [
+            m
+            for m in members
+            if not patterns or any(fnmatch.fnmatch(m.lower(), p) for p in patterns)
+        ]
+        missing = [m for m in wanted if not os.path.isfile(os.path.join(store, m))]
+
+        if missing:
+            os.makedirs(Paths.cab_cache, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=".staging-", dir=Paths.cab_cache)
+            try:
+                extracted = self.__cabextract(cabinet, filters, staging)
+                if extracted is None:
+                    return False
+                if not extracted:
+                    # don't keep members of a damaged cabinet in the store
+                    logging.warning(f"cabextract reported errors for {cabinet}")
+                    shutil.copytree(staging, self.destination, dirs_exist_ok=True)
+                    return True
+                for member in missing:
+                    src = os.path.join(staging, member)
+                    if os.path.isfile(src):
+                        dst = os.path.join(store, member)
+                        os.makedirs(os.path.dirname(dst), exist_ok=True)
+                        os.replace(src, dst)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            self.evict(keep=store)
+
+        for member in wanted:
+            src = os.path.join(store, member)
+            if not os.path.isfile(src):
+                logging.warning(f"{member} could not be extracted from {cabinet}")
+                continue
+            dst = os.path.join(self.destination, member)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            self.__clone(src, dst)
+
+        # the mtime of the member list records when the store was last used
+        try:
+            os.utime(os.path.join(store, _MEMBERS))
+        except OSError:
+            pass
+        return True
+
+    def __cabextract(
+        self, cabinet: str, filters: List[str], destination: str
+    ) -> Optional[bool]:
+        """
+        Extract the members matching any of the filters in one pass,
+        return whether cabextract succeeded or None if it is missing.
+        """
+        if not self.cabextract_bin:
+            logging.error("cabextract is not installed")
+            return None
+
+        command = Command(self.cabextract_bin)
+        for _filter in filters:
+            command.add("-F", _filter)
+        command.add("-d", destination, "-q", cabinet)
+        proc = subprocess.Popen(command.argv)
+        proc.communicate()
+        return proc.returncode == 0
+
+    @classmethod
+    def get_store(cls, cabinet: str) -> Optional[str]:
+        """Return the store of the members of the cabinet."""
+        try:
+            st = os.stat(cabinet)
+        except OSError:
+            return None
+
+        key = (os.path.abspath(cabinet), st.st_size, st.st_mtime_ns)
+        with cls._lock:
+            digest = cls._digests.get(key)
+        if digest is None:
+            checksum = hashlib.sha256()
+            with open(cabinet, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    checksum.update(chunk)
+            digest = checksum.hexdigest()
+            with cls._lock:
+                cls._digests[key] = digest
+        return os.path.join(Paths.cab_cache, digest)
+
+    def __get_members(self, cabinet: str, store: str) -> Optional[List[str]]:
+        """Return the members of the cabinet, listed once per store."""
+        index = os.path.join(store, _MEMBERS)
+        try:
+            with open(index) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+        if not self.cabextract_bin:
+            return None
+        proc = subprocess.run(
+            [self.cabextract_bin, "-l", cabinet], capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            return None
+
+        members = []
+        for line in proc.stdout.splitlines():
+            parts = [p.strip() for p in line.split(" | ")]
+            if len(parts) != 3 or not parts[0].isdigit():
+                continue
+            name = parts[2].replace("\\", "/")
+            if os.path.isabs(name) or ".." in name.split("/"):
+                continue
+            members.append(name)
+
+        os.makedirs(store, exist_ok=True)
+        tmp = f"{index}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(members, f)
+        os.replace(tmp, index)
+        return members
+
+    @classmethod
+    def evict(cls, quota: Optional[int] = None, keep: str = "") -> int:
+        """
+        Delete the least recently used stores until the cache fits in
+        the quota, return the number of bytes freed.
+        """
+        quota = cls.quota if quota is None else quota
+        if quota <= 0:
+            return 0
+
+        stores = []
+        try:
+            entries = list(os.scandir(Paths.cab_cache))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            # staging directories belong to running extractions
+            if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                continue
+            try:
+                used = os.stat(os.path.join(entry.path, _MEMBERS)).st_mtime
+            except OSError:
+                used = 0
+            size = FileUtils().get_path_size(entry.path, human=False)
+            stores.append((used, size, entry.path))
+        total = sum(size for _used, size, _store in stores)
+        if total <= quota:
+            return 0
+
+        freed = 0
+        for _used, size, store in sorted(stores):
+            if total - freed <= quota:
+                break
+            if store == keep:
+                continue
+            shutil.rmtree(store, ignore_errors=True)
+            freed += size
+
+        logging.info(f"Evicted {FileUtils.get_human_size(freed)} of cabinet members")
+        return freed
+
+    @staticmethod
+    def __clone(src: str, dst: str):
+        """Copy the file, sharing its extents when the filesystem can."""
+        if os.path.lexists(dst):
+            os.remove(dst)
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                return
+            except OSError:
+                pass
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
@@ -15,10 +15,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import hashlib
 import os
 import shutil
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from contextlib import suppress
 from threading import Event
 from typing import Optional
@@ -27,8 +30,11 @@ import requests
 
 from bottles.backend.logger import Logger
 from bottles.backend.models.result import Result
-from bottles.backend.state import Status, TaskStreamUpdateHandler
+from bottles.backend.state import Status, TaskStreamUpdateHandler, TaskType
+from bottles.backend.utils import json
 from bottles.backend.utils.file import FileUtils
+from bottles.backend.utils.background import BackgroundExecutor
+from bottles.backend.utils.throttle import SessionThrottle
 
 logging = Logger()
 
@@ -37,58 +43,77 @@ class DownloadCancelled(Exception):
     """Raised when a download operation is cancelled."""
 
 
+class _RangesUnsupported(Exception):
+    """Raised when the server answers a range request with the whole file."""
+
+
 class Downloader:
     """
     Download a resource from a given URL. It shows and update a progress
     bar while downloading but can also be used to update external progress
-    bars using the func parameter.
+    bars using the func parameter. While programs are running the rate
+    is capped by the session throttle.
+
+    The data is written to a .part file next to the destination, with
+    the validators of the resource in a .part.json file, so interrupted
+    or cancelled downloads are resumed with a range request as long as
+    the resource did not change. Large files are fetched in segments
+    over parallel connections when the server supports ranges.
+
+    When a checksum algorithm is given, the digest of the file is
+    computed while it streams in and returned in the result data.
     """
 
+    segments = 4
+    min_segment_size = 16 * 1024 * 1024
+    timeout = 30
+    # a dropped connection loses the chunk being read
+    chunk_size = 256 * 1024
+    save_interval = 1.0  # seconds between the saves of the segments progress
+
+    # we fake the user-agent to avoid 403 errors on some servers
+    headers = {"User-Agent": "curl/7.79.1"}
+
     def __init__(
         self,
         url: str,
         file: str,
         update_func: Optional[TaskStreamUpdateHandler] = None,
         cancel_event: Optional[Event] = None,
+        segments: Optional[int] = None,
+        checksum_algorithm: Optional[str] = None,
     ):
         self.start_time = None
         self.url = url
         self.file = file
         self.update_func = update_func
         self.cancel_event = cancel_event
+        if segments is not None:
+            self.segments = segments
+        self.checksum_algorithm = checksum_algorithm
+        self.__digest: Optional[str] = None
+        self.__part = f"{file}.part"
+        self.__state_path = f"{file}.part.json"
+        self.__lock = threading.Lock()
+        self.__abort = Event()
+        self.__rate = 0
+        self.__window_start = 0.0
+        self.__window_size = 0
 
     def download(self) -> Result:
         """Start the download."""
         try:
-            with open(self.file, "wb") as file:
-                self.start_time = time.time()
-                headers = {
-                    "User-Agent": "curl/7.79.1"
-                }  # we fake the user-agent to avoid 403 errors on some servers
-                response = requests.get(self.url, stream=True, headers=headers)
-                total_size = int(response.headers.get("content-length", 0))
-                received_size = 0
-
-                if total_size != 0:
-                    for data in response.iter_content(1024 * 1024):  # 1MB buffer
-                        if self.cancel_event and self.cancel_event.is_set():
-                            raise DownloadCancelled
-                        received_size += len(data)
-                        file.write(data)
-                        if not self.update_func:
-                            continue
-                        self.update_func(received_size, total_size)
-                        self.__progress(received_size, total_size)
-                else:
-                    file.write(response.content)
-                    if self.update_func:
-                        self.update_func(1, 1)
-                        self.__progress(1, 1)
+            self.start_time = time.time()
+            self.__abort.clear()
+            if not self.__download_segments():
+                self.__download_stream()
+            os.replace(self.__part, self.file)
+            with suppress(FileNotFoundError):
+                os.remove(self.__state_path)
         except DownloadCancelled:
+            # the .part file is kept to resume the download
             if self.update_func:
                 self.update_func(status=Status.CANCELLED)
-            with suppress(FileNotFoundError):
-                os.remove(self.file)
             return Result(False, message="cancelled")
         except requests.exceptions.SSLError:
             logging.error(
@@ -102,8 +127,299 @@ class Downloader:
                 False, message="Download failed! Check your internet connection."
             )
 
+        if self.checksum_algorithm:
+            return Result(
+                True,
+                data={"algorithm": self.checksum_algorithm, "checksum": self.__digest},
+            )
         return Result(True)
 
+    @staticmethod
+    def __get_validator(headers) -> str:
+        """Return the If-Range validator of a response, weak ETags can't be used."""
+        etag = headers.get("ETag", "")
+        if etag and not etag.startswith("W/"):
+            return etag
+        return headers.get("Last-Modified", "")
+
+    def __load_state(self) -> Optional[dict]:
+        """Return the state of the previous attempt if it can be resumed."""
+        try:
+            with open(self.__state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (
+            state.get("url") != self.url
+            or not state.get("validator")
+            or not os.path.isfile(self.__part)
+        ):
+            return None
+        return state
+
+    def __save_state(self, state: dict):
+        tmp = f"{self.__state_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.__state_path)
+
+    def __reset(self):
+        for path in (self.__part, self.__state_path):
+            with suppress(FileNotFoundError):
+                os.remove(path)
+
+    def __check_cancelled(self):
+        if self.__abort.is_set() or (self.cancel_event and self.cancel_event.is_set()):
+            raise DownloadCancelled
+
+    def __download_stream(self):
+        """Download over a single connection, resuming the .part file if any."""
+        state = self.__load_state()
+        offset = 0
+        headers = dict(self.headers)
+        if state and "ranges" not in state:
+            offset = os.path.getsize(self.__part)
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = state["validator"]
+
+        response = requests.get(
+            self.url, stream=True, headers=headers, timeout=self.timeout
+        )
+        if response.status_code == 416 and offset:
+            # the .part file is not a prefix of the resource anymore
+            response.close()
+            headers = dict(self.headers)
+            offset = 0
+            response = requests.get(
+                self.url, stream=True, headers=headers, timeout=self.timeout
+            )
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            logging.info(f"Resuming download of {self.url} from {offset} bytes")
+            total_size = offset + int(response.headers.get("content-length", 0))
+        else:
+            offset = 0
+            total_size = int(response.headers.get("content-length", 0))
+
+        validator = self.__get_validator(response.headers)
+        if validator:
+            self.__save_state(
+                {"url": self.url, "validator": validator, "size": total_size}
+            )
+        else:
+            with suppress(FileNotFoundError):
+                os.remove(self.__state_path)
+
+        checksum = None
+        if self.checksum_algorithm:
+            checksum = hashlib.new(self.checksum_algorithm)
+            if offset:
+                with open(self.__part, "rb") as file:
+                    for data in iter(lambda: file.read(1024 * 1024), b""):
+                        checksum.update(data)
+
+        with open(self.__part, "ab" if offset else "wb") as file:
+            if total_size == 0:
+                file.write(response.content)
+                if checksum:
+                    checksum.update(response.content)
+                if self.update_func:
+                    self.update_func(1, 1)
+                    self.__progress(1, 1)
+                self.__digest = checksum.hexdigest() if checksum else None
+                return
+
+            received_size = offset
+            for data in response.iter_content(self.chunk_size):
+                self.__check_cancelled()
+                received_size += len(data)
+                file.write(data)
+                if checksum:
+                    checksum.update(data)
+                self.__throttle(len(data))
+                if not self.update_func:
+                    continue
+                self.update_func(received_size, total_size)
+                self.__progress(received_size, total_size)
+        self.__digest = checksum.hexdigest() if checksum else None
+
+    def __download_segments(self) -> bool:
+        """
+        Download the ranges of the file over parallel connections into
+        the preallocated .part file. Return False when the file should
+        be downloaded over a single connection instead.
+
+        The digest follows the contiguous prefix of the file: the chunks
+        of the range being hashed are hashed as they arrive, the bytes
+        the next ranges received meanwhile are read back once the ranges
+        before them are complete, so it is ready when the last one ends.
+        """
+        state = self.__load_state()
+        segmented = state is not None and "ranges" in state
+        workers = BackgroundExecutor.get_workers(TaskType.Download, self.segments)
+        if workers < 2 and not segmented:
+            return False
+
+        response = requests.head(
+            self.url, headers=self.headers, allow_redirects=True, timeout=self.timeout
+        )
+        if not response.ok:
+            return False
+        total_size = int(response.headers.get("content-length", 0))
+        validator = self.__get_validator(response.headers)
+
+        if segmented and (
+            state["validator"] != validator or state["size"] != total_size
+        ):
+            logging.info(f"{self.url} changed, restarting the download")
+            self.__reset()
+            segmented = False
+
+        if not segmented:
+            if (
+                workers < 2
+                or response.headers.get("Accept-Ranges", "").lower() != "bytes"
+                or total_size < 2 * self.min_segment_size
+            ):
+                return False
+            count = min(workers, total_size // self.min_segment_size)
+            size = total_size // count
+            state = {
+                "url": self.url,
+                "validator": validator,
+                "size": total_size,
+                "ranges": [
+                    [
+                        i * size,
+                        total_size - 1 if i == count - 1 else (i + 1) * size - 1,
+                        i * size,
+                    ]
+                    for i in range(count)
+                ],
+            }
+            with open(self.__part, "wb") as file:
+                file.truncate(total_size)
+                with suppress(OSError, AttributeError):
+                    os.posix_fallocate(file.fileno(), 0, total_size)
+        else:
+            logging.info(f"Resuming segmented download of {self.url}")
+
+        if validator:
+            self.__save_state(state)
+        pending = [r for r in state["ranges"] if r[2] <= r[1]]
+        received = [total_size - sum(r[1] + 1 - r[2] for r in state["ranges"])]
+        last_save = [time.monotonic()]
+        checksum = None
+        if self.checksum_algorithm:
+            checksum = hashlib.new(self.checksum_algorithm)
+        hashed = [0]  # length of the hashed prefix
+        hash_lock = threading.Lock()
+
+        def _hash(start: int = -1, data: bytes = b""):
+            """Extend the hashed prefix, called with hash_lock held."""
+            if start == hashed[0]:
+                checksum.update(data)
+                hashed[0] += len(data)
+            for first, last, pos in state["ranges"]:
+                while first <= hashed[0] <= last and hashed[0] < pos:
+                    data = os.pread(fd, min(pos - hashed[0], 1024 * 1024), hashed[0])
+                    if not data:
+                        return
+                    checksum.update(data)
+                    hashed[0] += len(data)
+
+        def _fetch(segment: list):
+            headers = dict(self.headers)
+            headers["Range"] = f"bytes={segment[2]}-{segment[1]}"
+            if validator:
+                headers["If-Range"] = validator
+            with requests.get(
+                self.url, stream=True, headers=headers, timeout=self.timeout
+            ) as res:
+                res.raise_for_status()
+                if res.status_code != 206:
+                    raise _RangesUnsupported
+                for data in res.iter_content(self.chunk_size):
+                    self.__check_cancelled()
+                    data = data[: segment[1] + 1 - segment[2]]
+                    os.pwrite(fd, data, segment[2])
+                    self.__throttle(len(data))
+                    with self.__lock:
+                        start = segment[2]
+                        segment[2] += len(data)
+                        received[0] += len(data)
+                        if validator and (
+                            time.monotonic() - last_save[0] > self.save_interval
+                        ):
+                            self.__save_state(state)
+                            last_save[0] = time.monotonic()
+                        if self.update_func:
+                            self.update_func(received[0], total_size)
+                            self.__progress(received[0], total_size)
+                    # another thread hashing will catch up with these bytes
+                    if checksum and hash_lock.acquire(blocking=False):
+                        try:
+                            _hash(start, data)
+                        finally:
+                            hash_lock.release()
+            if segment[2] <= segment[1]:
+                raise requests.exceptions.ConnectionError("Incomplete range")
+
+        fd = os.open(self.__part, os.O_RDWR)
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(workers, len(pending))),
+                thread_name_prefix="BottlesDownload",
+            ) as executor:
+                futures = [executor.submit(_fetch, segment) for segment in pending]
+                for future in as_completed(futures):
+                    if future.exception() is not None:
+                        # stop the other segments and raise the first error
+                        self.__abort.set()
+                        for f in futures:
+                            f.cancel()
+                        future.result()
+            if checksum:
+                with hash_lock:
+                    _hash()
+                self.__digest = checksum.hexdigest()
+        except _RangesUnsupported:
+            logging.warning(f"{self.url} ignored the range requests")
+            self.__abort.clear()
+            os.close(fd)
+            fd = -1
+            self.__reset()
+            return False
+        finally:
+            if fd >= 0:
+                os.close(fd)
+                if validator and os.path.isfile(self.__part):
+                    self.__save_state(state)
+        return True
+
+    def __throttle(self, size: int):
+        """Sleep as long as needed to keep the download under the rate cap."""
+        rate = SessionThrottle.get_rate(TaskType.Download)
+        now = time.monotonic()
+        with self.__lock:
+            if rate != self.__rate:
+                # the cap changed, measure again from here
+                self.__rate, self.__window_start, self.__window_size = rate, now, 0
+                return
+            if not rate:
+                return
+
+            self.__window_size += size
+            delay = self.__window_size / rate - (now - self.__window_start)
+        if delay <= 0:
+            return
+        if self.cancel_event:
+            self.cancel_event.wait(delay)
+        else:
+            time.sleep(delay)
+
     def __progress(self, received_size, total_size):
         """Update the progress bar."""
         percent = int(received_size * 100 / total_size)
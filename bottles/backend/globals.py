@@ -16,7 +16,6 @@
 #
 
 import os
-import shutil
 from pathlib import Path
 from typing import Dict
 
@@ -48,17 +47,23 @@ class Paths:
     nvapi = f"{base}/nvapi"
     latencyflex = f"{base}/latencyflex"
     templates = f"{base}/templates"
+    shader_cache = f"{base}/shader_cache"
+    cab_cache = f"{base}/cab_cache"
+    download_cache = f"{base}/download_cache"
     library = f"{base}/library.yml"
     process_metrics = f"{base}/process_metrics.sqlite"
+    gpu_cache = f"{base}/gpu_cache.json"
+    host_capabilities = f"{base}/host_capabilities.json"
+
+    vkbasalt_paths = [
+        "/usr/lib/extensions/vulkan/vkBasalt/etc/vkBasalt",
+        "/usr/local",
+        "/usr/share/vkBasalt",
+    ]
 
     @staticmethod
     def is_vkbasalt_available():
-        vkbasalt_paths = [
-            "/usr/lib/extensions/vulkan/vkBasalt/etc/vkBasalt",
-            "/usr/local",
-            "/usr/share/vkBasalt",
-        ]
-        for path in vkbasalt_paths:
+        for path in Paths.vkbasalt_paths:
             if os.path.exists(path):
                 return True
         return False
@@ -75,13 +80,6 @@ class TrdyPaths:
 # check if bottles exists in xdg data path
 os.makedirs(Paths.base, exist_ok=True)
 
-# Check if some tools are available
-gamemode_available = shutil.which("gamemoderun") or False
-gamescope_available = shutil.which("gamescope") or False
-vkbasalt_available = Paths.is_vkbasalt_available()
-mangohud_available = shutil.which("mangohud") or False
-obs_vkc_available = shutil.which("obs-vkcapture") or False
-vmtouch_available = shutil.which("vmtouch") or False
 base_version = ""
 
 # encoding detection correction, following windows defaults
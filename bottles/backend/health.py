@@ -21,10 +21,9 @@ import os
 from bottles.backend.logger import Logger
 from bottles.backend.params import APP_VERSION
 from bottles.backend.utils import yaml
-from bottles.backend.utils.display import DisplayUtils
 from bottles.backend.utils.file import FileUtils
-from bottles.backend.utils.generic import is_glibc_min_available
 from bottles.backend.utils.gpu import GPUUtils
+from bottles.backend.utils.host import HostCapabilities
 
 logging = Logger()
 
@@ -53,12 +52,15 @@ class HealthChecker:
 
     def __init__(self):
         self.file_utils = FileUtils()
+        self.host = HostCapabilities.get()
         self.x11 = self.check_x11()
         self.wayland = self.check_wayland()
         self.xwayland = self.x11 and self.wayland
         self.desktop = self.check_desktop()
         self.gpus = GPUUtils().get_gpu()
-        self.glibc_min = is_glibc_min_available()
+        self.glibc_min = self.host.glibc
+        self.cabextract = bool(self.host.cabextract)
+        self.xdpyinfo = bool(self.host.xdpyinfo)
         self.bottles_envs = self.get_bottles_envs()
         self.check_system_info()
         self.disk = self.get_disk_data()
@@ -66,7 +68,7 @@ class HealthChecker:
         self.get_ram_data()
 
     def check_x11(self):
-        port = DisplayUtils.get_x_display()
+        port = self.host.x_display
         if port:
             self.x11_port = port
             return True
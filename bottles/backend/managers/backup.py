@@ -15,6 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import gzip
 import os
 import shutil
 import tarfile
@@ -27,13 +28,45 @@ from bottles.backend.logger import Logger
 from bottles.backend.managers.manager import Manager
 from bottles.backend.models.config import BottleConfig
 from bottles.backend.models.result import Result
-from bottles.backend.state import Task, TaskManager
+from bottles.backend.state import Task, TaskManager, TaskType
 from bottles.backend.utils import yaml
+from bottles.backend.utils.background import BackgroundExecutor
 from bottles.backend.utils.manager import ManagerUtils
+from bottles.backend.utils.throttle import SessionThrottle
 
 logging = Logger()
 
 
+class _GzipWriter:
+    """
+    Write a gzip file as a series of members, so the compression level
+    can change while it is written. Gzip readers join the members.
+    """
+
+    def __init__(self, path: str, level: int):
+        self.raw = open(path, "wb")
+        self.level = level
+        self.member: gzip.GzipFile | None = None
+
+    def set_level(self, level: int):
+        if level != self.level and self.member is not None:
+            self.member.close()
+            self.member = None
+        self.level = level
+
+    def write(self, data: bytes) -> int:
+        if self.member is None:
+            self.member = gzip.GzipFile(
+                fileobj=self.raw, mode="wb", compresslevel=self.level
+            )
+        return self.member.write(data)
+
+    def close(self):
+        if self.member is not None:
+            self.member.close()
+        self.raw.close()
+
+
 class BackupManager:
     @staticmethod
     def _validate_path(path: str) -> bool:
@@ -43,19 +76,64 @@ class BackupManager:
             return False
         return True
 
+    @staticmethod
+    def _add_member(
+        tar: tarfile.TarFile, name: str, exclude_filter=None
+    ) -> tarfile.TarInfo | None:
+        """Add a single file or directory entry, return it unless filtered."""
+        tarinfo = tar.gettarinfo(name)
+        if tarinfo is not None and exclude_filter:
+            tarinfo = exclude_filter(tarinfo)
+        if tarinfo is None:
+            return None
+        if tarinfo.isreg():
+            with open(name, "rb") as f:
+                tar.addfile(tarinfo, f)
+        else:
+            tar.addfile(tarinfo)
+        return tarinfo
+
     @staticmethod
     def _create_tarfile(
         source_path: str, destination_path: str, exclude_filter=None
     ) -> bool:
-        """Helper function to create a tar.gz file from a source path."""
+        """
+        Helper function to create a tar.gz file from a source path.
+        The files are added one job at a time from the calling thread,
+        so the backup pauses between them while programs are running
+        without holding a worker of the background pool, and compresses
+        faster while the session throttle only limits it.
+        """
+        writer = _GzipWriter(destination_path, 9)
         try:
-            with tarfile.open(destination_path, "w:gz") as tar:
+            with tarfile.open(fileobj=writer, mode="w|") as tar:
                 os.chdir(os.path.dirname(source_path))
-                tar.add(os.path.basename(source_path), filter=exclude_filter)
+                pending = [os.path.basename(source_path)]
+                while pending:
+                    name = pending.pop()
+                    throttled = SessionThrottle.is_throttled(TaskType.Backup)
+                    writer.set_level(1 if throttled else 9)
+                    tarinfo = BackgroundExecutor.run(
+                        TaskType.Backup,
+                        BackupManager._add_member,
+                        tar,
+                        name,
+                        exclude_filter,
+                    )
+                    if tarinfo is not None and tarinfo.isdir():
+                        children = sorted(os.listdir(name), reverse=True)
+                        pending += [os.path.join(name, c) for c in children]
             return True
-        except (FileNotFoundError, PermissionError, tarfile.TarError, ValueError) as e:
+        except (
+            FileNotFoundError,
+            PermissionError,
+            tarfile.TarError,
+            ValueError,
+        ) as e:
             logging.error(f"Error creating backup: {e}")
             return False
+        finally:
+            writer.close()
 
     @staticmethod
     def _safe_extract_tarfile(tar_path: str, extract_path: str) -> bool:
@@ -94,7 +172,12 @@ class BackupManager:
         if scope == "config":
             backup_created = config.dump(path).status
         else:
-            task_id = TaskManager.add(Task(title=_("Backup {0}").format(config.Name)))
+            task_id = TaskManager.add(
+                Task(
+                    title=_("Backup {0}").format(config.Name),
+                    task_type=TaskType.Backup,
+                )
+            )
             bottle_path = ManagerUtils.get_bottle_path(config)
             backup_created = BackupManager._create_tarfile(
                 bottle_path, path, exclude_filter=BackupManager.exclude_filter
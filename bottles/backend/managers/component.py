@@ -28,6 +28,7 @@ import pycurl
 from bottles.backend.downloader import Downloader
 from bottles.backend.globals import Paths
 from bottles.backend.logger import Logger
+from bottles.backend.managers.download_cache import DownloadCacheManager
 from bottles.backend.models.result import Result
 from bottles.backend.state import (
     LockManager,
@@ -36,7 +37,9 @@ from bottles.backend.state import (
     Task,
     TaskManager,
     TaskStreamUpdateHandler,
+    TaskType,
 )
+from bottles.backend.utils.background import BackgroundExecutor
 from bottles.backend.utils.file import FileUtils
 from bottles.backend.utils.generic import is_glibc_min_available
 from bottles.backend.utils.manager import ManagerUtils
@@ -163,13 +166,52 @@ class ComponentManager:
 
         existing_file = rename if rename else file
         temp_dest = os.path.join(Paths.temp, file)
+        file_path = os.path.join(Paths.temp, existing_file)
         just_downloaded = False
+        local_checksum = ""
+
+        # files are only stored by the checksum once it has been verified
+        if os.environ.get("BOTTLES_SKIP_CHECKSUM"):
+            checksum = ""
+        checksum = checksum.lower()
+        # files without a checksum are stored by their SHA-256 digest
+        algorithm, digest = "sha256", ""
+        if checksum:
+            try:
+                algorithm, digest = FileUtils.parse_checksum(checksum)
+            except ValueError as e:
+                logging.error(f"Can't verify [{existing_file}]: {e}")
+                if not external_task:
+                    TaskManager.remove(task_id)
+                return Result(False)
 
-        if os.path.isfile(os.path.join(Paths.temp, existing_file)):
+        cached = DownloadCacheManager.lookup(existing_file, checksum)
+        if cached:
+            """
+            The file is in the download cache and still matches its
+            checksum, link it in the /temp directory and skip the
+            download process.
+            """
+            logging.info(f"File [{existing_file}] found in the download cache.")
+            DownloadCacheManager.link(cached, file_path)
+            if not external_task:
+                TaskManager.remove(task_id)
+            return Result(True)
+
+        if os.path.isfile(file_path) and (
+            not checksum
+            or BackgroundExecutor.run(
+                TaskType.Checksum, FileUtils.get_checksum, file_path, algorithm
+            )
+            == digest
+        ):
             """
             Check if the file already exists in the /temp directory.
             If so, then skip the download process and set the update_func
-            to completed.
+            to completed. Files not matching their checksum are left
+            over by interrupted downloads and are downloaded again.
+            The verified file is recorded in the download cache, so
+            the next hits compare its stamp instead of hashing it.
             """
             logging.warning(f"File [{existing_file}] already exists in temp, skipping.")
         else:
@@ -207,6 +249,7 @@ class ComponentManager:
                     file=temp_dest,
                     update_func=update_func,
                     cancel_event=cancel_event,
+                    checksum_algorithm=algorithm,
                 ).download()
 
                 if not res.ok:
@@ -221,6 +264,7 @@ class ComponentManager:
                     return Result(False)
 
                 just_downloaded = True
+                local_checksum = res.data["checksum"]
             else:
                 logging.warning(
                     f"Failed to download [{download_url}] with code: {req_code} != 200"
@@ -229,27 +273,24 @@ class ComponentManager:
                     TaskManager.remove(task_id)
                 return Result(False)
 
-        file_path = os.path.join(Paths.temp, existing_file)
         if rename and just_downloaded:
             """Renaming the downloaded file if requested."""
             logging.info(f"Renaming [{file}] to [{rename}].")
             file_path = os.path.join(Paths.temp, rename)
             os.rename(temp_dest, file_path)
 
-        if checksum and not os.environ.get("BOTTLES_SKIP_CHECKSUM"):
+        if checksum and just_downloaded:
             """
-            Compare the checksum of the downloaded file with the one
-            provided by the caller. If they don't match, remove the
-            file from the /temp directory, remove the entry from the
-            task manager and return False.
+            Compare the checksum of the downloaded file, computed by
+            the downloader while streaming it, with the one provided
+            by the caller. If they don't match, remove the file from
+            the /temp directory, remove the entry from the task manager
+            and return False.
             """
-            checksum = checksum.lower()
-            local_checksum = FileUtils().get_checksum(file_path)
-
-            if local_checksum and local_checksum != checksum:
+            if local_checksum and local_checksum != digest:
                 logging.error(f"Downloaded file [{file}] looks corrupted.")
                 logging.error(
-                    f"Source cksum: [{checksum}] downloaded: [{local_checksum}]"
+                    f"Source cksum: [{digest}] downloaded: [{local_checksum}]"
                 )
                 logging.error(f"Removing corrupted file [{file}].")
                 os.remove(file_path)
@@ -257,6 +298,21 @@ class ComponentManager:
                     TaskManager.remove(task_id)
                 return Result(False)
 
+        try:
+            """
+            Store the file in the download cache, the /temp directory
+            only keeps a link to it.
+            """
+            cached = DownloadCacheManager.publish(
+                file_path,
+                existing_file,
+                checksum,
+                "" if checksum else local_checksum,
+            )
+            DownloadCacheManager.link(cached, file_path)
+        except OSError as e:
+            logging.warning(f"Failed to cache [{existing_file}]: {e}")
+
         if not external_task:
             TaskManager.remove(task_id)
         return Result(True)
@@ -290,10 +346,12 @@ class ComponentManager:
             directory and return False. The common cause of a failed
             extraction is that the archive is corrupted.
             """
-            tar = tarfile.open(f"{Paths.temp}/{archive}")
-            root_dir = tar.getnames()[0]
-            tar.extractall(path)
-            tar.close()
+            root_dir = BackgroundExecutor.run(
+                TaskType.Extraction,
+                ComponentManager.__extract_archive,
+                os.path.join(Paths.temp, archive),
+                path,
+            )
         except (tarfile.TarError, IOError, EOFError):
             with contextlib.suppress(FileNotFoundError):
                 os.remove(os.path.join(Paths.temp, archive))
@@ -316,6 +374,13 @@ class ComponentManager:
                 return False
         return True
 
+    @staticmethod
+    def __extract_archive(archive: str, path: str) -> str:
+        with tarfile.open(archive) as tar:
+            root_dir = tar.getnames()[0]
+            tar.extractall(path)
+        return root_dir
+
     @LockManager.lock(Locks.ComponentsInstall)  # avoid high resource usage
     def install(
         self,
@@ -15,8 +15,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import concurrent.futures
 import os
 import shutil
+import threading
 import traceback
 from functools import lru_cache
 from glob import glob
@@ -25,15 +27,19 @@ from typing import Callable, Optional
 from gettext import gettext as _
 
 import patoolib  # type: ignore [import-untyped]
+import pycurl
 
 from bottles.backend.cabextract import CabExtract
 from bottles.backend.globals import Paths
 from bottles.backend.logger import Logger
+from bottles.backend.managers.download_cache import DownloadCacheManager
 from bottles.backend.managers.registry_rule import RegistryRuleManager
 from bottles.backend.models.config import BottleConfig
+from bottles.backend.models.dependency import DependencyPlan
 from bottles.backend.models.enum import Arch
 from bottles.backend.models.result import Result
-from bottles.backend.state import Status, Task, TaskManager
+from bottles.backend.state import Status, Task, TaskManager, TaskType
+from bottles.backend.utils.background import BackgroundExecutor
 from bottles.backend.utils.generic import validate_url
 from bottles.backend.utils.manager import ManagerUtils
 from bottles.backend.wine.executor import WineExecutor
@@ -42,11 +48,25 @@ from bottles.backend.wine.regkeys import RegKeys
 from bottles.backend.wine.regsvr32 import Regsvr32
 from bottles.backend.wine.uninstaller import Uninstaller
 from bottles.backend.wine.winedbg import WineDbg
+from bottles.backend.wine.wineserver import WineServer
 
 logging = Logger()
 
 
+# steps downloading their url to the temp directory
+_DOWNLOAD_ACTIONS = (
+    "download_archive",
+    "install_exe",
+    "install_msi",
+    "cab_extract",
+    "archive_extract",
+)
+
+
 class DependencyManager:
+    # concurrent downloads while prefetching
+    prefetch_workers = 4
+
     def __init__(self, manager, offline: bool = False):
         self.__manager = manager
         self.__repo = manager.repository_manager.get_repo("dependencies", offline)
@@ -155,74 +175,367 @@ class DependencyManager:
             action, _("Running {0}…").format(action.replace("_", " "))
         )
 
+    def plan(
+        self, config: BottleConfig, names: list, remote_sizes: bool = False
+    ) -> DependencyPlan:
+        """
+        Resolve the dependencies with all their prerequisites into an
+        install plan: every manifest is fetched once, each dependency is
+        listed once after its prerequisites and the size of the files to
+        download is summed. With remote_sizes the size of files whose
+        manifest doesn't declare it is asked to the server.
+        """
+        plan = DependencyPlan(requested=list(names))
+        state: dict = {}
+
+        def visit(name: str):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                logging.warning(f"Dependency cycle detected at {name}, ignoring it.")
+                return
+            if name not in plan.requested:
+                if name in config.Installed_Dependencies:
+                    return
+                if name not in self.__manager.supported_dependencies:
+                    return
+
+            manifest = self.get_dependency(name)
+            if not isinstance(manifest, dict):
+                state[name] = "done"
+                plan.missing.append(name)
+                return
+
+            state[name] = "visiting"
+            for _ext_dep in manifest.get("Dependencies") or []:
+                visit(_ext_dep)
+            state[name] = "done"
+            plan.manifests[name] = manifest
+            plan.names.append(name)
+
+        for name in plan.requested:
+            visit(name)
+
+        resources = self.__get_resources(config, plan)
+        unknown = []
+        for key, step in resources.items():
+            if os.path.isfile(os.path.join(Paths.temp, key)):
+                continue
+            if DownloadCacheManager.contains(key, step.get("file_checksum") or ""):
+                continue
+            try:
+                plan.download_size += int(step["file_size"])
+            except (KeyError, TypeError, ValueError):
+                unknown.append(step["url"])
+
+        if remote_sizes and unknown:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=BackgroundExecutor.get_workers(
+                    TaskType.Download, min(self.prefetch_workers, len(unknown))
+                ),
+                thread_name_prefix="BottlesDependency",
+            ) as pool:
+                sizes = list(pool.map(self.__get_remote_size, unknown))
+            plan.download_size += sum(s for s in sizes if s > 0)
+            plan.unknown_sizes = len([s for s in sizes if s <= 0])
+        else:
+            plan.unknown_sizes = len(unknown)
+
+        return plan
+
+    @staticmethod
+    def __get_remote_size(url: str) -> int:
+        c = pycurl.Curl()
+        try:
+            c.setopt(c.URL, url)
+            c.setopt(c.FOLLOWLOCATION, True)
+            c.setopt(c.NOBODY, True)
+            c.setopt(c.TIMEOUT, 10)
+            c.setopt(c.HTTPHEADER, ["User-Agent: curl/7.79.1"])
+            c.perform()
+            return int(c.getinfo(c.CONTENT_LENGTH_DOWNLOAD))
+        except pycurl.error:
+            return -1
+        finally:
+            c.close()
+
+    @staticmethod
+    def __get_resources(config: BottleConfig, plan: DependencyPlan) -> dict:
+        """
+        Collect the files downloaded by the steps of the plan, by their
+        name in the temp directory.
+        """
+        resources: dict = {}
+        for name in plan.names:
+            for step in plan.manifests[name].get("Steps") or []:
+                if step.get("action") not in _DOWNLOAD_ACTIONS:
+                    continue
+                if config.Arch not in step.get("for", "win64_win32"):
+                    continue
+                if not step.get("url") or not validate_url(step["url"]):
+                    continue
+                key = step.get("rename") or step.get("file_name")
+                if key in resources:
+                    continue
+                if any(
+                    s.get("file_name") == step.get("file_name")
+                    for s in resources.values()
+                ):
+                    # both would be downloaded to the same temp file first
+                    continue
+                resources[key] = step
+        return resources
+
+    def __prefetch(
+        self,
+        config: BottleConfig,
+        plan: DependencyPlan,
+        task: Optional[Task] = None,
+        progress_cb: Optional[Callable[[str], None]] = None,
+        progress_progress_cb: Optional[Callable[[Optional[float]], None]] = None,
+    ):
+        """
+        Download the files of the whole plan concurrently before running
+        its steps, which then find them verified in temp. Failed
+        downloads are left to their step, which retries and reports them.
+        """
+        resources = self.__get_resources(config, plan)
+        if not resources:
+            return
+
+        self.__notify_progress(
+            progress_cb, _("Downloading {0} files…").format(len(resources)), task=task
+        )
+        self.__notify_progress_fraction(progress_progress_cb, None)
+
+        lock = threading.Lock()
+        sizes: dict = {}
+        progress_handler = self.__build_progress_handler(task, progress_progress_cb)
+
+        def _download(key: str, step: dict) -> bool:
+            def _update(
+                received_size: int = 0,
+                total_size: int = 0,
+                status: Optional[Status] = None,
+            ):
+                if status is not None:
+                    return
+                with lock:
+                    sizes[key] = (received_size, total_size)
+                    received = sum(r for r, _t in sizes.values())
+                    total = sum(t for _r, t in sizes.values())
+                progress_handler(received, total)
+
+            return self.__manager.component_manager.download(
+                download_url=step.get("url"),
+                file=step.get("file_name"),
+                rename=step.get("rename"),
+                checksum=step.get("file_checksum"),
+                func=_update,
+                task=task,
+            ).ok
+
+        workers = BackgroundExecutor.get_workers(
+            TaskType.Download, min(self.prefetch_workers, len(resources))
+        )
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="BottlesDependency"
+        ) as pool:
+            futures = {
+                pool.submit(_download, key, step): key
+                for key, step in resources.items()
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    logging.debug(f"Prefetch of {futures[future]} raised: {e}")
+                    ok = False
+                if not ok:
+                    logging.warning(
+                        f"Failed to prefetch {futures[future]}, "
+                        "its step will download it again."
+                    )
+
+        self.__notify_progress_fraction(progress_progress_cb, None)
+
     def install(
         self,
         config: BottleConfig,
         dependency: list,
         progress_cb: Optional[Callable[[str], None]] = None,
         progress_progress_cb: Optional[Callable[[Optional[float]], None]] = None,
+        prefetch: bool = True,
     ) -> Result:
         """
         Install a given dependency in a bottle. It will
         return True if the installation was successful.
+        Its prerequisites are installed first, see install_plan.
         """
-        uninstaller = True
-        installed_new = False
+        return self.install_plan(
+            config,
+            self.plan(config, [dependency[0]]),
+            progress_cb=progress_cb,
+            progress_progress_cb=progress_progress_cb,
+            prefetch=prefetch,
+        )
+
+    def install_plan(
+        self,
+        config: BottleConfig,
+        plan: DependencyPlan,
+        progress_cb: Optional[Callable[[str], None]] = None,
+        progress_progress_cb: Optional[Callable[[Optional[float]], None]] = None,
+        prefetch: bool = True,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Result:
+        """
+        Install the dependencies of a plan in order. The files of the
+        whole plan are downloaded together first unless prefetch is
+        False, the steps share one wineserver, stopped again before the
+        registry rules are applied, and the bottle config is written
+        once at the end, also when a dependency fails or the install
+        is cancelled through the cancel_event between two dependencies.
+        """
+        if not plan.names and not plan.missing:
+            return Result(status=True, data={"uninstaller": True})
 
+        title = ", ".join(plan.requested)
         if config.Parameters.versioning_automatic:
             """
             If the bottle has the versioning system enabled, we need
             to create a new version of the bottle, before installing
-            the dependency.
+            the dependencies.
             """
             self.__manager.versioning_manager.create_state(
-                config=config, message=f"Before installing {dependency[0]}"
+                config=config, message=f"Before installing {title}"
             )
 
-        task_id = TaskManager.add(Task(title=dependency[0]))
+        task_id = TaskManager.add(Task(title=title))
         task = TaskManager.get(task_id)
 
         self.__notify_progress(progress_cb, _("Preparing installation…"), task=task)
 
-        logging.info(
-            "Installing dependency [%s] in bottle [%s]." % (dependency[0], config.Name),
-        )
-        manifest = self.get_dependency(dependency[0])
-        if not manifest:
+        if not plan.ok:
             """
-            If the manifest is not found, return a Result
+            If a manifest is not found, return a Result
             object with the error.
             """
             TaskManager.remove(task_id)
             return Result(
-                status=False, message=f"Cannot find manifest for {dependency[0]}."
+                status=False,
+                message=f"Cannot find manifest for {', '.join(plan.missing)}.",
+                data={"dependency": ", ".join(plan.missing)},
+            )
+
+        if prefetch:
+            self.__prefetch(
+                config,
+                plan,
+                task=task,
+                progress_cb=progress_cb,
+                progress_progress_cb=progress_progress_cb,
+            )
+
+        # keep the server up between the steps instead of restarting it
+        wineserver = WineServer(config)
+        persistent = wineserver.persist()
+
+        installed = []
+        result = Result(status=True, data={"uninstaller": True})
+        for name in plan.names:
+            if cancel_event is not None and cancel_event.is_set():
+                result = Result(
+                    status=False,
+                    message="Installation cancelled.",
+                    data={"dependency": name, "cancelled": True},
+                )
+                break
+
+            if name not in plan.requested:
+                self.__notify_progress(
+                    progress_cb,
+                    _("Installing prerequisite “{0}”…").format(name),
+                    task=task,
+                )
+            logging.info(
+                "Installing dependency [%s] in bottle [%s]." % (name, config.Name),
             )
 
-        if manifest.get("Dependencies"):
+            uninstaller = self.__run_steps(
+                config,
+                plan.manifests[name],
+                task=task,
+                progress_cb=progress_cb,
+                progress_progress_cb=progress_progress_cb,
+            )
+            if uninstaller is None:
+                result = Result(
+                    status=False,
+                    message=f"One or more steps failed for {name}.",
+                    data={"dependency": name},
+                )
+                break
+
+            if plan.manifests[name].get("Uninstaller"):
+                """
+                If the manifest has an uninstaller, add it to the
+                uninstaller list in the bottle config.
+                Set it to NO_UNINSTALLER if the dependency cannot be uninstalled.
+                """
+                uninstaller = plan.manifests[name].get("Uninstaller")
+
+            if name not in config.Installed_Dependencies:
+                config.Uninstallers[name] = uninstaller
+                installed.append(name)
+            result = Result(status=True, data={"uninstaller": bool(uninstaller)})
+            logging.info(f"Dependency installed: {name} in {config.Name}", jn=True)
+
+        if persistent:
             """
-            If the manifest has dependencies, we need to install them
-            before installing the current one.
+            Stop the server started for the steps, it would otherwise
+            stay up for its delay and make the later waits on it and
+            the registry writes hold until it exits.
             """
-            for _ext_dep in manifest.get("Dependencies"):
-                if _ext_dep in config.Installed_Dependencies:
-                    continue
-                if _ext_dep in self.__manager.supported_dependencies:
-                    _dep = self.__manager.supported_dependencies[_ext_dep]
-                    self.__notify_progress(
-                        progress_cb,
-                        _("Installing prerequisite “{0}”…").format(_ext_dep),
-                        task=task,
-                    )
-                    _res = self.install(
-                        config,
-                        [_ext_dep, _dep],
-                        progress_cb=progress_cb,
-                        progress_progress_cb=progress_progress_cb,
-                    )
-                    if not _res.status:
-                        return _res
+            wineserver.kill()
+            wineserver.wait()
 
-        for step in manifest.get("Steps"):
+        if installed:
+            """
+            Add the new dependencies to the installed dependencies list
+            of the bottle, the uninstallers are saved with it.
+            """
+            self.__manager.update_config(
+                config=config,
+                key="Installed_Dependencies",
+                value=(config.Installed_Dependencies or []) + installed,
+            )
+            RegistryRuleManager.apply_rules(config, trigger="dependencies")
+
+        # Remove entry from task manager
+        TaskManager.remove(task_id)
+
+        if not result.ok:
+            return result
+
+        self.__notify_progress_fraction(progress_progress_cb, None)
+        self.__notify_progress(progress_cb, _("Finalizing installation…"), task=task)
+        return result
+
+    def __run_steps(
+        self,
+        config: BottleConfig,
+        manifest: dict,
+        task: Optional[Task] = None,
+        progress_cb: Optional[Callable[[str], None]] = None,
+        progress_progress_cb: Optional[Callable[[Optional[float]], None]] = None,
+    ) -> Optional[bool]:
+        """
+        Execute the steps of a manifest, return whether the dependency
+        can be uninstalled or None if a step failed.
+        """
+        uninstaller = True
+        for step in manifest.get("Steps") or []:
             """
             Here we execute all steps in the manifest.
             Steps are the actions performed to install the dependency.
@@ -243,56 +556,10 @@ class DependencyManager:
                 progress_progress_cb=progress_progress_cb,
             )
             if not res.ok:
-                TaskManager.remove(task_id)
-                return Result(
-                    status=False,
-                    message=f"One or more steps failed for {dependency[0]}.",
-                )
+                return None
             if not res.data.get("uninstaller"):
                 uninstaller = False
-
-        if dependency[0] not in config.Installed_Dependencies:
-            """
-            If the dependency is not already listed in the installed
-            dependencies list of the bottle, add it.
-            """
-            dependencies = [dependency[0]]
-
-            if config.Installed_Dependencies:
-                dependencies = config.Installed_Dependencies + [dependency[0]]
-
-            self.__manager.update_config(
-                config=config, key="Installed_Dependencies", value=dependencies
-            )
-            installed_new = True
-
-        if manifest.get("Uninstaller"):
-            """
-            If the manifest has an uninstaller, add it to the
-            uninstaller list in the bottle config.
-            Set it to NO_UNINSTALLER if the dependency cannot be uninstalled.
-            """
-            uninstaller = manifest.get("Uninstaller")
-
-        if dependency[0] not in config.Installed_Dependencies:
-            self.__manager.update_config(
-                config, dependency[0], uninstaller, "Uninstallers"
-            )
-            installed_new = True
-
-        # Remove entry from task manager
-        TaskManager.remove(task_id)
-
-        # Hide installation button and show remove button
-        logging.info(f"Dependency installed: {dependency[0]} in {config.Name}", jn=True)
-
-        if installed_new:
-            RegistryRuleManager.apply_rules(config, trigger="dependencies")
-        self.__notify_progress_fraction(progress_progress_cb, None)
-        self.__notify_progress(progress_cb, _("Finalizing installation…"), task=task)
-        if not uninstaller:
-            return Result(status=True, data={"uninstaller": False})
-        return Result(status=True, data={"uninstaller": True})
+        return uninstaller
 
     def __perform_steps(
         self,
@@ -0,0 +1,323 @@
+# download_cache.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import contextlib
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+from bottles.backend.globals import Paths
+from bottles.backend.logger import Logger
+from bottles.backend.state import TaskType
+from bottles.backend.utils import json
+from bottles.backend.utils.background import BackgroundExecutor
+from bottles.backend.utils.file import FileUtils
+
+logging = Logger()
+
+
+class DownloadCacheManager:
+    """
+    Content-addressed store of the downloaded files. Files are stored
+    by the checksum their manifest declares, files without one by the
+    SHA-256 of their content with an index from their name. Hits are
+    linked into the temp directory, the least recently used files are
+    evicted past the quota together with their links.
+
+    The index keeps the size, mtime and inode each file had when its
+    digest was verified, hits are only hashed again when they changed.
+    """
+
+    # bytes, 0 disables the eviction
+    quota = 2 * 1024 * 1024 * 1024
+
+    _lock = threading.RLock()
+
+    @staticmethod
+    def get_objects_path() -> str:
+        return os.path.join(Paths.download_cache, "objects")
+
+    @staticmethod
+    def __get_index_path() -> str:
+        return os.path.join(Paths.download_cache, "index.json")
+
+    @classmethod
+    def __load(cls) -> dict:
+        try:
+            with open(cls.__get_index_path()) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("names", {})
+        index.setdefault("entries", {})
+        index.setdefault("stats", {"hits": 0, "misses": 0, "evictions": 0})
+        return index
+
+    @classmethod
+    def __save(cls, index: dict):
+        os.makedirs(Paths.download_cache, exist_ok=True)
+        path = cls.__get_index_path()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def __get_key(checksum: str) -> str:
+        algorithm, digest = FileUtils.parse_checksum(checksum)
+        return f"{algorithm}-{digest}"
+
+    @staticmethod
+    def __get_stamp(path: str) -> list:
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    @staticmethod
+    def __verify(key: str, path: str) -> bool:
+        algorithm, digest = key.split("-", 1)
+        local = BackgroundExecutor.run(
+            TaskType.Checksum, FileUtils.get_checksum, path, algorithm
+        )
+        return local == digest
+
+    @classmethod
+    def lookup(cls, name: str, checksum: str = "") -> Optional[str]:
+        """
+        Return the stored file for the checksum, or for the name when
+        there is no checksum. Files changed since their digest was
+        verified are hashed again, corrupted ones are dropped and count
+        as a miss.
+        """
+        with cls._lock:
+            index = cls.__load()
+            key = cls.__get_key(checksum) if checksum else index["names"].get(name)
+            entry = index["entries"].get(key) if key else None
+            path = os.path.join(cls.get_objects_path(), key) if key else ""
+
+        hit = False
+        stamp = None
+        if entry is not None:
+            try:
+                stamp = cls.__get_stamp(path)
+                hit = stamp[0] == entry["size"]
+            except OSError:
+                hit = False
+            if hit and stamp != entry.get("stamp") and not cls.__verify(key, path):
+                logging.warning(f"Cached download {name} is corrupted, removing it.")
+                hit = False
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+
+        with cls._lock:
+            index = cls.__load()
+            if hit:
+                index["stats"]["hits"] += 1
+                if key in index["entries"]:
+                    index["entries"][key]["last_used"] = time.time()
+                    index["entries"][key]["stamp"] = stamp
+            else:
+                index["stats"]["misses"] += 1
+                if key:
+                    index["entries"].pop(key, None)
+            cls.__save(index)
+        return path if hit else None
+
+    @classmethod
+    def contains(cls, name: str, checksum: str = "") -> bool:
+        """
+        Return whether the store has the file, without verifying it or
+        counting a lookup. Meant for estimates like the install plans.
+        """
+        with cls._lock:
+            index = cls.__load()
+        try:
+            key = cls.__get_key(checksum) if checksum else index["names"].get(name)
+        except ValueError:
+            return False
+        return key in index["entries"] and os.path.isfile(
+            os.path.join(cls.get_objects_path(), key)
+        )
+
+    @classmethod
+    def publish(cls, path: str, name: str, checksum: str = "", digest: str = "") -> str:
+        """
+        Move a completed download into the store, in one rename so a
+        partial file is never visible there, and return its new path.
+        The checksum must have been verified, files without one are
+        stored by their SHA-256 digest, computed here if not given.
+        """
+        if checksum:
+            key = cls.__get_key(checksum)
+        else:
+            digest = digest or FileUtils.get_checksum(path, "sha256")
+            key = f"sha256-{digest}"
+        objects = cls.get_objects_path()
+        os.makedirs(objects, exist_ok=True)
+        dest = os.path.join(objects, key)
+
+        try:
+            os.replace(path, dest)
+        except OSError:
+            # the temp directory is on another filesystem
+            tmp = f"{dest}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, dest)
+            os.remove(path)
+
+        with cls._lock:
+            index = cls.__load()
+            stamp = cls.__get_stamp(dest)
+            old = index["entries"].get(key, {})
+            index["entries"][key] = {
+                "size": stamp[0],
+                "stamp": stamp,
+                "last_used": time.time(),
+                "links": old.get("links", []),
+            }
+            if not checksum:
+                index["names"][name] = key
+            cls.__save(index)
+
+        cls.evict(keep=key)
+        return dest
+
+    @classmethod
+    def link(cls, path: str, dest: str):
+        """
+        Make the stored file available at dest, as a hard link if
+        possible. Links are recorded so the eviction of the file also
+        frees its space.
+        """
+        if os.path.lexists(dest):
+            os.remove(dest)
+        try:
+            os.link(path, dest)
+        except OSError:
+            shutil.copyfile(path, dest)
+            return
+
+        with cls._lock:
+            index = cls.__load()
+            entry = index["entries"].get(os.path.basename(path))
+            if entry is not None:
+                # forget the links removed with the temp directory
+                links = [
+                    link
+                    for link in entry.get("links", [])
+                    if link != dest and os.path.lexists(link)
+                ]
+                entry["links"] = links + [dest]
+                cls.__save(index)
+
+    @staticmethod
+    def __unlink(entry: dict):
+        """Remove the links of an entry that still point to its file."""
+        inode = entry["stamp"][2] if entry.get("stamp") else None
+        for link in entry.get("links", []):
+            try:
+                if os.stat(link).st_ino == inode:
+                    os.remove(link)
+            except OSError:
+                pass
+
+    @classmethod
+    def get_inodes(cls) -> set:
+        """Return the (device, inode) pairs of the stored files."""
+        inodes = set()
+        try:
+            with os.scandir(cls.get_objects_path()) as entries:
+                for entry in entries:
+                    st = entry.stat(follow_symlinks=False)
+                    inodes.add((st.st_dev, st.st_ino))
+        except FileNotFoundError:
+            pass
+        return inodes
+
+    @classmethod
+    def evict(cls, quota: Optional[int] = None, keep: str = "") -> int:
+        """
+        Delete the least recently used files until the store fits in
+        the quota, return the number of bytes freed.
+        """
+        quota = cls.quota if quota is None else quota
+        if quota <= 0:
+            return 0
+
+        with cls._lock:
+            index = cls.__load()
+            entries = index["entries"]
+            total = sum(e["size"] for e in entries.values())
+            freed = 0
+            for key, entry in sorted(
+                entries.items(), key=lambda item: item[1]["last_used"]
+            ):
+                if total - freed <= quota:
+                    break
+                if key == keep:
+                    continue
+                try:
+                    os.remove(os.path.join(cls.get_objects_path(), key))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f"Failed to evict cached download {key}: {e}")
+                    continue
+                cls.__unlink(entry)
+                del entries[key]
+                freed += entry["size"]
+                index["stats"]["evictions"] += 1
+
+            if freed:
+                index["names"] = {
+                    n: k for n, k in index["names"].items() if k in entries
+                }
+                cls.__save(index)
+
+        if freed:
+            logging.info(
+                f"Evicted {FileUtils.get_human_size(freed)} of cached downloads"
+            )
+        return freed
+
+    @classmethod
+    def get_stats(cls, quota: Optional[int] = None) -> dict:
+        with cls._lock:
+            index = cls.__load()
+        size = sum(e["size"] for e in index["entries"].values())
+        stats = index["stats"]
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "path": Paths.download_cache,
+            "size": FileUtils.get_human_size(size),
+            "size_bytes": size,
+            "files": len(index["entries"]),
+            "quota_bytes": cls.quota if quota is None else quota,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "evictions": stats["evictions"],
+            "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+        }
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            for entry in cls.__load()["entries"].values():
+                cls.__unlink(entry)
+            shutil.rmtree(Paths.download_cache, ignore_errors=True)
+            os.makedirs(Paths.download_cache, exist_ok=True)
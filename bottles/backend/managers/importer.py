@@ -18,7 +18,7 @@
 import os
 import subprocess
 from datetime import datetime
-from glob import glob
+from glob import escape, glob
 
 from bottles.backend.globals import Paths, TrdyPaths
 from bottles.backend.logger import Logger
@@ -104,8 +104,9 @@ class ImportManager:
         open(f"{wineprefix.get('Path')}/bottle.lock", "a").close()
 
         # copy wineprefix files in the new bottle
-        command = f"cp -a {wineprefix.get('Path')}/* {bottle_complete_path}/"
-        subprocess.Popen(command, shell=True).communicate()
+        sources = sorted(glob(os.path.join(escape(wineprefix.get("Path")), "*")))
+        if sources:
+            subprocess.run(["cp", "-a", *sources, f"{bottle_complete_path}/"])
 
         # create bottle config
         new_config = BottleConfig()
@@ -249,8 +249,7 @@ class InstallerManager:
 
         logging.info("Executing installer script…")
         subprocess.Popen(
-            f"bash -c '{script}'",
-            shell=True,
+            ["bash", "-c", script],
             cwd=ManagerUtils.get_bottle_path(config),
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
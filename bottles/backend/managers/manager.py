@@ -31,6 +31,7 @@ from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import pathvalidate
 
+from bottles.backend.cabextract import CabExtract
 from bottles.backend.dlls.dxvk import DXVKComponent
 from bottles.backend.dlls.latencyflex import LatencyFleXComponent
 from bottles.backend.dlls.nvapi import NVAPIComponent
@@ -40,6 +41,7 @@ from bottles.backend.logger import Logger
 from bottles.backend.managers.component import ComponentManager
 from bottles.backend.managers.data import DataManager, UserDataKeys
 from bottles.backend.managers.dependency import DependencyManager
+from bottles.backend.managers.download_cache import DownloadCacheManager
 from bottles.backend.managers.epicgamesstore import EpicGamesStoreManager
 from bottles.backend.managers.importer import ImportManager
 from bottles.backend.managers.installer import InstallerManager
@@ -47,6 +49,7 @@ from bottles.backend.managers.library import LibraryManager
 from bottles.backend.managers.playtime import ProcessSessionTracker
 from bottles.backend.managers.registry_rule import RegistryRuleManager
 from bottles.backend.managers.repository import RepositoryManager
+from bottles.backend.managers.shader_cache import ShaderCacheManager
 from bottles.backend.managers.steam import SteamManager
 from bottles.backend.managers.template import TemplateManager
 from bottles.backend.managers.ubisoftconnect import UbisoftConnectManager
@@ -60,6 +63,7 @@ from bottles.backend.models.result import Result
 from bottles.backend.models.samples import Samples
 from bottles.backend.state import EventManager, Events, SignalManager, Signals
 from bottles.backend.utils import yaml
+from bottles.backend.utils.background import BackgroundExecutor
 from bottles.backend.utils.connection import ConnectionUtils
 from bottles.backend.utils.file import FileUtils
 from bottles.backend.utils.generic import sort_by_version
@@ -70,10 +74,12 @@ from bottles.backend.utils.manager import ManagerUtils
 from bottles.backend.utils.singleton import Singleton
 from bottles.backend.utils.steam import SteamUtils
 from bottles.backend.utils.threading import RunAsync
+from bottles.backend.utils.throttle import SessionThrottle
 from bottles.backend.wine.reg import Reg
 from bottles.backend.wine.regkeys import RegKeys
 from bottles.backend.wine.uninstaller import Uninstaller
 from bottles.backend.wine.wineboot import WineBoot
+from bottles.backend.wine.winecommand import WineCommand
 from bottles.backend.wine.winepath import WinePath
 from bottles.backend.wine.wineserver import WineServer
 from bottles.backend.utils.wine import WineUtils
@@ -160,6 +166,10 @@ class Manager(metaclass=Singleton):
         times["ImportManager"] = time.time()
         self.steam_manager = SteamManager()
         times["SteamManager"] = time.time()
+        BackgroundExecutor.configure(self.settings)
+        SessionThrottle.configure(self.settings)
+        DownloadCacheManager.quota = self.__get_download_cache_quota()
+        CabExtract.quota = self.__get_cab_cache_quota()
 
         # Initialize playtime tracker
         self._initialize_playtime_tracker()
@@ -312,6 +322,7 @@ class Manager(metaclass=Singleton):
             if data_key:
                 rv.data[data_key] = time.time()
 
+        self.trim_caches()
         return rv
 
     def __del__(self):
@@ -456,21 +467,47 @@ class Manager(metaclass=Singleton):
 
     def __clear_temp(self, force: bool = False):
         """Clears the temp directory if user setting allows it. Use the force
-        parameter to force clearing the directory.
+        parameter to force clearing the directory, otherwise the partial
+        downloads are kept so they can be resumed.
         """
         if self.settings.get_boolean("temp") or force:
             try:
-                shutil.rmtree(Paths.temp)
-                os.makedirs(Paths.temp, exist_ok=True)
+                with os.scandir(Paths.temp) as entries:
+                    for entry in entries:
+                        if not force and entry.name.endswith((".part", ".part.json")):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            shutil.rmtree(entry.path)
+                        else:
+                            os.remove(entry.path)
                 logging.info("Temp directory cleaned successfully!")
             except FileNotFoundError:
                 self.check_app_dirs()
 
+    @staticmethod
+    def __get_temp_size() -> int:
+        """
+        Return the size of the temp directory, files linked from the
+        download cache are counted with it, and hard links once.
+        """
+        seen = DownloadCacheManager.get_inodes()
+        size = 0
+        for root, _dirs, files in os.walk(Paths.temp):
+            for name in files:
+                try:
+                    st = os.lstat(os.path.join(root, name))
+                except OSError:
+                    continue
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    size += st.st_size
+        return size
+
     def get_cache_details(self) -> dict:
         self.check_app_dirs()
         file_utils = FileUtils()
 
-        temp_size_bytes = file_utils.get_path_size(Paths.temp, human=False)
+        temp_size_bytes = self.__get_temp_size()
         templates = []
         templates_size_bytes = 0
 
@@ -491,7 +528,22 @@ class Manager(metaclass=Singleton):
                 }
             )
 
-        total_size_bytes = temp_size_bytes + templates_size_bytes
+        shader_cache = ShaderCacheManager.get_details(
+            self.local_bottles.values(), self.__get_shader_cache_quota()
+        )
+
+        cab_cache_size_bytes = file_utils.get_path_size(Paths.cab_cache, human=False)
+        download_cache = DownloadCacheManager.get_stats(
+            self.__get_download_cache_quota()
+        )
+
+        total_size_bytes = (
+            temp_size_bytes
+            + templates_size_bytes
+            + shader_cache["size_bytes"]
+            + cab_cache_size_bytes
+            + download_cache["size_bytes"]
+        )
 
         return {
             "temp": {
@@ -502,6 +554,13 @@ class Manager(metaclass=Singleton):
             "templates": templates,
             "templates_size": file_utils.get_human_size(templates_size_bytes),
             "templates_size_bytes": templates_size_bytes,
+            "shader_cache": shader_cache,
+            "cab_cache": {
+                "path": Paths.cab_cache,
+                "size": file_utils.get_human_size(cab_cache_size_bytes),
+                "size_bytes": cab_cache_size_bytes,
+            },
+            "download_cache": download_cache,
             "total_size": file_utils.get_human_size(total_size_bytes),
             "total_size_bytes": total_size_bytes,
         }
@@ -515,6 +574,53 @@ class Manager(metaclass=Singleton):
 
         return Result(True)
 
+    def clear_cab_cache(self) -> Result[None]:
+        """Remove the members extracted from cabinets."""
+        try:
+            shutil.rmtree(Paths.cab_cache, ignore_errors=True)
+            os.makedirs(Paths.cab_cache, exist_ok=True)
+        except Exception as ex:
+            logging.error(f"Failed to clear cabinet cache: {ex}")
+            return Result(False, message=str(ex))
+
+        return Result(True)
+
+    def __get_cab_cache_quota(self) -> int:
+        return self.settings.get_int("cab-cache-quota") * 1024 * 1024
+
+    def trim_cab_cache(self) -> Result[int]:
+        """Evict the least recently used cabinet members past the quota."""
+        try:
+            freed = CabExtract.evict(self.__get_cab_cache_quota())
+        except Exception as ex:
+            logging.error(f"Failed to trim cabinet cache: {ex}")
+            return Result(False, message=str(ex))
+
+        return Result(True, data=freed)
+
+    def __get_download_cache_quota(self) -> int:
+        return self.settings.get_int("download-cache-quota") * 1024 * 1024
+
+    def clear_download_cache(self) -> Result[None]:
+        """Remove the downloaded components and dependencies kept for reuse."""
+        try:
+            DownloadCacheManager.clear()
+        except Exception as ex:
+            logging.error(f"Failed to clear download cache: {ex}")
+            return Result(False, message=str(ex))
+
+        return Result(True)
+
+    def trim_download_cache(self) -> Result[int]:
+        """Evict the least recently used downloads past the quota."""
+        try:
+            freed = DownloadCacheManager.evict(self.__get_download_cache_quota())
+        except Exception as ex:
+            logging.error(f"Failed to trim download cache: {ex}")
+            return Result(False, message=str(ex))
+
+        return Result(True, data=freed)
+
     def clear_template_cache(self, template_uuid: str) -> Result[None]:
         self.check_app_dirs()
         try:
@@ -536,6 +642,50 @@ class Manager(metaclass=Singleton):
 
         return Result(True)
 
+    def __get_shader_cache_quota(self) -> int:
+        return self.settings.get_int("shader-cache-quota") * 1024 * 1024
+
+    def clear_shader_cache(self, bottle_name: Optional[str] = None) -> Result[None]:
+        """
+        Clear the shader caches of the given bottle, or of every bottle
+        and the shared root when no bottle is given.
+        """
+        try:
+            if bottle_name is None:
+                for config in self.local_bottles.values():
+                    ShaderCacheManager.clear(config)
+                ShaderCacheManager.clear_shared()
+            elif bottle_name in self.local_bottles:
+                ShaderCacheManager.clear(self.local_bottles[bottle_name])
+            else:
+                return Result(False, message=f"Bottle {bottle_name} not found")
+        except Exception as ex:
+            logging.error(f"Failed to clear shader cache: {ex}")
+            return Result(False, message=str(ex))
+
+        return Result(True)
+
+    def trim_shader_cache(self) -> Result[int]:
+        """Evict the least recently used shader caches past the quota."""
+        quota = self.__get_shader_cache_quota()
+        try:
+            freed = ShaderCacheManager.evict(self.local_bottles.values(), quota)
+        except Exception as ex:
+            logging.error(f"Failed to trim shader cache: {ex}")
+            return Result(False, message=str(ex))
+
+        return Result(True, data=freed)
+
+    @RunAsync.run_async
+    def trim_caches(self):
+        """
+        Evict the least recently used cache files past their quotas. It
+        walks the caches of every bottle, so it runs off the startup path.
+        """
+        self.trim_shader_cache()
+        self.trim_download_cache()
+        self.trim_cab_cache()
+
     def clear_all_caches(self) -> Result[None]:
         temp_result = self.clear_temp_cache()
         if not temp_result.ok:
@@ -545,6 +695,18 @@ class Manager(metaclass=Singleton):
         if not templates_result.ok:
             return templates_result
 
+        shader_result = self.clear_shader_cache()
+        if not shader_result.ok:
+            return shader_result
+
+        cab_result = self.clear_cab_cache()
+        if not cab_result.ok:
+            return cab_result
+
+        download_result = self.clear_download_cache()
+        if not download_result.ok:
+            return download_result
+
         return Result(True)
 
     def update_bottles(self, silent: bool = False):
@@ -605,6 +767,18 @@ class Manager(metaclass=Singleton):
             logging.info("LatencyFleX path doesn't exist, creating now.")
             os.makedirs(Paths.latencyflex, exist_ok=True)
 
+        if not os.path.isdir(Paths.shader_cache):
+            logging.info("Shader cache path doesn't exist, creating now.")
+            os.makedirs(Paths.shader_cache, exist_ok=True)
+
+        if not os.path.isdir(Paths.cab_cache):
+            logging.info("Cabinet cache path doesn't exist, creating now.")
+            os.makedirs(Paths.cab_cache, exist_ok=True)
+
+        if not os.path.isdir(Paths.download_cache):
+            logging.info("Download cache path doesn't exist, creating now.")
+            os.makedirs(Paths.download_cache, exist_ok=True)
+
     @RunAsync.run_async
     def organize_components(self):
         """Get components catalog and organizes into supported_ lists."""
@@ -700,9 +874,7 @@ class Manager(metaclass=Singleton):
             and add it to the runners_available list.
             """
             version = (
-                subprocess.Popen(
-                    f"{wine_path} --version", stdout=subprocess.PIPE, shell=True
-                )
+                subprocess.Popen([wine_path, "--version"], stdout=subprocess.PIPE)
                 .communicate()[0]
                 .decode("utf-8")
             )
@@ -1397,6 +1569,7 @@ class Manager(metaclass=Singleton):
                 config[key] = value
 
         config.dump(os.path.join(bottle_path, "bottle.yml"))
+        WineCommand.invalidate_env(config)
 
         config.Update_Date = str(datetime.now())
 
@@ -1519,19 +1692,22 @@ class Manager(metaclass=Singleton):
             """
             self.install_dll_component(config, "vkd3d")
 
-        for dependency in config.Installed_Dependencies:
+        dependencies = [
+            d for d in config.Installed_Dependencies if d in self.supported_dependencies
+        ]
+        if dependencies:
             """
-            Install each declared dependency in the new bottle.
+            Install the declared dependencies in the new bottle.
             """
-            if dependency in self.supported_dependencies.keys():
-                dep = [dependency, self.supported_dependencies[dependency]]
-                res = self.dependency_manager.install(config, dep)
-                if not res.ok:
-                    logging.error(
-                        _("Failed to install dependency: %s") % dependency,
-                        jn=True,
-                    )
-                    return False
+            plan = self.dependency_manager.plan(config, dependencies)
+            res = self.dependency_manager.install_plan(config, plan)
+            if not res.ok:
+                logging.error(
+                    _("Failed to install dependency: %s")
+                    % res.data.get("dependency", "n/a"),
+                    jn=True,
+                )
+                return False
         logging.info(f"New bottle from config created: {config.Path}")
         self.update_bottles(silent=True)
         return True
@@ -1977,32 +2153,42 @@ class Manager(metaclass=Singleton):
                     self.install_dll_component(config, "nvapi", version=nvapi_name)
                     template_updated = True
 
-            for dep in env.get("Installed_Dependencies", []):
-                if template and dep in template["config"]["Installed_Dependencies"]:
-                    continue
-                if dep in self.supported_dependencies:
-                    cancel_result = check_cancel()
-                    if cancel_result is not None:
-                        return cancel_result
+            dependencies = [
+                dep
+                for dep in env.get("Installed_Dependencies", [])
+                if dep in self.supported_dependencies
+                and not (
+                    template and dep in template["config"]["Installed_Dependencies"]
+                )
+            ]
+            if dependencies:
+                cancel_result = check_cancel()
+                if cancel_result is not None:
+                    return cancel_result
 
-                    _dep = self.supported_dependencies[dep]
-                    log_update(
-                        _("Installing dependency: %s …")
-                        % _dep.get("Description", "n/a")
+                # resolve the whole list at once so shared prerequisites
+                # are fetched and installed only once
+                plan = self.dependency_manager.plan(config, dependencies)
+                log_update(
+                    _("Installing dependencies: %s …")
+                    % ", ".join(
+                        self.supported_dependencies.get(dep, {}).get("Description", dep)
+                        for dep in plan.names
                     )
-                    res = self.dependency_manager.install(config, [dep, _dep])
-                    if not res.ok:
-                        logging.error(
-                            _("Failed to install dependency: %s")
-                            % _dep.get("Description", "n/a"),
-                            jn=True,
-                        )
-                        log_update(
-                            _("Failed to install dependency: %s")
-                            % _dep.get("Description", "n/a")
-                        )
-                        return Result(False)
-                    template_updated = True
+                )
+                res = self.dependency_manager.install_plan(
+                    config, plan, cancel_event=cancel_event
+                )
+                if not res.ok and res.data.get("cancelled"):
+                    return abort_build()
+                if not res.ok:
+                    failed = res.data.get("dependency", "n/a")
+                    logging.error(
+                        _("Failed to install dependency: %s") % failed, jn=True
+                    )
+                    log_update(_("Failed to install dependency: %s") % failed)
+                    return Result(False)
+                template_updated = True
 
         # save bottle config
         cancel_result = check_cancel()
@@ -0,0 +1,228 @@
+# prefetch.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import concurrent.futures
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional
+
+from bottles.backend.logger import Logger
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils import json
+from bottles.backend.utils.manager import ManagerUtils
+
+logging = Logger()
+
+# mappings and descriptors pointing there are not worth warming
+_IGNORED = ("/proc/", "/sys/", "/dev/", "/run/", "/memfd:", "/tmp/.wine-")
+
+
+class PrefetchManager:
+    """
+    Warm the page cache with the files a program reads. While the
+    program runs, the files mapped or opened by the bottle processes are
+    sampled from /proc and stored, in order of first access, as a profile
+    in the bottle. Later launches ask the kernel to read those files ahead
+    from a thread pool, without waiting for it.
+    """
+
+    max_files = 4096
+    max_bytes = 1024 * 1024 * 1024
+    sample_interval = 0.5
+    workers = 4
+
+    _pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
+    def __init__(self, config: BottleConfig, program: str):
+        self.config = config
+        self.program = program
+
+        bottle = ManagerUtils.get_bottle_path(config)
+        if config.Environment == "Steam":
+            bottle = config.Path
+        self.bottle = bottle
+
+        digest = hashlib.sha1(program.encode("utf-8", "replace")).hexdigest()
+        self.path = os.path.join(bottle, "prefetch", f"{digest[:16]}.json")
+        self.files: List[str] = self.load()
+
+        self.__seen: Dict[str, None] = {}
+        self.__stop = threading.Event()
+        self.__recorder: Optional[threading.Thread] = None
+
+    def load(self) -> List[str]:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        if not isinstance(data, dict) or data.get("program") != self.program:
+            return []
+        return [f for f in data.get("files", []) if isinstance(f, str)]
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"program": self.program, "files": self.files}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Failed to save prefetch profile: {e}")
+
+    @classmethod
+    def get_pool(cls) -> concurrent.futures.ThreadPoolExecutor:
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=cls.workers, thread_name_prefix="BottlesPrefetch"
+                )
+            return cls._pool
+
+    def get_targets(self, cwd: Optional[str] = None) -> List[str]:
+        """
+        Return the files to warm: the recorded profile or, before the
+        first run, the program and optionally the files in its working
+        directory. The list stops at max_bytes.
+        """
+        files = list(self.files)
+        if not files:
+            files = [self.program]
+            if cwd and os.path.isdir(cwd):
+                with os.scandir(cwd) as entries:
+                    files += sorted(e.path for e in entries if e.is_file())
+
+        targets = []
+        total = 0
+        for path in dict.fromkeys(files):
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                continue
+            if total + size > self.max_bytes:
+                break
+            total += size
+            targets.append(path)
+        return targets
+
+    def warm(self, cwd: Optional[str] = None) -> List[concurrent.futures.Future]:
+        """Start reading the targets ahead, in order, on the thread pool."""
+        pool = self.get_pool()
+        return [pool.submit(self.warm_file, path) for path in self.get_targets(cwd)]
+
+    @staticmethod
+    def warm_file(path: str) -> bool:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                while os.read(fd, 1024 * 1024):
+                    pass
+            return True
+        except OSError:
+            return False
+        finally:
+            os.close(fd)
+
+    def start(self):
+        """Start recording the files the bottle processes access."""
+        if self.__recorder is not None:
+            return
+        self.__stop.clear()
+        self.__recorder = threading.Thread(
+            target=self.__record, daemon=True, name="BottlesPrefetchRecorder"
+        )
+        self.__recorder.start()
+
+    def stop(self):
+        """Stop recording and update the stored profile."""
+        if self.__recorder is None:
+            return
+        self.__stop.set()
+        self.__recorder.join()
+        self.__recorder = None
+        self.sample()
+
+        if not self.__seen:
+            return
+        # this run's order comes first, files seen only before follow
+        files = list(dict.fromkeys([*self.__seen, *self.files]))
+        self.files = files[: self.max_files]
+        self.save()
+
+    def __record(self):
+        while not self.__stop.is_set():
+            self.sample()
+            self.__stop.wait(self.sample_interval)
+
+    def sample(self):
+        """Record the files currently used by the bottle processes."""
+        marker = f"\0WINEPREFIX={self.bottle}\0".encode()
+        try:
+            pids = [p for p in os.listdir("/proc") if p.isdigit()]
+        except OSError:
+            return
+
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/environ", "rb") as f:
+                    if marker not in b"\0" + f.read():
+                        continue
+            except OSError:
+                continue
+            for path in self.__get_files(pid):
+                self.__add(path)
+
+    @staticmethod
+    def __get_files(pid: str) -> List[str]:
+        files = []
+        try:
+            with open(f"/proc/{pid}/maps") as f:
+                for line in f:
+                    fields = line.split(maxsplit=5)
+                    if len(fields) == 6 and fields[5].startswith("/"):
+                        files.append(fields[5].rstrip("\n"))
+        except OSError:
+            pass
+
+        fd_dir = f"/proc/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            fds = []
+        for fd in fds:
+            try:
+                files.append(os.readlink(os.path.join(fd_dir, fd)))
+            except OSError:
+                continue
+        return files
+
+    def __add(self, path: str):
+        if path in self.__seen or len(self.__seen) >= self.max_files:
+            return
+        if path.endswith(" (deleted)") or path.startswith(_IGNORED):
+            return
+        if path.startswith(os.path.dirname(self.path)):
+            return
+        if os.path.isfile(path):
+            self.__seen[path] = None
@@ -1,18 +1,27 @@
+import codecs
+import hashlib
 import os
 import uuid
-from typing import TYPE_CHECKING, Iterable, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from bottles.backend.logger import Logger
 from bottles.backend.models.config import BottleConfig
 from bottles.backend.models.registry_rule import RegistryRule
-from bottles.backend.wine.reg import Reg
+from bottles.backend.utils import json
 from bottles.backend.utils.manager import ManagerUtils
+from bottles.backend.wine.reg import Reg
+from bottles.backend.wine.register import WinRegister
+from bottles.backend.wine.wineserver import WineServer
 
 if TYPE_CHECKING:  # pragma: no cover
     from bottles.backend.managers.manager import Manager
 
 logging = Logger()
 
+# marks keys created by a rule section without values
+_EXISTS = "\0"
+_HIVES = ("system.reg", "user.reg", "userdef.reg")
+
 
 class RegistryRuleManager:
     """Manage reusable registry rules stored in bottle configs."""
@@ -70,21 +79,226 @@ class RegistryRuleManager:
                 or "all" in rule.triggers
             }
 
-        reg = Reg(config)
-        for name, rule in selected.items():
-            if not rule.keys.strip():
-                continue
-            logging.info(f"Applying registry rule '{name}' for {config.Name}")
-            reg_file = ManagerUtils.get_temp_path(f"{uuid.uuid4()}.reg")
-            keys = rule.keys.lstrip()
-            has_header = keys.upper().startswith("REGEDIT4") or keys.lower().startswith(
-                "windows registry editor version"
-            )
+        bundle = cls.merge_rules(list(selected.values()))
+        if bundle is None:
+            return
+
+        bottle = ManagerUtils.get_bottle_path(config)
+        state_path = os.path.join(bottle, ".registry_rules")
+        state = cls.__load_state(state_path)
+        if rule_names or state["stamps"] != cls.__get_stamps(bottle):
+            """
+            Something else wrote the registry since the last import,
+            or the rules were asked for explicitly: import them all.
+            """
+            state = {"keys": {}, "deleted": set(), "stamps": {}}
+        pending = cls.__filter_applied(bundle, state)
+        if not pending["deleted"] and not pending["keys"]:
+            logging.info(f"Registry rules already applied to {config.Name}")
+            return
 
+        logging.info(f"Applying registry rules {', '.join(selected)} for {config.Name}")
+        reg_file = ManagerUtils.get_temp_path(f"{uuid.uuid4()}.reg")
+        content = cls.__render(pending)
+        if pending["unicode"]:
+            with open(reg_file, "wb") as bundle_file:
+                bundle_file.write(codecs.BOM_UTF16_LE)
+                bundle_file.write(content.encode("utf-16le"))
+        else:
             with open(reg_file, "w") as bundle_file:
-                if not has_header:
-                    bundle_file.write("REGEDIT4\n\n")
-                bundle_file.write(keys.rstrip())
-                bundle_file.write("\n")
-            reg.launch(f"import {reg_file}", communicate=True, minimal=True)
-            os.remove(reg_file)
+                bundle_file.write(content)
+
+        wineserver = WineServer(config)
+        alive = not config.Runner or wineserver.is_alive_native() is not False
+        res = Reg(config).launch(f"import {reg_file}", communicate=True, minimal=True)
+        os.remove(reg_file)
+
+        if res is not None and not res.status:
+            logging.error(f"Failed to apply registry rules for {config.Name}")
+            return
+        if not alive:
+            # the server started for the import writes the hives on exit
+            wineserver.wait()
+        state = cls.__update_state(state, pending)
+        state["stamps"] = cls.__get_stamps(bottle)
+        cls.__save_state(state_path, state)
+
+    @staticmethod
+    def parse_keys(text: str) -> Iterator[Tuple[str, bool, List[Tuple[str, str]]]]:
+        """
+        Yield (key, deleted, [(value name, line)]) for every section of
+        a .reg snippet, continued lines are joined.
+        """
+        key = None
+        deleted = False
+        values: List[Tuple[str, str]] = []
+        pending = ""
+
+        for line in text.splitlines():
+            line = line.strip()
+            if pending:
+                line = pending + line
+                pending = ""
+            if line.endswith("\\"):
+                pending = line[:-1]
+                continue
+
+            if line.startswith("[") and line.endswith("]"):
+                if key is not None:
+                    yield key, deleted, values
+                deleted = line.startswith("[-")
+                key = line[2:-1] if deleted else line[1:-1]
+                values = []
+                continue
+
+            if key is None or deleted or not line or line.startswith(";"):
+                continue
+            name, _data = WinRegister.split_value(line)
+            if name is not None:
+                values.append((name, line))
+
+        if key is not None:
+            yield key, deleted, values
+
+    @classmethod
+    def merge_rules(cls, rules: List[RegistryRule]) -> Optional[dict]:
+        """
+        Merge the sections of the given rules, in order, so later rules
+        win over earlier ones. Return None if there is nothing to import.
+        """
+        keys: Dict[str, Tuple[str, Dict[str, str]]] = {}
+        deleted: Dict[str, str] = {}
+        unicode = False
+
+        for rule in rules:
+            text = rule.keys.strip()
+            if not text:
+                continue
+            unicode |= text.lower().startswith("windows registry editor version")
+
+            for key, is_deleted, values in cls.parse_keys(text):
+                lower = key.lower()
+                if is_deleted:
+                    for _key in [k for k in keys if cls.__is_under(k, lower)]:
+                        del keys[_key]
+                    deleted[lower] = key
+                    continue
+
+                section = keys.setdefault(lower, (key, {}))[1]
+                for name, line in values:
+                    section[name.lower()] = line
+
+        if not keys and not deleted:
+            return None
+
+        return {
+            "unicode": unicode,
+            "deleted": [deleted[k] for k in sorted(deleted, key=WinRegister.sort_key)],
+            "keys": [keys[k] for k in sorted(keys, key=WinRegister.sort_key)],
+        }
+
+    @staticmethod
+    def __is_under(key: str, parent: str) -> bool:
+        return key == parent or key.startswith(parent + "\\")
+
+    @staticmethod
+    def __hash(line: str) -> str:
+        return hashlib.sha256(
+            line.encode("utf-8", errors="surrogateescape")
+        ).hexdigest()
+
+    @classmethod
+    def __filter_applied(cls, bundle: dict, state: dict) -> dict:
+        """Drop the deletions and values already applied to the prefix."""
+        applied = state["keys"]
+        keys = []
+        for key, values in bundle["keys"]:
+            done = applied.get(key.lower(), {})
+            if not values:
+                if _EXISTS not in done:
+                    keys.append((key, {}))
+                continue
+            todo = {
+                name: line
+                for name, line in values.items()
+                if done.get(name) != cls.__hash(line)
+            }
+            if todo:
+                keys.append((key, todo))
+
+        return {
+            "unicode": bundle["unicode"],
+            "deleted": [
+                k for k in bundle["deleted"] if k.lower() not in state["deleted"]
+            ],
+            "keys": keys,
+        }
+
+    @classmethod
+    def __update_state(cls, state: dict, applied: dict) -> dict:
+        keys = state["keys"]
+        deleted = set(state["deleted"])
+
+        for key in applied["deleted"]:
+            lower = key.lower()
+            for _key in [k for k in keys if cls.__is_under(k, lower)]:
+                del keys[_key]
+            deleted.add(lower)
+
+        for key, values in applied["keys"]:
+            lower = key.lower()
+            deleted = {k for k in deleted if not cls.__is_under(lower, k)}
+            done = keys.setdefault(lower, {})
+            done[_EXISTS] = ""
+            for name, line in values.items():
+                done[name] = cls.__hash(line)
+
+        return {"keys": keys, "deleted": sorted(deleted)}
+
+    @staticmethod
+    def __render(bundle: dict) -> str:
+        if bundle["unicode"]:
+            content = "Windows Registry Editor Version 5.00\n\n"
+        else:
+            content = "REGEDIT4\n\n"
+        for key in bundle["deleted"]:
+            content += f"[-{key}]\n\n"
+        for key, values in bundle["keys"]:
+            content += f"[{key}]\n"
+            for line in values.values():
+                content += f"{line}\n"
+            content += "\n"
+        return content
+
+    @staticmethod
+    def __get_stamps(bottle: str) -> dict:
+        """Return the size and mtime of the hive files of the prefix."""
+        stamps = {}
+        for hive in _HIVES:
+            try:
+                st = os.stat(os.path.join(bottle, hive))
+            except OSError:
+                continue
+            stamps[hive] = [st.st_size, st.st_mtime_ns]
+        return stamps
+
+    @staticmethod
+    def __load_state(path: str) -> dict:
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            return {
+                "keys": dict(state["keys"]),
+                "deleted": set(state["deleted"]),
+                "stamps": dict(state.get("stamps", {})),
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return {"keys": {}, "deleted": set(), "stamps": {}}
+
+    @staticmethod
+    def __save_state(path: str, state: dict):
+        try:
+            with open(path, "w") as f:
+                json.dump(state, f)
+        except OSError as e:
+            logging.warning(f"Failed to save registry rules state: {e}")
@@ -16,25 +16,109 @@
 #
 
 import os
-from functools import lru_cache
+import threading
+import time
+from typing import Dict, Optional
 
 from bottles.backend.globals import Paths
+from bottles.backend.logger import Logger
+
+logging = Logger()
 
 
 class RuntimeManager:
+    # seconds between two background checks of a detected runtime
+    refresh_interval = 30.0
+
+    # filter -> (stamp, checked at, runtimes)
+    _cache: Dict[str, tuple] = {}
+    _refreshing: set = set()
+    _lock = threading.Lock()
+
     @staticmethod
-    @lru_cache
     def get_runtimes(_filter: str = "bottles"):
-        runtimes = {
-            "bottles": RuntimeManager.__get_bottles_runtime(),
-            "steam": RuntimeManager.__get_steam_runtime(),
-        }
+        """
+        Return the runtimes matching the filter. Detection runs once, the
+        result is then served from memory: the bottles runtime is checked
+        again when its directories or manifest change, the others are
+        refreshed in background once refresh_interval has passed.
+        """
+        stamp = RuntimeManager.__get_stamp(_filter)
+        cached = RuntimeManager._cache.get(_filter)
+
+        if cached is None or (stamp is not None and cached[0] != stamp):
+            runtimes = RuntimeManager.refresh(_filter, stamp)
+        else:
+            runtimes = cached[2]
+            if time.monotonic() - cached[1] > RuntimeManager.refresh_interval:
+                RuntimeManager.__schedule_refresh(_filter)
 
         if _filter == "steam":
-            if len(runtimes.get("steam", {})) == 0:
+            if len(runtimes) == 0:
                 return False
 
-        return runtimes.get(_filter, False)
+        return runtimes
+
+    @staticmethod
+    def refresh(_filter: str = "bottles", stamp: Optional[list] = None):
+        """Detect the runtimes matching the filter and cache the result."""
+        if stamp is None:
+            stamp = RuntimeManager.__get_stamp(_filter)
+
+        if _filter == "bottles":
+            runtimes = RuntimeManager.__get_bottles_runtime()
+        elif _filter == "steam":
+            runtimes = RuntimeManager.__get_steam_runtime()
+        else:
+            runtimes = False
+
+        with RuntimeManager._lock:
+            RuntimeManager._cache[_filter] = (stamp, time.monotonic(), runtimes)
+        return runtimes
+
+    @staticmethod
+    def __schedule_refresh(_filter: str):
+        with RuntimeManager._lock:
+            if _filter in RuntimeManager._refreshing:
+                return
+            RuntimeManager._refreshing.add(_filter)
+
+        def _refresh():
+            try:
+                RuntimeManager.refresh(_filter)
+            except Exception as e:
+                logging.warning(f"Failed to refresh the {_filter} runtime: {e}")
+            finally:
+                RuntimeManager._refreshing.discard(_filter)
+
+        threading.Thread(target=_refresh, daemon=True).start()
+
+    @staticmethod
+    def __get_stamp(_filter: str) -> Optional[list]:
+        """
+        Return what the bottles runtime detection depends on: the runtime
+        directory, its direct children and their manifest. Other runtimes
+        have no stamp and are only refreshed in background.
+        """
+        if _filter != "bottles":
+            return None
+
+        stamp = []
+        try:
+            stamp.append(os.stat(Paths.runtimes).st_mtime_ns)
+            with os.scandir(Paths.runtimes) as it:
+                children = sorted(e.path for e in it if e.is_dir())
+        except OSError:
+            return stamp
+
+        for child in children:
+            for path in (child, os.path.join(child, "manifest.yml")):
+                try:
+                    st = os.stat(path)
+                    stamp.append([path, st.st_mtime_ns, st.st_size])
+                except OSError:
+                    stamp.append([path, None, None])
+        return stamp
 
     @staticmethod
     def get_runtime_env(_filter: str = "bottles"):
@@ -79,28 +163,39 @@ class RuntimeManager:
         return False
 
     @staticmethod
-    def __get_runtime(paths: list, structure: list):
-        def check_structure(found, expected):
-            for e in expected:
-                if e not in found:
-                    return False
-            return True
+    def __get_runtime_root(runtime_path: str, structure: list) -> Optional[str]:
+        """
+        Return the directory holding the expected structure, either the
+        runtime path itself or one of its direct children.
+        """
+
+        def check_structure(path):
+            return all(os.path.isdir(os.path.join(path, s)) for s in structure)
+
+        if check_structure(runtime_path):
+            return runtime_path
 
+        with os.scandir(runtime_path) as it:
+            children = sorted(e.path for e in it if e.is_dir())
+        for child in children:
+            if check_structure(child):
+                return child
+
+        return None
+
+    @staticmethod
+    def __get_runtime(paths: list, structure: list):
         for runtime_path in paths:
-            if not os.path.exists(runtime_path):
+            if not os.path.isdir(runtime_path):
                 continue
 
-            structure_found = []
-            for root, dirs, files in os.walk(runtime_path):
-                for d in dirs:
-                    structure_found.append(d)
-
-            if not check_structure(structure_found, structure):
+            root = RuntimeManager.__get_runtime_root(runtime_path, structure)
+            if root is None:
                 return []
 
-            res = [f"{runtime_path}/{s}" for s in structure]
-            eac_path = os.path.join(runtime_path, "EasyAntiCheatRuntime")
-            be_path = os.path.join(runtime_path, "BattlEyeRuntime")
+            res = [f"{root}/{s}" for s in structure]
+            eac_path = os.path.join(root, "EasyAntiCheatRuntime")
+            be_path = os.path.join(root, "BattlEyeRuntime")
 
             if os.path.isdir(eac_path):
                 res.append(eac_path)
@@ -18,10 +18,11 @@
 
 import glob
 import os
-import shlex
 import subprocess
 from typing import Optional
 
+from bottles.backend.utils.command import Command, get_argv
+
 
 class SandboxManager:
     def __init__(
@@ -51,64 +52,60 @@ class SandboxManager:
         self.share_gpu = share_gpu
         self.__uid = str(os.getuid())
 
-    def __get_bwrap(self, cmd: str):
-        _cmd = ["bwrap"]
+    def __get_bwrap(self, cmd: str) -> Command:
+        _cmd = Command("bwrap")
 
         if self.envs:
-            _cmd += [f"--setenv {k} {shlex.quote(v)}" for k, v in self.envs.items()]
+            for k, v in self.envs.items():
+                _cmd.add("--setenv", k, str(v))
 
         if self.share_host_ro:
-            _cmd.append("--ro-bind / /")
+            _cmd.add("--ro-bind", "/", "/")
 
         if self.chdir:
-            _cmd.append(f"--chdir {shlex.quote(self.chdir)}")
-            _cmd.append(f"--bind {shlex.quote(self.chdir)} {shlex.quote(self.chdir)}")
+            _cmd.add("--chdir", self.chdir)
+            _cmd.add("--bind", self.chdir, self.chdir)
 
         if self.clear_env:
-            _cmd.append("--clearenv")
+            _cmd.add("--clearenv")
 
-        if self.share_paths_ro:
-            _cmd += [
-                f"--ro-bind {shlex.quote(p)} {shlex.quote(p)}"
-                for p in self.share_paths_ro
-            ]
+        for p in self.share_paths_ro:
+            _cmd.add("--ro-bind", p, p)
 
-        if self.share_paths_rw:
-            _cmd += [
-                f"--bind {shlex.quote(p)} {shlex.quote(p)}" for p in self.share_paths_rw
-            ]
+        for p in self.share_paths_rw:
+            _cmd.add("--bind", p, p)
 
         if self.share_sound:
             pulse_path = f"/run/user/{self.__uid}/pulse"
             if os.path.exists(pulse_path):
-                _cmd.append(
-                    f"--ro-bind {shlex.quote(pulse_path)} {shlex.quote(pulse_path)}"
-                )
+                _cmd.add("--ro-bind", pulse_path, pulse_path)
 
         if self.share_gpu:
             for device in glob.glob("/dev/dri/*"):
-                _cmd += ["--dev-bind", shlex.quote(device), shlex.quote(device)]
+                _cmd.add("--dev-bind", device, device)
             for device in glob.glob("/dev/nvidia*"):
-                _cmd += ["--dev-bind", shlex.quote(device), shlex.quote(device)]
+                _cmd.add("--dev-bind", device, device)
 
         if self.share_display:
             for device in glob.glob("/dev/video*"):
-                _cmd += ["--dev-bind", shlex.quote(device), shlex.quote(device)]
+                _cmd.add("--dev-bind", device, device)
 
-        _cmd.append("--share-net" if self.share_net else "--unshare-net")
-        _cmd.append("--share-user" if self.share_user else "--unshare-user")
-        _cmd.append(cmd)
+        _cmd.add("--share-net" if self.share_net else "--unshare-net")
+        _cmd.add("--share-user" if self.share_user else "--unshare-user")
+        # shell features of the command must apply inside the sandbox
+        _cmd.add(*get_argv(cmd))
 
         return _cmd
 
-    def get_cmd(self, cmd: str):
-        _cmd = self.__get_bwrap(cmd)
-        return " ".join(_cmd)
+    def get_cmd(self, cmd: str) -> str:
+        return str(self.__get_bwrap(cmd))
+
+    def get_argv(self, cmd: str) -> list:
+        return self.__get_bwrap(cmd).argv
 
     def run(self, cmd: str) -> subprocess.Popen[bytes]:
         return subprocess.Popen(
-            self.get_cmd(cmd),
-            shell=True,
+            self.get_argv(cmd),
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
         )
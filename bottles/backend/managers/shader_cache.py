@@ -0,0 +1,257 @@
+# shader_cache.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import re
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bottles.backend.globals import Paths
+from bottles.backend.logger import Logger
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.file import FileUtils
+from bottles.backend.utils.gpu import GPUUtils
+from bottles.backend.utils.manager import ManagerUtils
+
+logging = Logger()
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._+-]+")
+
+
+class ShaderCacheManager:
+    """
+    Account for and bound the shader caches written by DXVK, VKD3D and
+    the GL/Mesa drivers. Every bottle has its own caches under
+    <bottle>/cache, bottles with shared_shader_cache enabled use a shared
+    root instead, keyed by GPU, driver and component version so only
+    compatible caches are ever shared. When the caches grow past the
+    quota the least recently used files are evicted.
+    """
+
+    # cache kind -> BottleConfig field holding the component version,
+    # the GL and Mesa caches depend on the driver only
+    kinds = {
+        "dxvk_state": "DXVK",
+        "gl_shader": None,
+        "mesa_shader": None,
+        "vkd3d_shader": "VKD3D",
+    }
+
+    # bytes, 0 disables the eviction
+    quota = 4 * 1024 * 1024 * 1024
+
+    # (boot id, discrete) -> GPU key, the topology only changes on reboot
+    _gpu_keys: Dict[Tuple[Optional[str], bool], str] = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_bottle_cache_path(config: BottleConfig, kind: str) -> str:
+        return os.path.join(ManagerUtils.get_bottle_path(config), "cache", kind)
+
+    @classmethod
+    def get_path(cls, config: BottleConfig, kind: str) -> str:
+        """
+        Return the directory the given cache kind of the bottle is
+        written to, the shared one is created when missing.
+        """
+        if not config.Parameters.shared_shader_cache:
+            return cls.get_bottle_cache_path(config, kind)
+
+        key = cls.get_gpu_key(config.Parameters.discrete_gpu)
+        path = os.path.join(Paths.shader_cache, key, kind)
+        component = cls.kinds.get(kind)
+        if component:
+            path = os.path.join(path, cls.__clean(getattr(config, component)))
+        try:
+            os.makedirs(path, exist_ok=True)
+        except OSError as e:
+            logging.warning(f"Failed to create the shared shader cache: {e}")
+            return cls.get_bottle_cache_path(config, kind)
+        return path
+
+    @classmethod
+    def get_gpu_key(cls, discrete: bool = False) -> str:
+        """
+        Return the key identifying the GPU the caches are built for: its
+        vendor and PCI device id, the kernel driver and its version.
+        """
+        boot_id = GPUUtils.get_boot_id()
+        with cls._lock:
+            key = cls._gpu_keys.get((boot_id, discrete))
+            if key is None:
+                key = cls.__detect_gpu_key(discrete)
+                cls._gpu_keys[(boot_id, discrete)] = key
+            return key
+
+    @classmethod
+    def __detect_gpu_key(cls, discrete: bool) -> str:
+        cards = GPUUtils.list_cards()
+        if not cards:
+            return "unknown"
+
+        card = next((c for c in cards if c["boot_vga"]), cards[0])
+        if discrete:
+            card = next((c for c in cards if c is not card), card)
+
+        device = os.path.join(GPUUtils.sysfs, "class/drm", card["card"], "device")
+        device_id = cls.__read(os.path.join(device, "device")) or "0"
+        driver = card["driver"] or "none"
+        # out of tree drivers carry a version, in tree ones follow the kernel
+        version = cls.__read(os.path.join(GPUUtils.sysfs, "module", driver, "version"))
+        version = version or os.uname().release
+
+        parts = (card["vendor"], device_id.removeprefix("0x"), driver, version)
+        return cls.__clean("-".join(parts))
+
+    @staticmethod
+    def __read(path: str) -> Optional[str]:
+        try:
+            with open(path) as f:
+                return f.read().strip().lower() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def __clean(name: str) -> str:
+        return _UNSAFE.sub("_", name or "none")
+
+    @staticmethod
+    def get_files(path: str) -> List[Tuple[float, int, str]]:
+        """
+        Return (last use, size, path) of the files in the directory, the
+        last use is the latest of access and modification time since
+        access times are not updated on relatime mounts.
+        """
+        files = []
+        for root, _dirs, names in os.walk(path):
+            for name in names:
+                file = os.path.join(root, name)
+                try:
+                    st = os.lstat(file)
+                except OSError:
+                    continue
+                files.append((max(st.st_atime, st.st_mtime), st.st_size, file))
+        return files
+
+    @classmethod
+    def get_size(cls, path: str) -> int:
+        return sum(size for _used, size, _file in cls.get_files(path))
+
+    @classmethod
+    def get_bottle_usage(cls, config: BottleConfig) -> Dict[str, int]:
+        """Return the size of each cache kind stored in the bottle."""
+        return {
+            kind: cls.get_size(cls.get_bottle_cache_path(config, kind))
+            for kind in cls.kinds
+        }
+
+    @classmethod
+    def get_shared_usage(cls) -> Dict[str, int]:
+        """Return the size of each GPU key under the shared root."""
+        try:
+            keys = sorted(os.listdir(Paths.shader_cache))
+        except OSError:
+            return {}
+        return {
+            key: cls.get_size(os.path.join(Paths.shader_cache, key)) for key in keys
+        }
+
+    @classmethod
+    def get_details(
+        cls, configs: Iterable[BottleConfig], quota: Optional[int] = None
+    ) -> dict:
+        """Return the per bottle and global accounting of the caches."""
+        human = FileUtils.get_human_size
+        bottles = []
+        total = 0
+        for config in configs:
+            usage = cls.get_bottle_usage(config)
+            size = sum(usage.values())
+            total += size
+            bottles.append(
+                {
+                    "name": config.Name,
+                    "kinds": usage,
+                    "shared": config.Parameters.shared_shader_cache,
+                    "size": human(size),
+                    "size_bytes": size,
+                }
+            )
+
+        shared = [
+            {"key": key, "size": human(size), "size_bytes": size}
+            for key, size in cls.get_shared_usage().items()
+        ]
+        total += sum(s["size_bytes"] for s in shared)
+
+        return {
+            "bottles": bottles,
+            "shared": shared,
+            "quota_bytes": cls.quota if quota is None else quota,
+            "size": human(total),
+            "size_bytes": total,
+        }
+
+    @classmethod
+    def evict(cls, configs: Iterable[BottleConfig], quota: Optional[int] = None) -> int:
+        """
+        Delete the least recently used cache files of the bottles and of
+        the shared root until they fit in the quota, return the number of
+        bytes freed.
+        """
+        quota = cls.quota if quota is None else quota
+        if quota <= 0:
+            return 0
+
+        roots = [Paths.shader_cache]
+        for config in configs:
+            roots += [cls.get_bottle_cache_path(config, kind) for kind in cls.kinds]
+
+        files = []
+        for root in roots:
+            files += cls.get_files(root)
+        total = sum(size for _used, size, _file in files)
+        if total <= quota:
+            return 0
+
+        freed = 0
+        for _used, size, file in sorted(files):
+            if total - freed <= quota:
+                break
+            try:
+                os.remove(file)
+            except OSError as e:
+                logging.warning(f"Failed to evict shader cache {file}: {e}")
+                continue
+            freed += size
+
+        logging.info(f"Evicted {FileUtils.get_human_size(freed)} of shader caches")
+        return freed
+
+    @classmethod
+    def clear(cls, config: BottleConfig):
+        """Empty the shader caches stored in the bottle."""
+        for kind in cls.kinds:
+            path = cls.get_bottle_cache_path(config, kind)
+            shutil.rmtree(path, ignore_errors=True)
+            os.makedirs(path, exist_ok=True)
+
+    @staticmethod
+    def clear_shared():
+        shutil.rmtree(Paths.shader_cache, ignore_errors=True)
+        os.makedirs(Paths.shader_cache, exist_ok=True)
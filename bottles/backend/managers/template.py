@@ -26,7 +26,9 @@ from bottles.backend.globals import Paths
 from bottles.backend.logger import Logger
 from bottles.backend.models.config import BottleConfig
 from bottles.backend.models.samples import Samples
+from bottles.backend.state import TaskType
 from bottles.backend.utils import yaml
+from bottles.backend.utils.background import BackgroundExecutor
 from bottles.backend.utils.manager import ManagerUtils
 
 logging = Logger()
@@ -52,14 +54,19 @@ class TemplateManager:
         delattr(config, "Creation_Date")
         delattr(config, "Update_Date")
 
-        ignored = ["dosdevices", "states", ".fvs", "*.yml.*"]
+        ignored = ["dosdevices", "states", ".fvs", "*.yml.*", "prefetch"]
 
         _path = os.path.join(Paths.templates, _uuid)
         logging.info("Copying files …")
 
         with contextlib.suppress(FileNotFoundError):
-            shutil.copytree(
-                bottle, _path, symlinks=True, ignore=shutil.ignore_patterns(*ignored)
+            BackgroundExecutor.run(
+                TaskType.Template,
+                shutil.copytree,
+                bottle,
+                _path,
+                symlinks=True,
+                ignore=shutil.ignore_patterns(*ignored),
             )
 
         template = {
@@ -33,8 +33,9 @@ from fvs.repo import FVSRepo  # type: ignore [import-untyped]
 from bottles.backend.logger import Logger
 from bottles.backend.models.config import BottleConfig
 from bottles.backend.models.result import Result
-from bottles.backend.state import Task, TaskManager
+from bottles.backend.state import Task, TaskManager, TaskType
 from bottles.backend.utils import yaml
+from bottles.backend.utils.background import BackgroundExecutor
 from bottles.backend.utils.file import FileUtils
 from bottles.backend.utils.manager import ManagerUtils
 
@@ -83,9 +84,13 @@ class VersioningManager:
             repo_path=ManagerUtils.get_bottle_path(config),
             use_compression=config.Parameters.versioning_compression,
         )
-        task_id = TaskManager.add(Task(title=_("Committing state …")))
+        task_id = TaskManager.add(
+            Task(title=_("Committing state …"), task_type=TaskType.Versioning)
+        )
         try:
-            repo.commit(message, ignore=patterns)
+            BackgroundExecutor.run(
+                TaskType.Versioning, repo.commit, message, ignore=patterns
+            )
         except FVSNothingToCommit:
             TaskManager.remove(task_id)
             return Result(status=False, message=_("Nothing to commit"))
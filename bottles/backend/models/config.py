@@ -114,6 +114,14 @@ class BottleParams(DictCompatMixIn):
     versioning_exclusion_patterns: bool = False
     vmtouch: bool = False
     vmtouch_cache_cwd: bool = False
+    shared_shader_cache: bool = False
+    cpu_affinity: str = ""
+    nice: int = 0
+    ionice_class: str = ""
+    cgroup_scope: bool = False
+    cgroup_cpu_weight: int = 0
+    cgroup_memory_high: str = ""
+    cgroup_io_weight: int = 0
 
 
 @dataclass
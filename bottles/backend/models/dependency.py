@@ -0,0 +1,32 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass
+class DependencyPlan:
+    """Install plan for a set of dependencies and their prerequisites.
+
+    Dependencies are listed in install order, each one after the
+    prerequisites it declares. Prerequisites already installed in the
+    bottle are left out, the requested dependencies are always included.
+    """
+
+    requested: List[str] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    manifests: Dict[str, dict] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+    download_size: int = 0  # bytes not already in the temp directory
+    unknown_sizes: int = 0  # files whose size could not be determined
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing
+
+    def to_dict(self) -> dict:
+        return {
+            "requested": self.requested,
+            "names": self.names,
+            "missing": self.missing,
+            "download_size": self.download_size,
+            "unknown_sizes": self.unknown_sizes,
+        }
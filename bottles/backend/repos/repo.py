@@ -20,9 +20,10 @@ from io import BytesIO
 import pycurl
 
 from bottles.backend.logger import Logger
-from bottles.backend.state import EventManager, Events
+from bottles.backend.state import EventManager, Events, TaskType
 from bottles.backend.utils import yaml
 from bottles.backend.utils.threading import RunAsync
+from bottles.backend.utils.throttle import SessionThrottle
 
 logging = Logger()
 
@@ -51,6 +52,7 @@ class Repo:
             c.setopt(c.URL, index)
             c.setopt(c.FOLLOWLOCATION, True)
             c.setopt(c.WRITEDATA, buffer)
+            self.__limit_rate(c)
             c.perform()
             c.close()
 
@@ -62,6 +64,12 @@ class Repo:
             logging.error(f"Cannot fetch {self.name} repository index.")
             return {}
 
+    @staticmethod
+    def __limit_rate(c: pycurl.Curl):
+        rate = SessionThrottle.get_rate(TaskType.Catalog)
+        if rate:
+            c.setopt(c.MAX_RECV_SPEED_LARGE, rate)
+
     def get_manifest(self, url: str, plain: bool = False) -> str | dict | bool:
         try:
             buffer = BytesIO()
@@ -70,6 +78,7 @@ class Repo:
             c.setopt(c.URL, url)
             c.setopt(c.FOLLOWLOCATION, True)
             c.setopt(c.WRITEDATA, buffer)
+            self.__limit_rate(c)
             c.perform()
             c.close()
 
@@ -61,6 +61,31 @@ class Status(Enum):
     CANCELLED = "cancelled"
 
 
+class TaskType(Enum):
+    """Heavy jobs that can run in the background or be throttled"""
+
+    Backup = "backup"
+    Versioning = "versioning"
+    Template = "template"
+    Extraction = "extraction"
+    Checksum = "checksum"
+    Download = "download"
+    Catalog = "catalog"
+
+
+class ExecutionClass(Enum):
+    NORMAL = "normal"
+    BACKGROUND = "background"  # lowest CPU priority, idle I/O class
+
+
+class ThrottlePolicy(Enum):
+    """What happens to a job while programs are running"""
+
+    NONE = "none"
+    LIMIT = "limit"  # lower bandwidth and thread counts
+    PAUSE = "pause"  # wait for the programs to exit
+
+
 class TaskStreamUpdateHandler(Protocol):
     def __call__(
         self,
@@ -88,6 +113,7 @@ class Task:
     _subtitle: str = ""
     hidden: bool = False  # hide from UI
     cancellable: bool = False
+    task_type: Optional[TaskType] = None
 
     def __init__(
         self,
@@ -95,11 +121,19 @@ class Task:
         subtitle: str = "",
         hidden: bool = False,
         cancellable: bool = False,
+        task_type: Optional[TaskType] = None,
     ):
         self.title = title
         self.subtitle = subtitle
         self.hidden = hidden
         self.cancellable = cancellable
+        self.task_type = task_type
+
+    @property
+    def execution_class(self) -> ExecutionClass:
+        from bottles.backend.utils.background import BackgroundExecutor
+
+        return BackgroundExecutor.get_class(self.task_type)
 
     @property
     def task_id(self) -> Optional[UUID]:
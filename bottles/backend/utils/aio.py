@@ -0,0 +1,75 @@
+# aio.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Iterable, List, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop shared by the synchronous callers of the
+    asyncio APIs, it runs in a daemon thread started on first use.
+    """
+    global _loop
+
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, daemon=True, name="BottlesAsyncLoop"
+            ).start()
+            _loop = loop
+        return _loop
+
+
+def run_sync(coro: Awaitable, timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine from synchronous code and return its result.
+    If the timeout expires the coroutine is cancelled and TimeoutError
+    is raised.
+    """
+    loop = get_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        raise RuntimeError("run_sync can't be called from the shared loop")
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError from None
+
+
+def run_all(coros: Iterable[Awaitable], timeout: Optional[float] = None) -> List:
+    """
+    Run the coroutines concurrently from synchronous code and return
+    their results in order. Exceptions are returned, not raised.
+    """
+
+    async def _gather():
+        return await asyncio.gather(*coros, return_exceptions=True)
+
+    return run_sync(_gather(), timeout)
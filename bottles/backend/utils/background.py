@@ -0,0 +1,157 @@
+# background.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import concurrent.futures
+import ctypes
+import os
+import platform
+import threading
+from typing import Any, Callable, Optional
+
+from bottles.backend.logger import Logger
+from bottles.backend.state import ExecutionClass, TaskType
+from bottles.backend.utils.throttle import SessionThrottle
+
+logging = Logger()
+
+# ioprio_set syscall number per architecture
+_IOPRIO_SET = {
+    "x86_64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "armv7l": 314,
+    "ppc64le": 273,
+    "riscv64": 30,
+}
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+
+# settings key telling whether a task type runs in the background class
+_SETTINGS = {
+    TaskType.Backup: "background-backup",
+    TaskType.Versioning: "background-versioning",
+    TaskType.Template: "background-templates",
+    TaskType.Extraction: "background-extraction",
+    TaskType.Checksum: "background-checksum",
+}
+
+
+class BackgroundExecutor:
+    """
+    Run maintenance jobs in the background execution class: on worker
+    threads with the lowest CPU priority and the idle I/O class, so they
+    only use the resources a running game leaves free. The processes
+    those jobs spawn inherit the priorities. Each task type can be moved
+    back to the normal class in the settings.
+    """
+
+    workers = 2
+    nice = 19
+
+    _settings: Any = None
+    _pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+    _local = threading.local()
+
+    @classmethod
+    def configure(cls, settings):
+        """Read the execution class of each task type from the settings."""
+        cls._settings = settings
+
+    @classmethod
+    def get_class(cls, task_type: Optional[TaskType]) -> ExecutionClass:
+        if task_type is None:
+            return ExecutionClass.NORMAL
+        key = _SETTINGS.get(task_type)
+        if key is None:
+            return ExecutionClass.NORMAL
+        if cls._settings is None:
+            return ExecutionClass.BACKGROUND
+        try:
+            background = cls._settings.get_boolean(key)
+        except Exception:
+            background = True
+        return ExecutionClass.BACKGROUND if background else ExecutionClass.NORMAL
+
+    @classmethod
+    def get_pool(cls) -> concurrent.futures.ThreadPoolExecutor:
+        with cls._lock:
+            if cls._pool is None:
+                cls._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=cls.workers,
+                    thread_name_prefix="BottlesBackground",
+                    initializer=cls.__init_worker,
+                )
+            return cls._pool
+
+    @classmethod
+    def __init_worker(cls):
+        cls._local.background = True
+        cls.lower_priority()
+
+    @classmethod
+    def lower_priority(cls):
+        """
+        Move the calling thread to the lowest CPU priority and the idle
+        I/O class. An unprivileged thread can't undo this, so it is only
+        meant for threads dedicated to background jobs.
+        """
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, cls.nice)
+        except (AttributeError, OSError) as e:
+            logging.debug(f"Failed to lower the CPU priority: {e}")
+
+        number = _IOPRIO_SET.get(platform.machine())
+        if number is None:
+            return
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            ioprio = _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT
+            if libc.syscall(number, _IOPRIO_WHO_PROCESS, 0, ioprio) != 0:
+                raise OSError(ctypes.get_errno(), "ioprio_set failed")
+        except OSError as e:
+            logging.debug(f"Failed to set the idle I/O class: {e}")
+
+    @classmethod
+    def is_background_thread(cls) -> bool:
+        return getattr(cls._local, "background", False)
+
+    @classmethod
+    def run(cls, task_type: TaskType, func: Callable, *args, **kwargs):
+        """
+        Run the job in the execution class of its task type and return
+        its result, the caller waits for it in both cases. Jobs paused
+        by the session throttle start once the running programs exit.
+        """
+        if cls.is_background_thread():
+            return func(*args, **kwargs)
+
+        # paused jobs wait on the calling thread, holding a worker of the
+        # pool would block the limited jobs queued behind them
+        SessionThrottle.wait(task_type)
+        if cls.get_class(task_type) is ExecutionClass.NORMAL:
+            return func(*args, **kwargs)
+        return cls.get_pool().submit(func, *args, **kwargs).result()
+
+    @classmethod
+    def get_workers(cls, task_type: TaskType, workers: int) -> int:
+        """Return how many threads a job of the task type should use."""
+        if cls.get_class(task_type) is ExecutionClass.BACKGROUND:
+            workers = max(1, workers // 2)
+        return SessionThrottle.get_workers(task_type, workers)
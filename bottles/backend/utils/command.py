@@ -0,0 +1,115 @@
+# command.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import re
+import shlex
+from typing import Iterator, List, Optional
+
+SHELL = "/bin/sh"
+
+# characters with a meaning for sh outside of quotes, besides blanks
+_OPERATORS = set(";&|<>()\n$`")
+_GLOBS = set("*?[")
+_ASSIGNMENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*=")
+
+
+def needs_shell(command: str) -> bool:
+    """
+    Tell whether the command line uses more than quoting and word
+    splitting: operators, redirections, expansions, globs, comments or
+    variable assignments. Those are left to sh, anything else can be
+    split with shlex and executed directly with the same result.
+    """
+    quote = None
+    word_start = True
+    chars = iter(command)
+    for c in chars:
+        if quote == "'":
+            if c == "'":
+                quote = None
+            continue
+
+        if c == "\\":
+            escaped = next(chars, "")
+            if quote == '"' and escaped in "$`\n":
+                return True
+            if quote is None and escaped == "\n":
+                return True
+            word_start = False
+            continue
+
+        if quote == '"':
+            if c == '"':
+                quote = None
+            elif c in "$`":
+                return True
+            continue
+
+        if c in "'\"":
+            quote = c
+        elif c in _OPERATORS or c in _GLOBS:
+            return True
+        elif word_start and c in "#~":
+            return True
+
+        word_start = c in " \t"
+
+    first = command.lstrip().split(" ", 1)[0]
+    return quote is not None or _ASSIGNMENT.match(first) is not None
+
+
+def get_argv(command: str) -> List[str]:
+    """
+    Return the argv executing the command line, it runs through sh
+    only when the command line needs it.
+    """
+    if needs_shell(command):
+        return [SHELL, "-c", command]
+    return shlex.split(command)
+
+
+class Command:
+    """
+    Build the argv of a command to execute it without a shell. None
+    arguments are skipped, so optional ones can be passed as they are.
+    """
+
+    def __init__(self, *args: Optional[str]):
+        self.argv: List[str] = []
+        self.add(*args)
+
+    def add(self, *args: Optional[str]) -> "Command":
+        self.argv += [str(arg) for arg in args if arg is not None]
+        return self
+
+    def add_if(self, condition: bool, *args: Optional[str]) -> "Command":
+        if condition:
+            self.add(*args)
+        return self
+
+    def prepend(self, *args: Optional[str]) -> "Command":
+        self.argv[:0] = [str(arg) for arg in args if arg is not None]
+        return self
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.argv)
+
+    def __len__(self) -> int:
+        return len(self.argv)
+
+    def __str__(self) -> str:
+        return shlex.join(self.argv)
@@ -1,4 +1,5 @@
 import os
+import shutil
 import subprocess
 from functools import lru_cache
 
@@ -14,14 +15,16 @@ class DisplayUtils:
         if os.environ.get(env_var):
             return os.environ.get(env_var)
 
+        if shutil.which("xdpyinfo") is None:
+            return False
+
         for i in ports_range:
             _port = f":{i}"
             _proc = (
                 subprocess.Popen(
-                    f"xdpyinfo -display :{i}",
+                    ["xdpyinfo", "-display", f":{i}"],
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
-                    shell=True,
                 )
                 .communicate()[0]
                 .decode("utf-8")
@@ -35,22 +38,9 @@ class DisplayUtils:
     @staticmethod
     def check_nvidia_device():
         """Check if there is an nvidia device connected"""
-        _query = "NVIDIA Corporation".lower()
-        _proc = (
-            subprocess.Popen(
-                "lspci | grep 'VGA'",
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-            )
-            .communicate()[0]
-            .decode("utf-8")
-            .lower()
-        )
+        from bottles.backend.utils.gpu import GPUUtils, GPUVendors
 
-        if _query in _proc:
-            return True
-        return False
+        return GPUUtils.is_gpu(GPUVendors.NVIDIA)
 
     @staticmethod
     def display_server_type():
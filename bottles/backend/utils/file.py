@@ -22,6 +22,10 @@ import shutil
 import time
 from array import array
 from pathlib import Path
+from typing import Tuple
+
+# hex digest length -> algorithm of the checksums without a prefix
+_DIGEST_LENGTHS = {32: "md5", 40: "sha1", 64: "sha256", 128: "sha512"}
 
 
 class FileUtils:
@@ -31,20 +35,39 @@ class FileUtils:
     """
 
     @staticmethod
-    def get_checksum(file):
+    def get_checksum(file, algorithm: str = "md5"):
         """
-        This function returns the MD5 checksum of the given file.
+        This function returns the checksum of the given file, MD5 unless
+        another hashlib algorithm is given.
         """
-        checksum = hashlib.md5()
+        checksum = hashlib.new(algorithm)
 
         try:
             with open(file, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
                     checksum.update(chunk)
             return checksum.hexdigest().lower()
         except FileNotFoundError:
             return None
 
+    @staticmethod
+    def parse_checksum(checksum: str) -> Tuple[str, str]:
+        """
+        Split a manifest checksum in its algorithm and digest. The digest
+        can be prefixed by the algorithm (e.g. "sha256:<digest>"), else
+        the algorithm is guessed from its length. Raise ValueError if
+        hashlib doesn't provide the algorithm.
+        """
+        checksum = checksum.strip().lower()
+        if ":" in checksum:
+            algorithm, digest = checksum.split(":", 1)
+        else:
+            algorithm = _DIGEST_LENGTHS.get(len(checksum), "md5")
+            digest = checksum
+        if algorithm not in hashlib.algorithms_available:
+            raise ValueError(f"Unsupported checksum algorithm: {algorithm}")
+        return algorithm, digest
+
     @staticmethod
     def use_insensitive_ext(string):
         """Converts a glob pattern into a case-insensitive glob pattern"""
@@ -15,16 +15,30 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import subprocess
+import copy
+import os
+import re
+import threading
 from enum import Enum
-from functools import lru_cache
+from typing import List, Optional
 
+from bottles.backend.globals import Paths
 from bottles.backend.logger import Logger
+from bottles.backend.utils import json
 from bottles.backend.utils.nvidia import get_nvidia_dll_path
 from bottles.backend.utils.vulkan import VulkanUtils
 
 logging = Logger()
 
+# PCI vendor ids as found in /sys/class/drm/card*/device/vendor
+_PCI_VENDORS = {
+    "0x10de": "nvidia",
+    "0x1002": "amd",
+    "0x1022": "amd",
+    "0x8086": "intel",
+}
+_CARD = re.compile(r"^card\d+$")
+
 
 class GPUVendors(Enum):
     AMD = "amd"
@@ -34,29 +48,72 @@ class GPUVendors(Enum):
 
 # noinspection PyTypeChecker
 class GPUUtils:
-    __vendors = {
-        "nvidia": "NVIDIA Corporation",
-        "amd": "Advanced Micro Devices, Inc.",
-        "intel": "Intel Corporation",
-    }
+    sysfs = "/sys"
+    boot_id_path = "/proc/sys/kernel/random/boot_id"
+    cache_path = Paths.gpu_cache
+
+    # (boot id, GPU topology) shared by every instance
+    _cache: Optional[tuple] = None
+    _lock = threading.Lock()
 
     def __init__(self):
-        self.vk = VulkanUtils()
+        self.__vk = None
 
-    def list_all(self):
-        found = []
-        for _vendor in self.__vendors:
-            _proc = subprocess.Popen(
-                f"lspci | grep '{self.__vendors[_vendor]}'",
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
+    @property
+    def vk(self) -> VulkanUtils:
+        if self.__vk is None:
+            self.__vk = VulkanUtils()
+        return self.__vk
+
+    @classmethod
+    def list_cards(cls) -> List[dict]:
+        """
+        Return the known GPUs exposed by the DRM subsystem with their
+        vendor, kernel driver and whether the firmware used them for
+        the boot display.
+        """
+        drm = os.path.join(cls.sysfs, "class/drm")
+        try:
+            names = sorted(n for n in os.listdir(drm) if _CARD.match(n))
+        except OSError:
+            return []
+
+        cards = []
+        for name in names:
+            device = os.path.join(drm, name, "device")
+            vendor = _PCI_VENDORS.get(cls.__read(os.path.join(device, "vendor")))
+            if vendor is None:
+                continue
+
+            boot_vga = cls.__read(os.path.join(device, "boot_vga"))
+            driver = os.path.join(device, "driver")
+            cards.append(
+                {
+                    "card": name,
+                    "vendor": vendor,
+                    "boot_vga": None if boot_vga is None else boot_vga == "1",
+                    "driver": (
+                        os.path.basename(os.path.realpath(driver))
+                        if os.path.exists(driver)
+                        else None
+                    ),
+                }
             )
-            stdout, stderr = _proc.communicate()
+        return cards
 
-            if len(stdout) > 0:
-                found.append(_vendor)
+    @staticmethod
+    def __read(path: str) -> Optional[str]:
+        try:
+            with open(path) as f:
+                return f.read().strip().lower()
+        except OSError:
+            return None
 
+    def list_all(self):
+        found = []
+        for card in self.list_cards():
+            if card["vendor"] not in found:
+                found.append(card["vendor"])
         return found
 
     @staticmethod
@@ -69,26 +126,83 @@ class GPUUtils:
             return {"integrated": "intel", "discrete": "amd"}
         return {}
 
-    @staticmethod
-    def is_nouveau():
-        _proc = subprocess.Popen(
-            "lsmod | grep nouveau",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-        )
-        stdout, stderr = _proc.communicate()
-        if len(stdout) > 0:
+    @classmethod
+    def is_nouveau(cls):
+        if os.path.isdir(os.path.join(cls.sysfs, "module/nouveau")):
             logging.warning("Nouveau driver detected, this may cause issues")
             return True
         return False
 
+    @classmethod
+    def get_boot_id(cls) -> Optional[str]:
+        try:
+            with open(cls.boot_id_path) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
     def get_gpu(self):
-        checks = {
-            "nvidia": {"query": "(VGA|3D).*NVIDIA"},
-            "amd": {"query": "(VGA|3D).*AMD/ATI"},
-            "intel": {"query": "(VGA|3D).*Intel"},
+        """
+        Return the GPU vendors with their environment and the PRIME
+        assignment. The topology can only change with a reboot so it is
+        cached, also on disk, for the current boot. The ICD loaders and
+        the nvngx path change with driver updates and are resolved on
+        each call.
+        """
+        boot_id = self.get_boot_id()
+        cls = type(self)
+        with cls._lock:
+            if cls._cache is None or cls._cache[0] != boot_id:
+                topology = self.__load_cache(boot_id)
+                if topology is None:
+                    topology = self.__detect()
+                    self.__save_cache(boot_id, topology)
+                cls._cache = (boot_id, topology)
+            topology = copy.deepcopy(cls._cache[1])
+        return self.__resolve(topology)
+
+    @classmethod
+    def __load_cache(cls, boot_id: Optional[str]) -> Optional[dict]:
+        if boot_id is None:
+            return None
+        try:
+            with open(cls.cache_path) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cache, dict) or cache.get("boot_id") != boot_id:
+            return None
+        return cache.get("topology")
+
+    @classmethod
+    def __save_cache(cls, boot_id: Optional[str], topology: dict):
+        if boot_id is None:
+            return
+        try:
+            tmp_path = f"{cls.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"boot_id": boot_id, "topology": topology}, f)
+            os.replace(tmp_path, cls.cache_path)
+        except OSError as e:
+            logging.warning(f"Failed to cache the GPU topology: {e}")
+
+    def __detect(self) -> dict:
+        """Return the vendors of the cards and the PRIME assignment."""
+        cards = self.list_cards()
+        vendors = list(dict.fromkeys(c["vendor"] for c in cards))
+        prime = self.__get_prime(cards) if len(cards) >= 2 else {}
+        return {
+            "vendors": vendors,
+            "nouveau": "nvidia" in vendors and self.is_nouveau(),
+            "prime": {
+                "integrated": prime.get("integrated"),
+                "discrete": prime.get("discrete"),
+            },
         }
+
+    def __resolve(self, topology: dict) -> dict:
+        """Add the environment, ICD loaders and nvngx path of each vendor."""
+        vendors = topology["vendors"]
         gpus = {
             "nvidia": {
                 "vendor": "nvidia",
@@ -97,58 +211,47 @@ class GPUUtils:
                     "__GLX_VENDOR_LIBRARY_NAME": "nvidia",
                     "__VK_LAYER_NV_optimus": "NVIDIA_only",
                 },
-                "icd": self.vk.get_vk_icd("nvidia", as_string=True),
-                "nvngx_path": get_nvidia_dll_path(),
-            },
-            "amd": {
-                "vendor": "amd",
-                "envs": {"DRI_PRIME": "1"},
-                "icd": self.vk.get_vk_icd("amd", as_string=True),
-            },
-            "intel": {
-                "vendor": "intel",
-                "envs": {"DRI_PRIME": "1"},
-                "icd": self.vk.get_vk_icd("intel", as_string=True),
+                "icd": "",
+                "nvngx_path": None,
             },
+            "amd": {"vendor": "amd", "envs": {"DRI_PRIME": "1"}, "icd": ""},
+            "intel": {"vendor": "intel", "envs": {"DRI_PRIME": "1"}, "icd": ""},
         }
-        found = []
         result = {"vendors": {}, "prime": {"integrated": None, "discrete": None}}
 
-        if self.is_nouveau():
-            gpus["nvidia"]["envs"] = {"DRI_PRIME": "1"}
-            gpus["nvidia"]["icd"] = ""
-
-        for _check in checks:
-            _query = checks[_check]["query"]
-            _proc = subprocess.Popen(
-                f"lspci | grep -iP '{_query}'",
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                shell=True,
-            )
-            stdout, stderr = _proc.communicate()
-            if len(stdout) > 0:
-                found.append(_check)
-                result["vendors"][_check] = gpus[_check]
-
-        if len(found) >= 2:
-            _discrete = self.assume_discrete(found)
-            if _discrete:
-                _integrated = _discrete["integrated"]
-                _discrete = _discrete["discrete"]
-                result["prime"]["integrated"] = gpus[_integrated]
-                result["prime"]["discrete"] = gpus[_discrete]
+        for vendor in vendors:
+            gpus[vendor]["icd"] = self.vk.get_vk_icd(vendor, as_string=True)
+            result["vendors"][vendor] = gpus[vendor]
+
+        if "nvidia" in vendors:
+            gpus["nvidia"]["nvngx_path"] = get_nvidia_dll_path()
+            if topology["nouveau"]:
+                gpus["nvidia"]["envs"] = {"DRI_PRIME": "1"}
+                gpus["nvidia"]["icd"] = ""
+
+        prime = topology["prime"]
+        if prime["integrated"] and prime["discrete"]:
+            result["prime"]["integrated"] = gpus[prime["integrated"]]
+            result["prime"]["discrete"] = gpus[prime["discrete"]]
 
         return result
 
+    def __get_prime(self, cards: List[dict]) -> dict:
+        """
+        The card used for the boot display drives the screen, offload to
+        another one unless the display already runs on the discrete GPU.
+        """
+        boot = next((c for c in cards if c["boot_vga"]), None)
+        if boot is None:
+            return self.assume_discrete([c["vendor"] for c in cards])
+
+        others = [c for c in cards if c is not boot]
+        other = next((c for c in others if c["vendor"] != boot["vendor"]), others[0])
+        guess = self.assume_discrete([boot["vendor"], other["vendor"]])
+        if guess.get("discrete") == boot["vendor"]:
+            return {}
+        return {"integrated": boot["vendor"], "discrete": other["vendor"]}
+
     @staticmethod
-    @lru_cache
     def is_gpu(vendor: GPUVendors) -> bool:
-        _proc = subprocess.Popen(
-            f"lspci | grep -iP '{vendor.value}'",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-        )
-        stdout, stderr = _proc.communicate()
-        return len(stdout) > 0
+        return any(c["vendor"] == vendor.value for c in GPUUtils.list_cards())
@@ -9,6 +9,11 @@ class GSettingsStub:
         logging.warning(f"Stub GSettings key {key}=False")
         return False
 
+    @staticmethod
+    def get_int(key: str) -> int:
+        logging.warning(f"Stub GSettings key {key}=0")
+        return 0
+
     @staticmethod
     def get_string(key: str) -> str:
         logging.warning(f"Stub GSettings key {key}='default'")
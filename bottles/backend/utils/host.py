@@ -0,0 +1,231 @@
+# host.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import dataclasses
+import os
+import shutil
+import threading
+import time
+from typing import ClassVar, Dict, List, Optional
+
+from bottles.backend.globals import Paths
+from bottles.backend.logger import Logger
+from bottles.backend.utils import json
+from bottles.backend.utils.vulkan import VulkanUtils
+
+logging = Logger()
+
+# snapshot field -> executable looked up in PATH
+_TOOLS = {
+    "gamemode": "gamemoderun",
+    "gamescope": "gamescope",
+    "mangohud": "mangohud",
+    "obs_vkc": "obs-vkcapture",
+    "cabextract": "cabextract",
+    "xdpyinfo": "xdpyinfo",
+    "systemd_run": "systemd-run",
+    "taskset": "taskset",
+    "nice": "nice",
+    "ionice": "ionice",
+}
+
+
+@dataclasses.dataclass
+class HostCapabilities:
+    """
+    What the host provides to launch programs: helper tools, glibc,
+    Vulkan ICD loaders, display and runtimes. The snapshot is probed
+    once, persisted for the current boot and refreshed in background
+    when the directories it depends on change.
+    """
+
+    boot_id: Optional[str] = None
+    stamp: list = dataclasses.field(default_factory=list)
+    gamemode: str = ""
+    gamescope: str = ""
+    mangohud: str = ""
+    obs_vkc: str = ""
+    cabextract: str = ""
+    xdpyinfo: str = ""
+    systemd_run: str = ""
+    taskset: str = ""
+    nice: str = ""
+    ionice: str = ""
+    vkbasalt: bool = False
+    glibc: str = ""
+    vk_icd_loaders: Dict[str, List[str]] = dataclasses.field(default_factory=dict)
+    x_display: str = ""
+    nvidia_device: bool = False
+    runtimes: List[str] = dataclasses.field(default_factory=list)
+
+    # seconds between two background checks of the snapshot stamp
+    refresh_interval = 30.0
+    cache_path = Paths.host_capabilities
+
+    _snapshot: ClassVar[Optional["HostCapabilities"]] = None
+    _checked_at = 0.0
+    _refreshing = False
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls) -> "HostCapabilities":
+        """
+        Return the current snapshot. Only the first call of a process
+        may probe the host, later calls return at once and schedule a
+        background check when the snapshot is due for one.
+        """
+        snapshot = cls._snapshot
+        if snapshot is not None:
+            if time.monotonic() - cls._checked_at > cls.refresh_interval:
+                cls.__schedule_refresh()
+            return snapshot
+
+        with cls._lock:
+            if cls._snapshot is None:
+                stamp = cls.get_stamp()
+                snapshot = cls.__load(stamp)
+                if snapshot is None:
+                    snapshot = cls.probe(stamp)
+                    snapshot.save()
+                cls._snapshot = snapshot
+                cls._checked_at = time.monotonic()
+            return cls._snapshot
+
+    @classmethod
+    def refresh(cls) -> "HostCapabilities":
+        """Probe the host again if the snapshot stamp changed."""
+        stamp = cls.get_stamp()
+        snapshot = cls._snapshot
+        if snapshot is None or snapshot.stamp != stamp:
+            logging.info("Host capabilities changed, probing again")
+            snapshot = cls.probe(stamp)
+            snapshot.save()
+            cls._snapshot = snapshot
+        cls._checked_at = time.monotonic()
+        return snapshot
+
+    @classmethod
+    def __schedule_refresh(cls):
+        with cls._lock:
+            if cls._refreshing:
+                return
+            cls._refreshing = True
+            cls._checked_at = time.monotonic()
+
+        def _refresh():
+            try:
+                cls.refresh()
+            except Exception as e:
+                logging.warning(f"Failed to refresh host capabilities: {e}")
+            finally:
+                cls._refreshing = False
+
+        threading.Thread(target=_refresh, daemon=True).start()
+
+    @staticmethod
+    def get_stamp() -> list:
+        """
+        Identify the state the snapshot was probed in: boot, X display
+        and the modification time of the directories providing tools,
+        ICD loaders and runtimes.
+        """
+        dirs = [p for p in os.environ.get("PATH", "").split(os.pathsep) if p]
+        dirs += [os.path.join(d, "icd.d") for d in VulkanUtils.vk_icd_dirs]
+        dirs += Paths.vkbasalt_paths + [Paths.runtimes]
+
+        stamp = [HostCapabilities.get_boot_id(), os.environ.get("DISPLAY", "")]
+        for path in dict.fromkeys(dirs):
+            try:
+                stamp.append([path, os.stat(path).st_mtime_ns])
+            except OSError:
+                stamp.append([path, None])
+        return stamp
+
+    @staticmethod
+    def get_boot_id() -> Optional[str]:
+        from bottles.backend.utils.gpu import GPUUtils
+
+        return GPUUtils.get_boot_id()
+
+    @classmethod
+    def probe(cls, stamp: Optional[list] = None) -> "HostCapabilities":
+        from bottles.backend.managers.runtime import RuntimeManager
+        from bottles.backend.utils.display import DisplayUtils
+        from bottles.backend.utils.generic import is_glibc_min_available
+        from bottles.backend.utils.gpu import GPUUtils, GPUVendors
+
+        if stamp is None:
+            stamp = cls.get_stamp()
+
+        tools = {field: shutil.which(tool) or "" for field, tool in _TOOLS.items()}
+        return cls(
+            boot_id=stamp[0],
+            stamp=stamp,
+            vkbasalt=Paths.is_vkbasalt_available(),
+            glibc=is_glibc_min_available() or "",
+            vk_icd_loaders=VulkanUtils.find_icd_loaders(),
+            x_display=DisplayUtils.get_x_display() or "",
+            nvidia_device=GPUUtils.is_gpu(GPUVendors.NVIDIA),
+            runtimes=RuntimeManager.get_runtimes("bottles") or [],
+            **tools,
+        )
+
+    @classmethod
+    def __load(cls, stamp: list) -> Optional["HostCapabilities"]:
+        if stamp[0] is None:
+            return None
+        try:
+            with open(cls.cache_path) as f:
+                data = json.load(f)
+            snapshot = cls(**data)
+        except (OSError, ValueError, TypeError):
+            return None
+        if snapshot.stamp != stamp:
+            return None
+        return snapshot
+
+    def save(self):
+        if self.boot_id is None:
+            return
+        try:
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(dataclasses.asdict(self), f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logging.warning(f"Failed to save host capabilities: {e}")
+
+    def get_runtime_env(self):
+        """Same as RuntimeManager.get_runtime_env for the bottles runtime."""
+        if not self.runtimes:
+            return False
+
+        env = "".join(
+            f":{p}"
+            for p in self.runtimes
+            if "EasyAntiCheatRuntime" not in p and "BattlEyeRuntime" not in p
+        )
+        ld = os.environ.get("LD_LIBRARY_PATH")
+        if ld:
+            env += f":{ld}"
+        return env
+
+    def get_eac(self):
+        return next((p for p in self.runtimes if "EasyAntiCheatRuntime" in p), False)
+
+    def get_be(self):
+        return next((p for p in self.runtimes if "BattlEyeRuntime" in p), False)
@@ -0,0 +1,131 @@
+# launch.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import dataclasses
+import re
+from typing import Optional
+
+from bottles.backend.logger import Logger
+from bottles.backend.utils.command import Command
+
+logging = Logger()
+
+_CPU_LIST = re.compile(r"^\d+(-\d+)?(,\d+(-\d+)?)*$")
+_MEMORY = re.compile(r"^(\d+[KMGT]?|\d+(\.\d+)?%|infinity)$")
+_IONICE_CLASSES = {"realtime": "1", "best-effort": "2", "idle": "3"}
+
+
+@dataclasses.dataclass
+class LaunchOptions:
+    """
+    Scheduling and resource controls applied to a launched program: the
+    CPUs it may run on, its nice level and I/O scheduling class, and an
+    optional transient systemd scope setting its cgroup weights and
+    memory limit. Bottles set them in their Parameters, programs can
+    override each of them with the same key in their entry.
+    """
+
+    cpu_affinity: str = ""  # CPU list, e.g. "0-7" or "0,2,4-6"
+    nice: int = 0
+    ionice_class: str = ""  # "", "realtime", "best-effort", "idle"
+    cgroup_scope: bool = False
+    cgroup_cpu_weight: int = 0  # 1-10000, 0 keeps the default
+    cgroup_memory_high: str = ""  # e.g. "8G" or "75%"
+    cgroup_io_weight: int = 0  # 1-10000, 0 keeps the default
+
+    @classmethod
+    def get_keys(cls) -> tuple:
+        return tuple(f.name for f in dataclasses.fields(cls))
+
+    @classmethod
+    def from_params(cls, params, overrides: Optional[dict] = None) -> "LaunchOptions":
+        """Read the options from BottleParams, then apply the overrides."""
+        values = {key: getattr(params, key, None) for key in cls.get_keys()}
+        for key, value in (overrides or {}).items():
+            if key in values and value is not None:
+                values[key] = value
+        return cls(**{k: v for k, v in values.items() if v is not None})
+
+    def get_prefix(
+        self,
+        systemd_run: str = "",
+        taskset: str = "",
+        nice: str = "",
+        ionice: str = "",
+    ) -> Command:
+        """
+        Return the wrappers to prepend to the command. Each wrapper is
+        only added if its tool path is given, invalid values are skipped
+        with a warning instead of failing the launch.
+        """
+        prefix = Command()
+
+        if self.cgroup_scope and systemd_run:
+            prefix.add(systemd_run, "--user", "--scope", "--quiet", "--collect")
+            cpu_weight = self.__get_weight(self.cgroup_cpu_weight, "CPU weight")
+            if cpu_weight:
+                prefix.add("-p", f"CPUWeight={cpu_weight}")
+            if self.cgroup_memory_high:
+                if _MEMORY.match(self.cgroup_memory_high):
+                    prefix.add("-p", f"MemoryHigh={self.cgroup_memory_high}")
+                else:
+                    logging.warning(
+                        f"Invalid memory limit {self.cgroup_memory_high}, ignoring it"
+                    )
+            io_weight = self.__get_weight(self.cgroup_io_weight, "I/O weight")
+            if io_weight:
+                prefix.add("-p", f"IOWeight={io_weight}")
+            prefix.add("--")
+
+        if self.cpu_affinity and taskset:
+            if _CPU_LIST.match(self.cpu_affinity.replace(" ", "")):
+                prefix.add(taskset, "-c", self.cpu_affinity.replace(" ", ""))
+            else:
+                logging.warning(f"Invalid CPU list {self.cpu_affinity}, ignoring it")
+
+        if self.nice and nice:
+            try:
+                level = max(-20, min(19, int(self.nice)))
+                prefix.add(nice, "-n", str(level))
+            except (ValueError, TypeError):
+                logging.warning(f"Invalid nice level {self.nice}, ignoring it")
+
+        if self.ionice_class and ionice:
+            ioclass = _IONICE_CLASSES.get(self.ionice_class)
+            if ioclass is not None:
+                # -t: still run the program if the class can't be set
+                prefix.add(ionice, "-t", "-c", ioclass)
+            else:
+                logging.warning(
+                    f"Invalid I/O scheduling class {self.ionice_class}, ignoring it"
+                )
+
+        return prefix
+
+    @staticmethod
+    def __get_weight(value: int, name: str) -> int:
+        """Return the weight, or 0 if it is unset or invalid."""
+        if not value:
+            return 0
+        try:
+            weight = int(value)
+        except (ValueError, TypeError):
+            weight = 0
+        if not 1 <= weight <= 10000:
+            logging.warning(f"Invalid {name} {value}, ignoring it")
+            return 0
+        return weight
@@ -17,9 +17,11 @@
 
 import os
 import shlex
+import shutil
 import subprocess
 
 from bottles.backend.logger import Logger
+from bottles.backend.utils.command import get_argv
 
 logging = Logger()
 
@@ -63,17 +65,7 @@ class TerminalUtils:
 
     def check_support(self):
         for terminal in self.terminals:
-            terminal_check = (
-                subprocess.Popen(
-                    f"command -v {terminal[0]} > /dev/null && echo 1 || echo 0",
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                )
-                .communicate()[0]
-                .decode("utf-8")
-            )
-
-            if "1" in terminal_check:
+            if shutil.which(terminal[0]):
                 self.terminal = terminal
                 return True
 
@@ -147,7 +139,7 @@ class TerminalUtils:
 
         try:
             proc_out = subprocess.Popen(
-                full_cmd, shell=True, env=env, stdout=subprocess.PIPE, cwd=cwd
+                get_argv(full_cmd), env=env, stdout=subprocess.PIPE, cwd=cwd
             ).communicate()[0]
             if proc_out:
                 try:
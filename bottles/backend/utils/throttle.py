@@ -0,0 +1,169 @@
+# throttle.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import threading
+import time
+from threading import Event
+from typing import Any, Optional, Set
+
+from bottles.backend.logger import Logger
+from bottles.backend.models.result import Result
+from bottles.backend.state import SignalManager, Signals, TaskType, ThrottlePolicy
+
+logging = Logger()
+
+# what happens to each task type while programs are running
+_POLICIES = {
+    TaskType.Backup: ThrottlePolicy.PAUSE,
+    TaskType.Versioning: ThrottlePolicy.PAUSE,
+    TaskType.Template: ThrottlePolicy.PAUSE,
+    TaskType.Extraction: ThrottlePolicy.LIMIT,
+    TaskType.Checksum: ThrottlePolicy.LIMIT,
+    TaskType.Download: ThrottlePolicy.LIMIT,
+    TaskType.Catalog: ThrottlePolicy.LIMIT,
+}
+
+
+class SessionThrottle:
+    """
+    Scheduler policy for heavy jobs while programs launched by Bottles
+    are running. Paused jobs wait for the last program to exit before
+    they start or continue, limited jobs keep going with a capped
+    download rate and a single thread. Everything returns to full speed
+    as soon as the sessions end.
+    """
+
+    download_rate = 2048  # KiB/s, used when the settings are not available
+    max_pause = 3600  # seconds of sessions after which paused jobs run anyway
+    check_interval = 1.0
+
+    _settings: Any = None
+    _sessions: Set[str] = set()
+    _since = 0.0  # when the current sessions started
+    _condition = threading.Condition()
+    _connected = False
+
+    @classmethod
+    def configure(cls, settings):
+        """Read the policy from the settings and follow the program sessions."""
+        cls._settings = settings
+        if not cls._connected:
+            SignalManager.connect(Signals.ProgramStarted, cls.__on_program_started)
+            SignalManager.connect(Signals.ProgramFinished, cls.__on_program_finished)
+            cls._connected = True
+
+    @classmethod
+    def __on_program_started(cls, data: Optional[Result] = None):
+        if data and data.data:
+            cls.session_started(data.data.launch_id)
+
+    @classmethod
+    def __on_program_finished(cls, data: Optional[Result] = None):
+        if data and data.data:
+            cls.session_finished(data.data.launch_id)
+
+    @classmethod
+    def session_started(cls, session_id: str):
+        with cls._condition:
+            if not cls._sessions:
+                cls._since = time.monotonic()
+            cls._sessions.add(session_id)
+
+    @classmethod
+    def session_finished(cls, session_id: str):
+        with cls._condition:
+            cls._sessions.discard(session_id)
+            if not cls._sessions:
+                cls._condition.notify_all()
+
+    @classmethod
+    def is_active(cls) -> bool:
+        """Return whether any program session is running."""
+        return bool(cls._sessions)
+
+    @classmethod
+    def __get_setting(cls, key: str, default):
+        if cls._settings is None:
+            return default
+        try:
+            if isinstance(default, bool):
+                return cls._settings.get_boolean(key)
+            return cls._settings.get_int(key)
+        except Exception:
+            return default
+
+    @classmethod
+    def get_policy(cls, task_type: Optional[TaskType]) -> ThrottlePolicy:
+        if task_type is None or not cls.__get_setting("session-throttle", True):
+            return ThrottlePolicy.NONE
+        policy = _POLICIES.get(task_type, ThrottlePolicy.NONE)
+        if policy is ThrottlePolicy.PAUSE and not cls.__get_setting(
+            "session-pause-tasks", True
+        ):
+            return ThrottlePolicy.LIMIT
+        return policy
+
+    @classmethod
+    def is_throttled(cls, task_type: Optional[TaskType]) -> bool:
+        """Return whether a job of the task type is throttled right now."""
+        return cls.is_active() and cls.get_policy(task_type) is not ThrottlePolicy.NONE
+
+    @classmethod
+    def wait(cls, task_type: TaskType, cancel_event: Optional[Event] = None) -> bool:
+        """
+        Block while programs are running if the task type is paused by
+        the policy, jobs call it before they start and between their
+        steps. Return False if the job was cancelled while waiting.
+        Never call it from the main loop or from a background pool
+        worker.
+        """
+        if not cls._sessions or cls.get_policy(task_type) is not ThrottlePolicy.PAUSE:
+            return True
+
+        with cls._condition:
+            deadline = cls._since + cls.max_pause
+            if cls._sessions and time.monotonic() < deadline:
+                logging.info(
+                    f"Pausing {task_type.value} until the running programs exit"
+                )
+            while cls._sessions:
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.debug(
+                        f"Programs running for {cls.max_pause}s, "
+                        f"not pausing {task_type.value} anymore"
+                    )
+                    break
+                cls._condition.wait(min(remaining, cls.check_interval))
+        return True
+
+    @classmethod
+    def get_rate(cls, task_type: TaskType) -> int:
+        """Return the download rate cap in bytes per second, 0 for none."""
+        if not cls.is_throttled(task_type):
+            return 0
+        rate = cls.__get_setting("session-download-rate", cls.download_rate)
+        return max(0, int(rate)) * 1024
+
+    @classmethod
+    def get_workers(cls, task_type: TaskType, workers: int) -> int:
+        """Return how many threads a job of the task type should use."""
+        if cls.is_throttled(task_type):
+            return 1
+        return workers
@@ -22,7 +22,7 @@ from glob import glob
 
 
 class VulkanUtils:
-    __vk_icd_dirs = [
+    vk_icd_dirs = [
         "/usr/share/vulkan",
         "/etc/vulkan",
         "/usr/local/share/vulkan",
@@ -30,12 +30,15 @@ class VulkanUtils:
     ]
 
     def __init__(self):
-        self.loaders = self.__get_vk_icd_loaders()
+        from bottles.backend.utils.host import HostCapabilities
 
-    def __get_vk_icd_loaders(self):
+        self.loaders = HostCapabilities.get().vk_icd_loaders
+
+    @staticmethod
+    def find_icd_loaders():
         loaders = {"nvidia": [], "amd": [], "intel": []}
 
-        for _dir in self.__vk_icd_dirs:
+        for _dir in VulkanUtils.vk_icd_dirs:
             _files = glob(f"{_dir}/icd.d/*.json", recursive=True)
 
             for file in _files:
@@ -63,7 +66,7 @@ class VulkanUtils:
         icd = []
 
         if vendor in vendors:
-            icd = self.loaders[vendor]
+            icd = self.loaders.get(vendor, [])
 
         if as_string:
             icd = ":".join(icd)
@@ -81,7 +84,7 @@ class VulkanUtils:
 
         res = (
             subprocess.Popen(
-                "vulkaninfo", stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True
+                ["vulkaninfo"], stdout=subprocess.PIPE, stderr=subprocess.PIPE
             )
             .communicate()[0]
             .decode("utf-8")
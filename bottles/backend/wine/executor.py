@@ -16,6 +16,7 @@ from bottles.backend.models.process import (
 )
 from bottles.backend.models.result import Result
 from bottles.backend.state import SignalManager, Signals
+from bottles.backend.utils.launch import LaunchOptions
 from bottles.backend.utils.manager import ManagerUtils
 from bottles.backend.wine.cmd import CMD
 from bottles.backend.wine.explorer import Explorer
@@ -61,6 +62,7 @@ class WineExecutor:
         program_gamescope: Optional[bool] = None,
         program_virt_desktop: Optional[bool] = None,
         program_winebridge: Optional[bool] = None,
+        program_launch_options: Optional[dict] = None,
     ):
         logging.info("Launching an executable…")
         self.config = config
@@ -89,6 +91,7 @@ class WineExecutor:
         self.monitoring = monitoring
         self.use_gamescope = program_gamescope
         self.use_virt_desktop = program_virt_desktop
+        self.launch_options = program_launch_options
         self.use_winebridge = (
             program_winebridge
             if program_winebridge is not None
@@ -171,6 +174,11 @@ class WineExecutor:
             program_gamescope=program.get("gamescope"),
             program_virt_desktop=program.get("virtual_desktop"),
             program_winebridge=program.get("winebridge"),
+            program_launch_options={
+                key: program[key]
+                for key in LaunchOptions.get_keys()
+                if program.get(key) is not None
+            },
         ).run()
 
     @staticmethod
@@ -429,6 +437,8 @@ class WineExecutor:
             pre_script_args=self.pre_script_args,
             post_script_args=self.post_script_args,
             cwd=self.cwd,
+            program=self._raw_exec_path,
+            launch_options=self.launch_options,
         )
         res = winecmd.run()
         self.__set_monitors()
@@ -1,20 +1,27 @@
 import codecs
 import dataclasses
 import os
+import threading
 import uuid
 from datetime import datetime
 from itertools import groupby
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 from bottles.backend.globals import Paths
 from bottles.backend.logger import Logger
 from bottles.backend.utils.generic import random_string
 from bottles.backend.utils.manager import ManagerUtils
+from bottles.backend.wine.register import WinRegister
+from bottles.backend.wine.regview import RegistryView
 from bottles.backend.wine.winedbg import WineDbg
 from bottles.backend.wine.wineprogram import WineProgram
+from bottles.backend.wine.wineserver import WineServer
 
 logging = Logger()
 
+# serialise offline edits, hives are rewritten as a whole
+_offline_lock = threading.Lock()
+
 
 @dataclasses.dataclass
 class RegItem:
@@ -28,10 +35,68 @@ class Reg(WineProgram):
     program = "Wine Registry CLI"
     command = "reg"
 
+    def apply_offline(self, changes: List[Tuple[str, str, Optional[str]]]) -> bool:
+        """
+        Apply (key, value, raw data) changes straight to the hive files
+        when no wineserver is running for the bottle, a None data removes
+        the value. Return False if the changes must go through reg.exe.
+        """
+        config = self.config
+        bottle = ManagerUtils.get_bottle_path(config)
+        if config.Environment == "Steam":
+            bottle = config.Path
+
+        if not changes or WineServer(config).is_alive_native() is not False:
+            return False
+
+        with _offline_lock:
+            view = RegistryView(config)
+            hives: Dict[str, Dict[str, Dict[str, Optional[str]]]] = {}
+            try:
+                for key, value, data in changes:
+                    if WinRegister.resolve_hive(key) is None or not isinstance(
+                        value, str
+                    ):
+                        return False
+
+                    hive_file, path = view.resolve(key)
+                    if not os.path.isfile(os.path.join(bottle, hive_file)):
+                        return False
+                    hives.setdefault(hive_file, {}).setdefault(path, {})[value] = data
+
+                # hives are streamed, only the edited keys are rewritten
+                for hive_file, edits in hives.items():
+                    WinRegister.write_changes(os.path.join(bottle, hive_file), edits)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Offline registry edit failed, using reg.exe: {e}")
+                return False
+
+        logging.info(f"Applied {len(changes)} change(s) to {config.Name} registry")
+        return True
+
     def bulk_add(self, regs: List[RegItem]):
         """Import multiple registries at once, with v5.00 reg file"""
         config = self.config
         logging.info(f"Importing {len(regs)} Key(s) to {config.Name} registry")
+
+        try:
+            changes = [
+                (
+                    item.key,
+                    item.value,
+                    (
+                        WinRegister.encode_reg_file_value(item.value_type, item.data)
+                        if item.value_type
+                        else WinRegister.encode_value(None, item.data)
+                    ),
+                )
+                for item in regs
+            ]
+        except (TypeError, ValueError):
+            changes = []
+        if self.apply_offline(changes):
+            return
+
         winedbg = WineDbg(config)
 
         mapping: Dict[str, List[RegItem]] = {
@@ -80,6 +145,14 @@ class Reg(WineProgram):
             f"Adding Key: [{key}] with Value: [{value}] and "
             f"Data: [{data}] in {config.Name} registry"
         )
+
+        try:
+            raw = WinRegister.encode_value(value_type, data)
+        except (TypeError, ValueError):
+            raw = None
+        if raw is not None and self.apply_offline([(key, value, raw)]):
+            return
+
         winedbg = WineDbg(config)
         args = "add '%s' /v '%s' /d '%s' /f" % (key, value, data)
 
@@ -96,8 +169,11 @@ class Reg(WineProgram):
         """Remove a key from the registry"""
         config = self.config
         logging.info(
-            f"Removing Value: [{key}] from Key: [{value}] in " f"{config.Name} registry"
+            f"Removing Value: [{key}] from Key: [{value}] in {config.Name} registry"
         )
+        if self.apply_offline([(key, value, None)]):
+            return
+
         winedbg = WineDbg(config)
         args = "delete '%s' /v %s /f" % (key, value)
 
@@ -111,6 +187,28 @@ class Reg(WineProgram):
         """Import a bundle of keys into the registry"""
         config = self.config
         logging.info(f"Importing bundle to {config.Name} registry")
+
+        changes = []
+        for key in bundle:
+            for value in bundle[key]:
+                if value["data"] == "-":
+                    changes.append((key, value["value"], None))
+                    continue
+                try:
+                    if "key_type" in value:
+                        raw = WinRegister.encode_reg_file_value(
+                            value["key_type"], str(value["data"])
+                        )
+                    else:
+                        raw = WinRegister.encode_value(None, str(value["data"]))
+                except ValueError as e:
+                    # regedit skips malformed values as well
+                    logging.warning(f"Skipping value {value['value']}: {e}")
+                    continue
+                changes.append((key, value["value"], raw))
+        if self.apply_offline(changes):
+            return
+
         winedbg = WineDbg(config)
         reg_file = ManagerUtils.get_temp_path(f"{uuid.uuid4()}.reg")
 
@@ -15,12 +15,100 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import codecs
+import hashlib
+import mmap
 import os
+import re
+import shutil
+import tempfile
+import time
 import uuid
-from typing import Optional
+from collections import deque
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
 
 from bottles.backend.utils import json
 
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_LINK = 6
+REG_MULTI_SZ = 7
+REG_QWORD = 11
+
+# reg.exe type names, as accepted by Reg.add
+REG_TYPES = {
+    "REG_NONE": REG_NONE,
+    "REG_SZ": REG_SZ,
+    "REG_EXPAND_SZ": REG_EXPAND_SZ,
+    "REG_BINARY": REG_BINARY,
+    "REG_DWORD": REG_DWORD,
+    "REG_MULTI_SZ": REG_MULTI_SZ,
+    "REG_QWORD": REG_QWORD,
+}
+
+# root key -> (hive file, key prefix inside the hive)
+HIVES = {
+    "HKEY_LOCAL_MACHINE": ("system.reg", ""),
+    "HKLM": ("system.reg", ""),
+    "HKEY_CLASSES_ROOT": ("system.reg", "Software\\Classes"),
+    "HKCR": ("system.reg", "Software\\Classes"),
+    "HKEY_CURRENT_CONFIG": (
+        "system.reg",
+        "System\\CurrentControlSet\\Hardware Profiles\\Current",
+    ),
+    "HKCC": ("system.reg", "System\\CurrentControlSet\\Hardware Profiles\\Current"),
+    "HKEY_CURRENT_USER": ("user.reg", ""),
+    "HKCU": ("user.reg", ""),
+    "HKEY_USERS\\.DEFAULT": ("userdef.reg", ""),
+    "HKU\\.DEFAULT": ("userdef.reg", ""),
+}
+
+# symbolic link targets are stored as NT paths, only the machine hive
+# can be followed without knowing the user SID
+_MACHINE_ROOT = "\\registry\\machine\\"
+
+_FILETIME_EPOCH = 11644473600
+_KEY_LINE = re.compile(r"^\[(.*)\](?:\s+(\d+))?\s*$")
+_ESCAPES = {"a": "\a", "b": "\b", "e": "\x1b", "f": "\f", "n": "\n"}
+_ESCAPES.update({"r": "\r", "t": "\t", "v": "\v"})
+_REVERSE_ESCAPES = {v: k for k, v in _ESCAPES.items()}
+_ESCAPE_SEQ = re.compile(r"\\(x[0-9a-fA-F]{1,4}|[0-7]{1,3}|[\s\S])")
+_SURROGATES = re.compile("[\ud800-\udbff][\udc00-\udfff]")
+
+
+class UnsortedHiveError(ValueError):
+    """Raised when the keys of a registry file are not in tree order."""
+
+
+class RegRecord:
+    """
+    A key block of a registry file. The content digest covers the
+    metadata and values but not the modification time, values are
+    only parsed when accessed.
+    """
+
+    __slots__ = ("key", "meta", "digest", "block", "start", "end", "_body", "_values")
+
+    def __init__(self, key: str, meta: dict, digest: bytes, block: bytes, body: int):
+        self.key = key
+        self.meta = meta
+        self.digest = digest
+        self.block = block
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._body = body
+        self._values: Optional[Dict[str, str]] = None
+
+    @property
+    def values(self) -> Dict[str, str]:
+        if self._values is None:
+            text = self.block[self._body :].decode("utf-8", errors="surrogateescape")
+            self._values = WinRegister.parse_values(text.splitlines())
+        return self._values
+
 
 class WinRegister:
     def __init__(self):
@@ -29,138 +117,646 @@ class WinRegister:
         self.exclude = []
         self.reg_dict = {}
 
+    @property
+    def reg_dict(self) -> Dict[str, Dict[str, str]]:
+        if self._reg_dict is None:
+            self._reg_dict = {
+                record.key: record.values
+                for record in self.iter_records(self.path)
+                if not self.__is_excluded(record.key)
+            }
+        return self._reg_dict
+
+    @reg_dict.setter
+    def reg_dict(self, value: Optional[Dict[str, Dict[str, str]]]):
+        self._reg_dict = value
+
     def new(self, path: str):
-        """Create a new WinRegister object with the given path."""
+        """
+        Create a new WinRegister object with the given path, the file
+        is only parsed as a whole if reg_dict is accessed.
+        """
 
         self.path = path
         self.diff = {}  # will store last diff
         self.exclude = []
-        self.reg_dict = self.__parse_dict(path)
+        self.reg_dict = None
         return self
 
-    def __get_header(self):
-        """Return the header of the registry file."""
-        with open(self.path, "r") as reg:
-            header = reg.readlines(2)
-            return header
+    def __is_excluded(self, key: str) -> bool:
+        return any(key.startswith(ex) for ex in self.exclude)
+
+    @staticmethod
+    def iter_records(
+        path: str, header: Optional[List[str]] = None
+    ) -> Iterator[RegRecord]:
+        """
+        Stream the keys of a wine hive or regedit export without loading
+        the file in memory, wine hives are memory mapped and UTF-16 exports
+        are decoded incrementally. The header is appended to `header`
+        before the first record is yielded.
+        """
+        with open(path, "rb") as reg:
+            if reg.read(2) == codecs.BOM_UTF16_LE:
+                reg.seek(0)
+                text = codecs.getreader("utf-16")(reg, errors="surrogateescape")
+                yield from WinRegister.__iter_text_records(text, header)
+                return
+
+            size = os.fstat(reg.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(reg.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield from WinRegister.__iter_mapped_records(mm, header)
+
+    @staticmethod
+    def __iter_mapped_records(
+        mm: mmap.mmap, header: Optional[List[str]]
+    ) -> Iterator[RegRecord]:
+        size = len(mm)
+        start = 0
+        if mm[:1] != b"[":
+            start = mm.find(b"\n[")
+            start = size if start < 0 else start + 1
+
+        head = mm[:start]
+        if header is not None:
+            header.append(head.decode("utf-8", errors="surrogateescape"))
+        escaped = head.startswith(b"WINE REGISTRY")
+
+        while start < size:
+            nxt = mm.find(b"\n[", start)
+            end = size if nxt < 0 else nxt + 1
+            record = WinRegister.parse_record(mm[start:end], escaped)
+            if record is not None:
+                record.start, record.end = start, end
+                yield record
+            start = end
+
+    @staticmethod
+    def __iter_text_records(
+        lines: IO[str], header: Optional[List[str]]
+    ) -> Iterator[RegRecord]:
+        head: List[str] = []
+        block: List[str] = []
+        escaped = False
+        in_keys = False
+
+        for line in lines:
+            if not line.startswith("["):
+                (block if in_keys else head).append(line)
+                continue
+
+            if not in_keys:
+                in_keys = True
+                escaped = "".join(head).startswith("WINE REGISTRY")
+                if header is not None:
+                    header.append("".join(head))
+            elif block:
+                record = WinRegister.parse_record(
+                    "".join(block).encode("utf-8", errors="surrogateescape"), escaped
+                )
+                if record is not None:
+                    yield record
+            block = [line]
+
+        if not in_keys:
+            if header is not None:
+                header.append("".join(head))
+            return
+
+        record = WinRegister.parse_record(
+            "".join(block).encode("utf-8", errors="surrogateescape"), escaped
+        )
+        if record is not None:
+            yield record
 
     @staticmethod
-    def __parse_dict(path: str):
+    def parse_record(block: bytes, escaped: bool = True) -> Optional[RegRecord]:
         """
-        Parse the registry file and return a dictionary.
+        Parse the key line and metadata of a key block, `escaped` tells
+        whether key names use wine's hive escaping (regedit exports
+        do not escape them).
         """
-        _dict = {}
-        exclude = []  # append here the keys to exclude, not safe
+        nl = block.find(b"\n")
+        if nl < 0:
+            nl = len(block)
 
-        with open(path, "rb") as _reg:
-            content = _reg.read()
-            content = content.decode("utf-16")
-            cur_line = 0
-            regs = content.split("\r")
-            print("Total keys:", len(regs))
+        line = block[:nl].rstrip(b"\r").decode("utf-8", errors="surrogateescape")
+        match = _KEY_LINE.match(line)
+        if match is None:
+            return None
 
-            for reg in regs:
-                if cur_line <= 2:
-                    """
-                    Skip the first 4 lines which are the
-                    register header.
-                    """
-                    cur_line += 1
+        key = match.group(1)
+        if escaped:
+            key = WinRegister.unescape(key)
+        meta = {"stamp": match.group(2), "extra": []}
+        digest = hashlib.blake2b(digest_size=16)
+
+        pos = nl + 1
+        while block.startswith(b"#", pos):
+            eol = block.find(b"\n", pos)
+            if eol < 0:
+                eol = len(block)
+            text = block[pos:eol].rstrip(b"\r")
+            if text.startswith(b"#time="):
+                meta["time"] = text[6:].decode("ascii", errors="replace")
+            else:
+                meta["extra"].append(text.decode("utf-8", errors="surrogateescape"))
+                digest.update(text + b"\n")
+            pos = eol + 1
+
+        digest.update(block[pos:].rstrip())
+        return RegRecord(key, meta, digest.digest(), block, pos)
+
+    @staticmethod
+    def parse_values(lines: List[str]) -> Dict[str, str]:
+        """Return the raw values of a key block, joining continued lines."""
+        values: Dict[str, str] = {}
+        pending = ""
+
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if pending:
+                line = pending + line.lstrip()
+                pending = ""
+
+            if not line.strip() or line.startswith("#"):
+                continue
+
+            if line.endswith("\\") and not line.endswith('"'):
+                pending = line[:-1]
+                continue
+
+            name, data = WinRegister.split_value(line)
+            if name is not None:
+                values[name] = data
+
+        return values
+
+    @staticmethod
+    def sort_key(key: str) -> List[str]:
+        """Order keys the way wine writes them, subkeys after their parent."""
+        return key.lower().split("\\")
+
+    @staticmethod
+    def unescape(text: str) -> str:
+        """Decode a string escaped by wine's registry writer."""
+        if "\\" not in text:
+            return text
+        text = _ESCAPE_SEQ.sub(WinRegister.__unescape_seq, text)
+        # characters past the BMP are written as UTF-16 surrogate pairs
+        return _SURROGATES.sub(
+            lambda m: (
+                m.group().encode("utf-16-le", "surrogatepass").decode("utf-16-le")
+            ),
+            text,
+        )
+
+    @staticmethod
+    def __unescape_seq(match: re.Match) -> str:
+        seq = match.group(1)
+        if seq[0] == "x" and len(seq) > 1:
+            return chr(int(seq[1:], 16))
+        if seq[0] in "01234567":
+            return chr(int(seq, 8))
+        return _ESCAPES.get(seq, seq)
+
+    @staticmethod
+    def escape(text: str, delimiters: str = '""') -> str:
+        """Escape a string the way wine's registry writer does."""
+        out = []
+        for char in text:
+            if char == "\\" or char in delimiters:
+                out.append("\\" + char)
+            elif " " <= char < "\x7f":
+                out.append(char)
+            elif char in _REVERSE_ESCAPES:
+                out.append("\\" + _REVERSE_ESCAPES[char])
+            elif char < "\x80":
+                out.append("\\%03o" % ord(char))
+            elif char > "\uffff":
+                code = ord(char) - 0x10000
+                out.append("\\x%04x" % (0xD800 + (code >> 10)))
+                out.append("\\x%04x" % (0xDC00 + (code & 0x3FF)))
+            else:
+                out.append("\\x%04x" % ord(char))
+        return "".join(out)
+
+    @staticmethod
+    def split_value(line: str) -> Tuple[Optional[str], str]:
+        """Split a `"name"=data` line into the unescaped name and raw data."""
+        if line.startswith("@="):
+            return "", line[2:]
+
+        if not line.startswith('"'):
+            return None, ""
+
+        i = 1
+        while i < len(line):
+            if line[i] == "\\":
+                i += 2
+                continue
+            if line[i] == '"':
+                break
+            i += 1
+
+        if line[i + 1 : i + 2] != "=":
+            return None, ""
+
+        return WinRegister.unescape(line[1:i]), line[i + 2 :]
+
+    @staticmethod
+    def resolve_hive(key: str) -> Optional[Tuple[str, str]]:
+        """
+        Return the hive file name and the path relative to it for a
+        full registry key (e.g. HKEY_CURRENT_USER\\Software\\Wine), or
+        None if the key does not belong to a known hive.
+        """
+        key = key.strip("\\")
+        upper = key.upper()
+        for root in sorted(HIVES, key=len, reverse=True):
+            if upper == root or upper.startswith(root + "\\"):
+                hive, prefix = HIVES[root]
+                sub = key[len(root) + 1 :]
+                path = "\\".join(p for p in (prefix, sub) if p)
+                return hive, path
+        return None
+
+    @staticmethod
+    def follow_links(key: str, get_target: Callable[[str], Optional[str]]) -> str:
+        """
+        Rewrite a hive relative key path through its link keys,
+        `get_target` returns the link target of a key or None if
+        the key is not a link.
+        """
+        for _ in range(16):
+            parts = key.split("\\")
+            for i in range(1, len(parts) + 1):
+                prefix = "\\".join(parts[:i])
+                target = get_target(prefix)
+                if target is None:
                     continue
 
-                for line in reg.split("\n"):
-                    """
-                    Following checks will check the line format, when
-                    one check succeed, continue to the next line.
-                    """
-
-                    if line.startswith("["):
-                        """
-                        Check if line format corresponds to a key, if
-                        true, create a new key in the dictionary.
-                        """
-                        key = line.strip("[]")
-                        if any(key.startswith(ex) for ex in exclude):
-                            key = None
-                            continue
-
-                        _dict[key] = {}
-                        continue
-                    elif line not in ["", "\n"]:
-                        """
-                        Check if line format corresponds to a value, if
-                        true get key and value and append to last key.
-                        """
-                        if key is None:
-                            continue
-
-                        _key = line.split("=")[0]
-                        _value = line[len(_key) + 1 :]
-                        _dict[key][_key] = _value
-                        continue
-
-        return _dict
+                if not isinstance(target, str) or not target:
+                    raise ValueError(f"Broken registry link: {prefix}")
+                if not target.lower().startswith(_MACHINE_ROOT):
+                    raise ValueError(f"Unsupported registry link target: {target}")
 
-    def compare(self, path: Optional[str] = None, register: object = None):
-        """Compare the current register with the given path or register."""
-        if path is not None:
-            register = WinRegister().new(path)
-        elif register is None:
-            raise ValueError("No register given")
+                target = target[len(_MACHINE_ROOT) :]
+                key = "\\".join([target] + parts[i:])
+                break
+            else:
+                return key
 
-        diff = self.__get_diff(register)
-        self.diff = diff
-        return diff
+        raise ValueError(f"Too many registry link levels: {key}")
 
-    def __get_diff(self, register: "WinRegister"):
-        """Return the difference between the current register and the given one."""
-        diff = {}
-        other_reg = register.reg_dict
+    @staticmethod
+    def write_changes(
+        path: str,
+        changes: Dict[str, Optional[Dict[str, Optional[str]]]],
+        replace: bool = False,
+        dest: Optional[str] = None,
+        backup: Optional[str] = None,
+    ) -> Dict[str, dict]:
+        """
+        Stream a registry file to `dest` (default: in place, atomically)
+        applying `changes`: a None entry deletes the key with its subkeys,
+        otherwise the raw values are merged into the key (a None value
+        deletes it) or replace its values if `replace` is True. Untouched
+        keys are copied byte for byte, new keys are inserted in tree order.
+        If `backup` is given the original file is kept there.
+        Return the metadata written for the changed keys.
+        """
+        dest = dest or path
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(dest) or ".", prefix=f".{os.path.basename(dest)}."
+        )
+        try:
+            with os.fdopen(fd, "wb") as out:
+                try:
+                    written = WinRegister.__write_records(
+                        out, path, changes, replace, True
+                    )
+                except UnsortedHiveError:
+                    # new keys can only be appended, they may exist further on
+                    out.seek(0)
+                    out.truncate()
+                    written = WinRegister.__write_records(
+                        out, path, changes, replace, False
+                    )
+                out.flush()
+                os.fsync(out.fileno())
+
+            if os.path.exists(dest):
+                shutil.copymode(dest, tmp_path)
+            if backup is not None and os.path.exists(path):
+                os.rename(path, backup)
+            os.replace(tmp_path, dest)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return written
+
+    @staticmethod
+    def __write_records(
+        out: IO[bytes],
+        path: str,
+        changes: Dict[str, Optional[Dict[str, Optional[str]]]],
+        replace: bool,
+        in_order: bool,
+    ) -> Dict[str, dict]:
+        now = int(time.time())
+        stamps = {"stamp": str(now), "time": "%x" % ((now + _FILETIME_EPOCH) * 10**7)}
+        edits: Dict[str, Tuple[str, Dict[str, Optional[str]]]] = {}
+        deleted: List[str] = []
+        for key, values in changes.items():
+            if values is None:
+                deleted.append(key.lower())
+                edits.pop(key.lower(), None)
+                continue
+            edit = edits.setdefault(key.lower(), (key, {}))
+            edit[1].update(values)
+
+        pending = deque(sorted(edits, key=WinRegister.sort_key) if in_order else [])
+        written: Dict[str, dict] = {}
+        header: List[str] = []
+        last = None
+
+        def write(key: str, meta: dict, values: Dict[str, str]):
+            meta = dict(meta, **stamps)
+            written[key.lower()] = meta
+            out.write(WinRegister.format_record(key, meta, values))
 
-        for key in self.reg_dict:
-            if key not in other_reg:
-                diff[key] = self.reg_dict[key]
+        def write_new(lower: str):
+            key, ops = edits.pop(lower)
+            values = {n: v for n, v in ops.items() if v is not None}
+            if values or not ops:
+                write(key, {"stamp": None, "extra": []}, values)
+
+        for record in WinRegister.iter_records(path, header):
+            if last is None:
+                out.write(WinRegister.__encode("".join(header).rstrip() + "\n"))
+
+            order = WinRegister.sort_key(record.key)
+            if last is not None and order < last:
+                if in_order:
+                    raise UnsortedHiveError(path)
+            last = order
+
+            lower = record.key.lower()
+            while pending and WinRegister.sort_key(pending[0]) < order:
+                write_new(pending.popleft())
+            if pending and pending[0] == lower:
+                pending.popleft()
+
+            if any(lower == d or lower.startswith(d + "\\") for d in deleted):
                 continue
 
-            for _key in self.reg_dict[key]:
-                if _key not in other_reg[key]:
-                    diff[key] = self.reg_dict[key]
-                    break
+            if lower not in edits:
+                out.write(b"\n" + record.block.rstrip(b"\r\n") + b"\n")
+                continue
+
+            key, ops = edits.pop(lower)
+            values = {} if replace else dict(record.values)
+            for name, data in ops.items():
+                for _name in values:
+                    if _name.lower() == name.lower():
+                        name = _name
+                        break
+                if data is None:
+                    values.pop(name, None)
+                else:
+                    values[name] = data
+            write(record.key, record.meta, values)
+
+        if last is None:
+            out.write(WinRegister.__encode("".join(header).rstrip() + "\n"))
+
+        for lower in sorted(edits, key=WinRegister.sort_key):
+            write_new(lower)
+
+        return written
+
+    @staticmethod
+    def __encode(text: str) -> bytes:
+        return text.encode("utf-8", errors="surrogateescape")
+
+    @staticmethod
+    def format_record(key: str, meta: dict, values: Dict[str, str]) -> bytes:
+        """Serialise a key block the way wine writes it."""
+        name = WinRegister.escape(key, "[]")
+        lines = [f"\n[{name}] {meta['stamp']}" if meta.get("stamp") else f"\n[{name}]"]
+        if meta.get("time"):
+            lines.append(f"#time={meta['time']}")
+        lines.extend(meta["extra"])
+
+        for _name, data in values.items():
+            if _name == "":
+                lines.append(f"@={data}")
+            else:
+                lines.append(f'"{WinRegister.escape(_name)}"={data}')
+        return WinRegister.__encode("\n".join(lines) + "\n")
+
+    @staticmethod
+    def iter_diff(
+        path: str, other: str
+    ) -> Iterator[Tuple[str, Optional[RegRecord], Optional[RegRecord]]]:
+        """
+        Yield (key, record, other_record) for every key whose content
+        differs between two registry files, the missing side is None.
+        Both files are streamed and merged in tree order, raise
+        UnsortedHiveError if one of them is not sorted.
+        """
+        left = WinRegister.__iter_sorted(path)
+        right = WinRegister.__iter_sorted(other)
+        a = next(left, None)
+        b = next(right, None)
+
+        while a is not None or b is not None:
+            if b is None or (a is not None and a[0] < b[0]):
+                yield a[1].key, a[1], None
+                a = next(left, None)
+            elif a is None or b[0] < a[0]:
+                yield b[1].key, None, b[1]
+                b = next(right, None)
+            else:
+                if a[1].digest != b[1].digest:
+                    yield a[1].key, a[1], b[1]
+                a = next(left, None)
+                b = next(right, None)
+
+    @staticmethod
+    def __iter_sorted(path: str) -> Iterator[Tuple[List[str], RegRecord]]:
+        last = None
+        for record in WinRegister.iter_records(path):
+            order = WinRegister.sort_key(record.key)
+            if last is not None and order <= last:
+                raise UnsortedHiveError(path)
+            last = order
+            yield order, record
+
+    @staticmethod
+    def decode_value(data: str):
+        """
+        Decode the raw hive representation of a value, returning
+        a (type, data) tuple where data is str, list, int or bytes.
+        """
+        if data.startswith('"'):
+            return REG_SZ, WinRegister.unescape(data[1:-1])
+
+        if data.startswith("str("):
+            _type = int(data[4 : data.index(")")], 16)
+            text = WinRegister.unescape(data[data.index(":") + 2 : -1])
+            if _type == REG_MULTI_SZ:
+                return _type, [s for s in text.split("\0") if s]
+            return _type, text
 
-                if self.reg_dict[key][_key] != other_reg[key][_key]:
-                    diff[key] = self.reg_dict[key]
-                    break
+        if data.startswith("dword:"):
+            return REG_DWORD, int(data[6:], 16)
 
+        if data.startswith("hex"):
+            _type = REG_BINARY
+            if data.startswith("hex("):
+                _type = int(data[4 : data.index(")")], 16)
+            raw = data[data.index(":") + 1 :].replace("\\", "").replace(" ", "")
+            blob = bytes(int(b, 16) for b in raw.split(",") if b)
+            if _type in (REG_SZ, REG_EXPAND_SZ, REG_LINK):
+                return _type, blob.decode("utf-16-le").rstrip("\0")
+            if _type == REG_MULTI_SZ:
+                text = blob.decode("utf-16-le")
+                return _type, [s for s in text.split("\0") if s]
+            if _type in (REG_DWORD, REG_QWORD) and len(blob) in (4, 8):
+                return _type, int.from_bytes(blob, "little")
+            return _type, blob
+
+        raise ValueError(f"Unknown registry value format: {data[:32]}")
+
+    @staticmethod
+    def encode_hex(blob: bytes, _type: int = REG_BINARY) -> str:
+        prefix = "hex:" if _type == REG_BINARY else "hex(%x):" % _type
+        return prefix + ",".join("%02x" % b for b in blob)
+
+    @staticmethod
+    def encode_value(value_type: Optional[str], data: str) -> str:
+        """
+        Encode data given with reg.exe semantics (`reg add /t TYPE /d DATA`)
+        into its raw hive representation.
+        """
+        _type = REG_TYPES.get((value_type or "REG_SZ").upper())
+        if _type is None:
+            raise ValueError(f"Unsupported registry type: {value_type}")
+
+        if _type == REG_SZ:
+            return f'"{WinRegister.escape(data)}"'
+
+        if _type == REG_EXPAND_SZ:
+            return f'str(2):"{WinRegister.escape(data)}"'
+
+        if _type == REG_MULTI_SZ:
+            strings = [s for s in data.split("\\0") if s]
+            text = "".join(f"{s}\0" for s in strings)
+            return f'str(7):"{WinRegister.escape(text)}"'
+
+        if _type in (REG_DWORD, REG_QWORD):
+            base = 16 if data[1:2].lower() == "x" else 10
+            number = int(data, base)
+            if data.startswith("-") or number >= 2 ** (
+                32 if _type == REG_DWORD else 64
+            ):
+                raise ValueError(f"Invalid number: {data}")
+            if _type == REG_DWORD:
+                return "dword:%08x" % number
+            return WinRegister.encode_hex(number.to_bytes(8, "little"), REG_QWORD)
+
+        data = data.strip()
+        if len(data) % 2:
+            data = f"0{data}"
+        return WinRegister.encode_hex(bytes.fromhex(data), _type)
+
+    @staticmethod
+    def encode_reg_file_value(key_type: str, data: str) -> str:
+        """
+        Encode data given with .reg file semantics (`"value"=TYPE:DATA`)
+        into its raw hive representation.
+        """
+        key_type = key_type.lower()
+
+        if key_type == "dword":
+            if not re.fullmatch(r"[0-9a-fA-F]{1,8}", data.strip()):
+                raise ValueError(f"Invalid dword: {data}")
+            return "dword:%08x" % int(data, 16)
+
+        match = re.fullmatch(r"hex(?:\(([0-9a-fA-F]+)\))?", key_type)
+        if match is not None:
+            _type = int(match.group(1), 16) if match.group(1) else REG_BINARY
+            raw = re.sub(r"[\s\\]", "", data)
+            blob = bytes(int(b, 16) for b in raw.split(",") if b)
+            return WinRegister.encode_hex(blob, _type)
+
+        match = re.fullmatch(r"str\(([0-9a-fA-F]+)\)", key_type)
+        if match is not None:
+            return f'str({match.group(1)}):"{WinRegister.escape(data)}"'
+
+        raise ValueError(f"Unsupported registry type: {key_type}")
+
+    def compare(self, path: Optional[str] = None, register: object = None):
+        """
+        Compare the current register with the given path or register,
+        return the keys which are missing or different in the other one.
+        """
+        if path is None:
+            if register is None:
+                raise ValueError("No register given")
+            path = register.path
+
+        diff = {}
+        try:
+            for key, record, _other in self.iter_diff(self.path, path):
+                if record is not None and not self.__is_excluded(key):
+                    diff[key] = record.values
+        except UnsortedHiveError:
+            diff = self.__get_diff(path)
+
+        self.diff = diff
         return diff
 
+    def __get_diff(self, path: str):
+        """
+        Return the difference between the current register and the given
+        one when they are not sorted, only the digests of the other one
+        are kept in memory.
+        """
+        digests = {r.key: r.digest for r in self.iter_records(path)}
+        return {
+            record.key: record.values
+            for record in self.iter_records(self.path)
+            if digests.get(record.key) != record.digest
+            and not self.__is_excluded(record.key)
+        }
+
     def update(self, diff: Optional[dict] = None):
         """Update the current register with the given diff."""
         if diff is None:
             diff = self.diff  # use last diff
 
-        for key in diff:
-            self.reg_dict[key] = diff[key]
-
-        if os.path.exists(self.path):
-            """
-            Make a backup before overwriting the register.
-            """
-            os.rename(self.path, f"{self.path}.{uuid.uuid4()}.bak")
-
-        with open(self.path, "w") as reg:
-            for h in self.__get_header():
-                reg.write(h)
-
-            for key in self.reg_dict:
-                reg.write(f"[{key}]\n")
-                for _key in self.reg_dict[key]:
-                    if _key == "time":
-                        reg.write(f"#time={self.reg_dict[key][_key]}\n")
-                    else:
-                        reg.write(f"{_key}={self.reg_dict[key][_key]}\n")
-                reg.write("\n")
+        self.write_changes(
+            self.path, diff, replace=True, backup=f"{self.path}.{uuid.uuid4()}.bak"
+        )
+        if self._reg_dict is not None:
+            self._reg_dict.update(diff)
 
     def export_json(self, path: str):
-        """Export the current register to a json file."""
+        """Export the current register to a json file, one key at a time."""
         with open(path, "w") as json_file:
-            json.dump(self.reg_dict, json_file, indent=4)
+            json_file.write("{")
+            sep = "\n"
+            for record in self.iter_records(self.path):
+                if self.__is_excluded(record.key):
+                    continue
+                values = json.dumps(record.values, indent=4).replace("\n", "\n    ")
+                json_file.write(f"{sep}    {json.dumps(record.key)}: {values}")
+                sep = ",\n"
+            json_file.write("\n}" if sep != "\n" else "}")
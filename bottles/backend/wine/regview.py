@@ -0,0 +1,221 @@
+# regview.py
+#
+# Copyright 2025 mirkobrombin <brombin94@gmail.com>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, in version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from bottles.backend.logger import Logger
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.manager import ManagerUtils
+from bottles.backend.wine.register import WinRegister
+
+logging = Logger()
+
+
+class _HiveIndex:
+    """
+    Offsets of every key block in a hive file, with a digest of its
+    content so parsed values can be reused across re-indexing.
+    """
+
+    def __init__(self, path: str, stamp: tuple):
+        self.path = path
+        self.stamp = stamp
+        # lowercase key -> (key, start, end, digest, is_link)
+        self.keys: Dict[str, Tuple[str, int, int, bytes, bool]] = {}
+        # digest -> parsed values
+        self.parsed: Dict[bytes, Dict[str, str]] = {}
+
+    def build(self, previous: Optional["_HiveIndex"] = None):
+        for record in WinRegister.iter_records(self.path):
+            is_link = "#link" in record.meta["extra"]
+            self.keys[record.key.lower()] = (
+                record.key,
+                record.start,
+                record.end,
+                record.digest,
+                is_link,
+            )
+
+        if previous is not None:
+            """
+            Keep the values already parsed for the keys whose content
+            did not change, so only edited keys are parsed again.
+            """
+            digests = {k[3] for k in self.keys.values()}
+            self.parsed = {d: v for d, v in previous.parsed.items() if d in digests}
+
+        return self
+
+    def values(self, key: str) -> Optional[Dict[str, str]]:
+        entry = self.keys.get(key.lower())
+        if entry is None:
+            return None
+
+        _name, start, end, digest, _is_link = entry
+        if digest in self.parsed:
+            return self.parsed[digest]
+
+        with open(self.path, "rb") as hive:
+            hive.seek(start)
+            record = WinRegister.parse_record(hive.read(end - start))
+
+        if record is None or record.digest != digest:
+            raise _StaleIndex(self.path)
+
+        self.parsed[digest] = record.values
+        return record.values
+
+    def link_target(self, key: str) -> Optional[str]:
+        entry = self.keys.get(key.lower())
+        if entry is None or not entry[4]:
+            return None
+
+        raw = self.__get_raw(self.values(key) or {}, "SymbolicLinkValue")
+        if raw is None:
+            return ""
+        return WinRegister.decode_value(raw)[1]
+
+    @staticmethod
+    def __get_raw(values: Dict[str, str], name: str) -> Optional[str]:
+        if name in values:
+            return values[name]
+        for _name in values:
+            if _name.lower() == name.lower():
+                return values[_name]
+        return None
+
+
+class _StaleIndex(Exception):
+    pass
+
+
+class RegistryView:
+    """
+    Read-only access to a bottle registry, parsing the hive files
+    natively instead of spawning `reg query`. Parsed hives are shared
+    between views and refreshed when the files change on disk, only
+    the most recently used ones are kept.
+    """
+
+    max_indexes = 6
+
+    _indexes: "OrderedDict[str, _HiveIndex]" = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, config: BottleConfig):
+        self.config = config
+        self.bottle = ManagerUtils.get_bottle_path(config)
+        if config.Environment == "Steam":
+            self.bottle = config.Path
+
+    @classmethod
+    def _get_index(cls, path: str, refresh: bool = False) -> Optional[_HiveIndex]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+
+        stamp = (st.st_ino, st.st_size, st.st_mtime_ns)
+        with cls._lock:
+            index = cls._indexes.get(path)
+            if index is not None and index.stamp == stamp and not refresh:
+                cls._indexes.move_to_end(path)
+                return index
+
+            logging.debug(f"Indexing registry hive {path}")
+            try:
+                cls._indexes[path] = _HiveIndex(path, stamp).build(index)
+            except OSError as e:
+                logging.warning(f"Failed to index registry hive {path}: {e}")
+                return None
+            cls._indexes.move_to_end(path)
+            while len(cls._indexes) > cls.max_indexes:
+                cls._indexes.popitem(last=False)
+            return cls._indexes[path]
+
+    def __lookup(self, key: str) -> Tuple[Optional[_HiveIndex], str]:
+        target = WinRegister.resolve_hive(key)
+        if target is None:
+            raise ValueError(f"Unsupported registry root: {key}")
+
+        hive, path = target
+        index = self._get_index(os.path.join(self.bottle, hive))
+        if index is None:
+            return None, path
+        return index, WinRegister.follow_links(path, index.link_target)
+
+    def resolve(self, key: str) -> Tuple[str, str]:
+        """
+        Return the hive file and the hive relative path of a key,
+        following symbolic link keys.
+        """
+        _index, path = self.__lookup(key)
+        return WinRegister.resolve_hive(key)[0], path
+
+    def __get_values(self, key: str) -> Optional[Dict[str, str]]:
+        for _ in range(2):
+            try:
+                index, path = self.__lookup(key)
+                if index is None:
+                    return None
+                return index.values(path)
+            except (_StaleIndex, OSError) as e:
+                # the hive was rewritten while reading it
+                logging.debug(f"Registry hive changed while reading: {e}")
+                hive = WinRegister.resolve_hive(key)[0]
+                self._get_index(os.path.join(self.bottle, hive), refresh=True)
+        return None
+
+    def exists(self, key: str) -> bool:
+        return self.__get_values(key) is not None
+
+    def get(self, key: str, value: str, default: Any = None) -> Any:
+        """
+        Return the decoded data of a value (str, list, int or bytes),
+        use an empty value name for the default value.
+        """
+        values = self.__get_values(key)
+        if values is None:
+            return default
+
+        for name, raw in values.items():
+            if name.lower() == value.lower():
+                return WinRegister.decode_value(raw)[1]
+        return default
+
+    def enumerate(self, key: str) -> Dict[str, Any]:
+        """Return all the values of a key with their decoded data."""
+        values = self.__get_values(key) or {}
+        return {name: WinRegister.decode_value(raw)[1] for name, raw in values.items()}
+
+    def subkeys(self, key: str) -> List[str]:
+        """Return the names of the direct subkeys of a key."""
+        index, path = self.__lookup(key)
+        if index is None:
+            return []
+
+        prefix = f"{path.lower()}\\" if path else ""
+        found: Dict[str, str] = {}
+        for lower, entry in index.keys.items():
+            if not lower.startswith(prefix) or lower == prefix[:-1]:
+                continue
+            child = entry[0][len(prefix) :].split("\\")[0]
+            found.setdefault(child.lower(), child)
+        return list(found.values())
@@ -1,16 +1,125 @@
-from typing import Optional
+import dataclasses
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
 
 from bottles.backend.logger import Logger
+from bottles.backend.models.result import Result
+from bottles.backend.wine.regview import RegistryView
 from bottles.backend.wine.wineprogram import WineProgram
 
 logging = Logger()
 
+_UNINSTALL = "Software\\Microsoft\\Windows\\CurrentVersion\\Uninstall"
+
+# registry view -> Uninstall key, as listed by wine's uninstaller
+_UNINSTALL_KEYS = (
+    ("HKLM", f"HKEY_LOCAL_MACHINE\\{_UNINSTALL}"),
+    (
+        "HKLM32",
+        "HKEY_LOCAL_MACHINE\\Software\\Wow6432Node\\Microsoft\\Windows\\"
+        "CurrentVersion\\Uninstall",
+    ),
+    ("HKCU", f"HKEY_CURRENT_USER\\{_UNINSTALL}"),
+)
+
+
+@dataclasses.dataclass
+class UninstallEntry:
+    uuid: str
+    name: str
+    uninstall_string: str
+    install_location: str = ""
+    publisher: str = ""
+    version: str = ""
+    view: str = "HKLM"
+
 
 class Uninstaller(WineProgram):
     program = "Wine Uninstaller"
     command = "uninstaller"
 
+    # bottle path -> (hive stamps, entries)
+    _cache: Dict[str, Tuple[tuple, List[UninstallEntry]]] = {}
+    _cache_lock = threading.Lock()
+
+    def list_programs(self) -> Optional[List[UninstallEntry]]:
+        """
+        Return the programs listed by wine's uninstaller, reading the
+        Uninstall keys straight from the hives. Return None if the bottle
+        registry can not be read natively.
+        """
+        view = RegistryView(self.config)
+        stamps = []
+        for hive in ("system.reg", "user.reg"):
+            try:
+                st = os.stat(os.path.join(view.bottle, hive))
+            except OSError:
+                return None
+            stamps.append((st.st_ino, st.st_size, st.st_mtime_ns))
+
+        with self._cache_lock:
+            cached = self._cache.get(view.bottle)
+        if cached is not None and cached[0] == tuple(stamps):
+            return cached[1]
+
+        entries = []
+        for name, key in _UNINSTALL_KEYS:
+            for uuid in sorted(view.subkeys(key), key=str.lower):
+                entry = self.__get_entry(view, name, f"{key}\\{uuid}", uuid)
+                if entry is not None:
+                    entries.append(entry)
+
+        with self._cache_lock:
+            self._cache[view.bottle] = (tuple(stamps), entries)
+        return entries
+
+    @staticmethod
+    def __get_entry(
+        view: RegistryView, name: str, key: str, uuid: str
+    ) -> Optional[UninstallEntry]:
+        values = {k.lower(): v for k, v in view.enumerate(key).items()}
+
+        def text(value: str) -> str:
+            data = values.get(value.lower(), "")
+            return data if isinstance(data, str) else ""
+
+        if not text("DisplayName") or values.get("systemcomponent") == 1:
+            return None
+
+        uninstall_string = text("UninstallString")
+        if not uninstall_string and values.get("windowsinstaller") == 1:
+            uninstall_string = f"msiexec /x{uuid}"
+        if not uninstall_string:
+            return None
+
+        return UninstallEntry(
+            uuid=uuid,
+            name=text("DisplayName"),
+            uninstall_string=uninstall_string,
+            install_location=text("InstallLocation"),
+            publisher=text("Publisher"),
+            version=text("DisplayVersion"),
+            view=name,
+        )
+
     def get_uuid(self, name: Optional[str] = None):
+        try:
+            programs = self.list_programs()
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to read the uninstall keys: {e}")
+            programs = None
+
+        if programs is not None:
+            lines = [f"{p.uuid}|||{p.name}" for p in programs]
+            if name is not None:
+                lines = [
+                    line.split("|||")[0]
+                    for line in lines
+                    if name.lower() in line.lower()
+                ]
+            return Result(status=True, data="\n".join(lines))
+
         args = " --list"
 
         if name is not None:
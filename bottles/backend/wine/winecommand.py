@@ -1,27 +1,32 @@
+import asyncio
+import codecs
+import contextlib
 import os
 import re
 import shlex
+import signal
 import stat
 import subprocess
 import tempfile
-from typing import Iterable, Optional
-
-from bottles.backend.globals import (
-    Paths,
-    gamemode_available,
-    gamescope_available,
-    mangohud_available,
-    obs_vkc_available,
-    vmtouch_available,
-)
+import threading
+import weakref
+from collections import OrderedDict, deque
+from typing import Callable, Dict, Generator, Iterable, List, Optional
+
+from bottles.backend.globals import Paths
 from bottles.backend.logger import Logger
+from bottles.backend.managers.prefetch import PrefetchManager
 from bottles.backend.managers.runtime import RuntimeManager
 from bottles.backend.managers.sandbox import SandboxManager
+from bottles.backend.managers.shader_cache import ShaderCacheManager
 from bottles.backend.models.config import BottleConfig
 from bottles.backend.models.result import Result
+from bottles.backend.utils.command import Command, get_argv
 from bottles.backend.utils.display import DisplayUtils
 from bottles.backend.utils.generic import detect_encoding
 from bottles.backend.utils.gpu import GPUUtils
+from bottles.backend.utils.host import HostCapabilities
+from bottles.backend.utils.launch import LaunchOptions
 from bottles.backend.utils.manager import ManagerUtils
 from bottles.backend.utils.steam import SteamUtils
 from bottles.backend.utils.terminal import TerminalUtils
@@ -92,6 +97,92 @@ class WineEnv:
         return key in self.__env
 
 
+class WineOutput:
+    """
+    Decode a command output while it is read. The encoding is detected
+    once on the first probe_size bytes, then the decoded lines are kept
+    in a ring buffer holding at most limit characters.
+    """
+
+    probe_size = 8 * 1024
+    chunk_size = 64 * 1024
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.encoding: Optional[str] = None
+        self.truncated = False
+        self.__pending = b""
+        self.__decoder = None
+        self.__partial = ""
+        self.__tail: deque = deque()
+        self.__size = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self.__tail)
+
+    def feed(self, data: bytes) -> List[str]:
+        """Decode a chunk and return the lines it completed."""
+        if self.__decoder is None:
+            self.__pending += data
+            if len(self.__pending) < self.probe_size:
+                return []
+            data = self.__pending
+            self.__set_encoding(data[: self.probe_size])
+            self.__pending = b""
+        return self.__split(self.__decoder.decode(data))
+
+    def close(self) -> List[str]:
+        """Flush the pending bytes and the last incomplete line."""
+        data = b""
+        if self.__decoder is None:
+            data = self.__pending
+            self.__set_encoding(data)
+            self.__pending = b""
+        lines = self.__split(self.__decoder.decode(data, final=True))
+        if self.__partial:
+            lines.append(self.__keep(self.__partial))
+            self.__partial = ""
+        return lines
+
+    def __set_encoding(self, prefix: bytes):
+        # Consider changing the locale to C.UTF-8 when
+        # executing commands, to ensure consistent output and
+        # enable callers to make use of the returned value,
+        # also without requiring the encoding detection dance
+        # Bytes the locked in codec can't decode are kept escaped.
+        codec = detect_encoding(prefix)
+        try:
+            decoder = codecs.getincrementaldecoder(codec)
+            self.encoding = codec
+        except (LookupError, TypeError):
+            # LookupError: unknown codec name
+            # TypeError: codec is None
+            logging.warning("stdout decoding failed")
+            decoder = codecs.getincrementaldecoder("utf-8")
+        self.__decoder = decoder(errors="backslashreplace")
+
+    def __split(self, text: str) -> List[str]:
+        if not text:
+            return []
+        parts = (self.__partial + text).splitlines(keepends=True)
+        self.__partial = ""
+        if parts and not parts[-1].endswith("\n"):
+            self.__partial = parts.pop()
+        return [self.__keep(line) for line in parts]
+
+    def __keep(self, line: str) -> str:
+        if len(line) > self.limit:
+            line = line[-self.limit :]
+            self.truncated = True
+        self.__tail.append(line)
+        self.__size += len(line)
+        while self.__size > self.limit:
+            self.__size -= len(self.__tail.popleft())
+            self.truncated = True
+        return line.rstrip("\r\n")
+
+
 def apply_wayland_preferences(env: "WineEnv", params) -> None:
     if not getattr(params, "wayland", False):
         return
@@ -134,6 +225,26 @@ class WineCommand:
     It also handles the launch in a terminal or not.
     """
 
+    # bottle path -> {launch key: (host snapshot, environment)}
+    _env_cache: Dict[str, "OrderedDict[tuple, tuple]"] = {}
+    _env_cache_lock = threading.Lock()
+    env_cache_size = 32
+
+    # characters of output kept in Result.data
+    output_limit = 4 * 1024 * 1024
+
+    # unix path of the launched program, its files are preloaded
+    program: Optional[str] = None
+
+    # LaunchOptions keys overriding the bottle ones for this command
+    launch_options: Optional[dict] = None
+
+    # commands run at once per bottle by run_async
+    bottle_concurrency = 4
+    _semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = (
+        weakref.WeakKeyDictionary()
+    )
+
     def __init__(
         self,
         config: BottleConfig,
@@ -149,10 +260,14 @@ class WineCommand:
         pre_script_args: Optional[str] = None,
         post_script_args: Optional[str] = None,
         cwd: Optional[str] = None,
+        output_limit: Optional[int] = None,
+        program: Optional[str] = None,
+        launch_options: Optional[dict] = None,
     ):
         _environment = environment.copy()
         self.config = self._get_config(config)
         self.minimal = minimal
+        self.launch_options = launch_options
         self.arguments = arguments
         self.cwd = self._get_cwd(cwd)
         self.runner, self.runner_runtime = self._get_runner_info()
@@ -173,7 +288,9 @@ class WineCommand:
         self.env = self.get_env(_environment)
         self.communicate = communicate
         self.colors = colors
-        self.vmtouch_files = None
+        self.program = program
+        if output_limit is not None:
+            self.output_limit = output_limit
 
     def _get_config(self, config: BottleConfig) -> BottleConfig:
         if cnf := config.data.get("config"):
@@ -213,6 +330,79 @@ class WineCommand:
         environment: Optional[dict] = None,
         return_steam_env: bool = False,
         return_clean_env: bool = False,
+    ) -> dict:
+        """
+        Return the launch environment. The standard environment is built
+        once for the bottle settings, the process environment and the host
+        snapshot, then reused by later launches until update_config is
+        called for the bottle.
+        """
+        if return_steam_env or return_clean_env:
+            return self.__build_env(environment, return_steam_env, return_clean_env)
+
+        host = HostCapabilities.get()
+        bottle = self.config.Path
+        try:
+            key = self.__get_env_key(environment)
+            hash(key)
+        except TypeError:
+            return self.__build_env(environment, host=host)
+
+        with self._env_cache_lock:
+            entries = self._env_cache.get(bottle)
+            cached = entries.get(key) if entries is not None else None
+            if cached is not None and cached[0] is host:
+                entries.move_to_end(key)
+                return dict(cached[1])
+
+        env = self.__build_env(dict(environment or {}), host=host)
+
+        with self._env_cache_lock:
+            entries = self._env_cache.setdefault(bottle, OrderedDict())
+            entries[key] = (host, env)
+            entries.move_to_end(key)
+            while len(entries) > self.env_cache_size:
+                entries.popitem(last=False)
+        return dict(env)
+
+    @classmethod
+    def invalidate_env(cls, config: BottleConfig):
+        """Drop the cached launch environments of the given bottle."""
+        with cls._env_cache_lock:
+            cls._env_cache.pop(config.Path, None)
+
+    def __get_env_key(self, environment: Optional[dict]) -> tuple:
+        config = self.config
+        return (
+            config.Name,
+            config.Custom_Path,
+            config.Environment,
+            config.Arch,
+            config.Runner,
+            config.RunnerPath,
+            config.DXVK,
+            config.VKD3D,
+            config.NVAPI,
+            config.LatencyFleX,
+            config.Language,
+            config.Limit_System_Environment,
+            tuple(config.Inherited_Environment_Variables),
+            repr(config.Parameters),
+            repr(config.Environment_Variables),
+            repr(config.DLL_Overrides),
+            self.minimal,
+            self.terminal,
+            self.gamescope_activated,
+            tuple((environment or {}).items()),
+            tuple(os.environ.items()),
+        )
+
+    def __build_env(
+        self,
+        environment: Optional[dict] = None,
+        return_steam_env: bool = False,
+        return_clean_env: bool = False,
+        host: Optional[HostCapabilities] = None,
     ) -> dict:
         config = self.config
         clean_env = return_steam_env or return_clean_env
@@ -249,7 +439,8 @@ class WineCommand:
 
         dll_overrides = []
         gpu = GPUUtils().get_gpu()
-        DisplayUtils.check_nvidia_device()
+        if host is None:
+            host = HostCapabilities.get()
         ld = []
 
         # Bottle environment variables
@@ -293,14 +484,14 @@ class WineCommand:
             and not self.terminal
             and not return_steam_env
         ):
-            _rb = RuntimeManager.get_runtime_env("bottles")
+            _rb = host.get_runtime_env()
             if _rb:
-                _eac = RuntimeManager.get_eac()
-                _be = RuntimeManager.get_be()
+                _eac = host.get_eac()
+                _be = host.get_be()
 
                 if params.use_runtime:
                     logging.info("Using Bottles runtime")
-                    ld += _rb
+                    ld.append(_rb.lstrip(":"))
 
                 if (
                     _eac and not self.minimal
@@ -365,7 +556,8 @@ class WineCommand:
         if params.dxvk and not return_steam_env:
             env.add("WINE_LARGE_ADDRESS_AWARE", "1")
             env.add(
-                "DXVK_STATE_CACHE_PATH", os.path.join(bottle, "cache", "dxvk_state")
+                "DXVK_STATE_CACHE_PATH",
+                ShaderCacheManager.get_path(config, "dxvk_state"),
             )
             env.add("STAGING_SHARED_MEMORY", "1")
             env.add("__GL_SHADER_DISK_CACHE", "1")
@@ -374,16 +566,18 @@ class WineCommand:
             )  # should not be needed anymore
             env.add(
                 "__GL_SHADER_DISK_CACHE_PATH",
-                os.path.join(bottle, "cache", "gl_shader"),
+                ShaderCacheManager.get_path(config, "gl_shader"),
             )
             env.add(
-                "MESA_SHADER_CACHE_DIR", os.path.join(bottle, "cache", "mesa_shader")
+                "MESA_SHADER_CACHE_DIR",
+                ShaderCacheManager.get_path(config, "mesa_shader"),
             )
 
         # VKD3D environment variables
         if params.vkd3d and not return_steam_env:
             env.add(
-                "VKD3D_SHADER_CACHE_PATH", os.path.join(bottle, "cache", "vkd3d_shader")
+                "VKD3D_SHADER_CACHE_PATH",
+                ShaderCacheManager.get_path(config, "vkd3d_shader"),
             )
 
         # LatencyFleX environment variables
@@ -402,7 +596,7 @@ class WineCommand:
         if (
             params.mangohud
             and not self.minimal
-            and not (gamescope_available and self.gamescope_activated)
+            and not (host.gamescope and self.gamescope_activated)
         ):
             env.add("MANGOHUD", "1")
             env.add("MANGOHUD_DLSYM", "1")
@@ -580,25 +774,26 @@ class WineCommand:
             command = f"{runner} {command}"
 
         if not self.minimal:
-            if gamemode_available and params.gamemode:
+            host = HostCapabilities.get()
+            if host.gamemode and params.gamemode:
                 if not return_steam_cmd:
-                    command = f"{gamemode_available} {command}"
+                    command = f"{host.gamemode} {command}"
                 else:
                     command = f"gamemode {command}"
 
-            if mangohud_available and params.mangohud and not self.gamescope_activated:
+            if host.mangohud and params.mangohud and not self.gamescope_activated:
                 if not return_steam_cmd:
-                    command = f"{mangohud_available} {command}"
+                    command = f"{host.mangohud} {command}"
                 else:
                     command = f"mangohud {command}"
 
-            if gamescope_available and self.gamescope_activated:
+            if host.gamescope and self.gamescope_activated:
                 gamescope_run = tempfile.NamedTemporaryFile(mode="w", suffix=".sh").name
 
                 # Create temporary sh script in /tmp where Gamescope will execute it
                 file = ["#!/usr/bin/env sh\n"]
                 file.append(f"{command} $@")
-                if mangohud_available and params.mangohud:
+                if host.mangohud and params.mangohud:
                     file.append(" &\nmangoapp")
                 with open(gamescope_run, "w") as f:
                     f.write("".join(file))
@@ -616,8 +811,8 @@ class WineCommand:
                 st = os.stat(gamescope_run)
                 os.chmod(gamescope_run, st.st_mode | stat.S_IEXEC)
 
-            if obs_vkc_available and params.obsvkc:
-                command = f"{obs_vkc_available} {command}"
+            if host.obs_vkc and params.obsvkc:
+                command = f"{host.obs_vkc} {command}"
 
         if params.use_steam_runtime:
             _rs = RuntimeManager.get_runtimes("steam")
@@ -670,6 +865,11 @@ class WineCommand:
                     del extracted_env["WINEDLLOVERRIDES"]
                 environment.update(extracted_env)
 
+        if not self.minimal:
+            prefix = self._get_launch_prefix(return_steam_cmd)
+            if len(prefix):
+                command = f"{prefix} {command}"
+
         if post_script not in (None, ""):
             post_cmd_parts = [post_script]
             if post_script_args not in (None, ""):
@@ -686,13 +886,28 @@ class WineCommand:
 
         return command
 
+    def _get_launch_prefix(self, return_steam_cmd: bool = False) -> Command:
+        """Return the scheduling and cgroup wrappers of the launch options."""
+        options = LaunchOptions.from_params(self.config.Parameters, self.launch_options)
+        host = HostCapabilities.get()
+        tools = {
+            "systemd_run": host.systemd_run,
+            "taskset": host.taskset,
+            "nice": host.nice,
+            "ionice": host.ionice,
+        }
+        if return_steam_cmd:
+            tools = {k: k.replace("_", "-") if v else "" for k, v in tools.items()}
+        return options.get_prefix(**tools)
+
     def _get_gamescope_cmd(self, return_steam_cmd: bool = False) -> str:
         config = self.config
         params = config.Parameters
         gamescope_cmd = []
+        gamescope = HostCapabilities.get().gamescope
 
-        if gamescope_available and self.gamescope_activated:
-            gamescope_cmd = [gamescope_available]
+        if gamescope and self.gamescope_activated:
+            gamescope_cmd = [gamescope]
             if return_steam_cmd:
                 gamescope_cmd = ["gamescope"]
             if params.gamescope_custom_options:
@@ -725,39 +940,18 @@ class WineCommand:
 
         return " ".join(gamescope_cmd)
 
-    def _vmtouch_preload(self):
-        vmtouch_flags = "-t -v -l -d"
-        vmtouch_file_size = " -m 1024M"
-        if self.command.find("C:\\") > 0:
-            s = (
-                self.cwd + "/" + (self.command.split(" ")[-1].split("\\")[-1])
-            ).replace("'", "")
-        else:
-            s = self.command.split(" ")[-1]
-        self.vmtouch_files = shlex.quote(s)
-
-        # if self.config.Parameters.vmtouch_cache_cwd:
-        #    self.vmtouch_files = "'"+self.vmtouch_files+"' '"+self.cwd+"/'" Commented out as fix for #1941
-        self.command = f"{vmtouch_available} {vmtouch_flags} {vmtouch_file_size} {self.vmtouch_files} && {self.command}"
-
-    def _vmtouch_free(self):
-        subprocess.Popen(
-            "kill $(pidof vmtouch)",
-            shell=True,
-            env=self.env,
-            cwd=self.cwd,
-        )
-        if not self.vmtouch_files:
-            return
+    def _get_prefetch(self) -> Optional[PrefetchManager]:
+        """
+        Return the prefetcher of the launched program, having started to
+        warm its files, if file preloading is enabled for the bottle.
+        """
+        params = self.config.Parameters
+        if not self.program or not params.vmtouch or self.terminal:
+            return None
 
-        vmtouch_flags = "-e -v"
-        command = f"{vmtouch_available} {vmtouch_flags} {self.vmtouch_files}"
-        subprocess.Popen(
-            command,
-            shell=True,
-            env=self.env,
-            cwd=self.cwd,
-        )
+        prefetch = PrefetchManager(self.config, self.program)
+        prefetch.warm(self.cwd if params.vmtouch_cache_cwd else None)
+        return prefetch
 
     def _get_sandbox_manager(self) -> SandboxManager:
         share_paths_rw = [ManagerUtils.get_bottle_path(self.config)]
@@ -777,13 +971,33 @@ class WineCommand:
             share_gpu=self.config.Sandbox.share_gpu,
         )
 
-    def run(self) -> Result[Optional[str]]:
+    def run(
+        self, on_line: Optional[Callable[[str], None]] = None
+    ) -> Result[Optional[str]]:
         """
         Run command with pre-configured parameters
 
+        :param on_line: called with each output line as soon as it is read
         :return: `status` is True if command executed successfully,
                  `data` may be available even if `status` is False.
         """
+        lines = self.stream()
+        try:
+            while True:
+                line = next(lines)
+                if on_line is not None:
+                    on_line(line)
+        except StopIteration as stop:
+            return stop.value
+
+    def stream(self) -> Generator[str, None, Result[Optional[str]]]:
+        """
+        Run command with pre-configured parameters, yielding the decoded
+        output lines as they are read. The generator returns the same
+        Result as run(), whose data is the last `output_limit` characters
+        of the output. Closing the generator early stops reading and
+        waits for the command to exit.
+        """
         if None in [self.runner, self.env]:
             return Result(
                 False, message="runner or env is not ready, Wine command terminated."
@@ -792,8 +1006,7 @@ class WineCommand:
         # Log the final command that will be executed
         logging.info(f"Executing command: {self.command}")
 
-        if vmtouch_available and self.config.Parameters.vmtouch and not self.terminal:
-            self._vmtouch_preload()
+        prefetch = self._get_prefetch()
 
         sandbox = (
             self._get_sandbox_manager() if self.config.Parameters.sandbox else None
@@ -816,47 +1029,156 @@ class WineCommand:
 
         # prepare proc if we are going to execute command internally
         # proc should always be `Popen[bytes]` to make sure
-        # stdout_data's type is `bytes`
+        # the output is read as `bytes`
         proc: subprocess.Popen[bytes]
-        if sandbox:
-            proc = sandbox.run(self.command)
-        else:
-            try:
+        try:
+            if sandbox:
+                proc = sandbox.run(self.command)
+            else:
                 proc = subprocess.Popen(
-                    self.command,
+                    get_argv(self.command),
                     stdout=subprocess.PIPE,
-                    shell=True,
                     env=self.env,
                     cwd=self.cwd,
                 )
-            except FileNotFoundError:
-                return Result(False, message="File not found")
-
-        stdout_data, _ = proc.communicate()
+        except FileNotFoundError:
+            return Result(False, message="File not found")
+        except OSError as e:
+            return Result(False, message=str(e))
 
-        if vmtouch_available and self.config.Parameters.vmtouch:
-            # don't call vmtouch_free while running via external terminal
-            self._vmtouch_free()
+        if prefetch is not None:
+            prefetch.start()
 
-        # Consider changing the locale to C.UTF-8 when
-        # executing commands, to ensure consistent output and
-        # enable callers to make use of the returned value,
-        # also without requiring the encoding detection dance
-        codec = detect_encoding(stdout_data)
-        rv: str
-        try:
-            rv = stdout_data.decode(codec)
-        except (UnicodeDecodeError, LookupError, TypeError):
-            # UnicodeDecodeError: codec mismatch
-            # LookupError: unknown codec name
-            # TypeError: codec is None
-            logging.warning("stdout decoding failed")
-            rv = str(stdout_data)[2:-1]  # trim b''
+        if proc.stderr is not None:
+            # nobody reads it, drain it so the command can't block on it
+            threading.Thread(
+                target=proc.stderr.read, daemon=True, name="WineCommandStderr"
+            ).start()
 
         # "ShellExecuteEx" exception may occur while executing command,
         # previously we rerun the command without `cwd` and `stdout=PIPE`
         # to fix it, which is removed since it may lead to unexpected behavior
-        if "ShellExecuteEx" in rv:
+        shell_execute_failed = False
+        output = WineOutput(self.output_limit)
+        try:
+            while chunk := proc.stdout.read1(WineOutput.chunk_size):
+                for line in output.feed(chunk):
+                    shell_execute_failed |= "ShellExecuteEx" in line
+                    yield line
+            for line in output.close():
+                shell_execute_failed |= "ShellExecuteEx" in line
+                yield line
+        finally:
+            proc.stdout.close()
+            proc.wait()
+
+            if prefetch is not None:
+                prefetch.stop()
+
+        rv = output.text
+        if shell_execute_failed:
+            logging.warning("ShellExecuteEx exception seems occurred.")
+            return Result(
+                False, data=rv, message="ShellExecuteEx exception seems occurred."
+            )
+
+        return Result(True, data=rv)
+
+    @classmethod
+    def get_semaphore(cls, config: BottleConfig) -> asyncio.Semaphore:
+        """Return the semaphore limiting the running loop's commands for a bottle."""
+        loop = asyncio.get_running_loop()
+        semaphores = cls._semaphores.setdefault(loop, {})
+        if config.Path not in semaphores:
+            semaphores[config.Path] = asyncio.Semaphore(cls.bottle_concurrency)
+        return semaphores[config.Path]
+
+    async def run_async(
+        self,
+        timeout: Optional[float] = None,
+        on_line: Optional[Callable[[str], None]] = None,
+    ) -> Result[Optional[str]]:
+        """
+        Asyncio version of run(). At most `bottle_concurrency` commands
+        run at once for the same bottle, the time spent waiting for a slot
+        counts toward the timeout. The command is killed if it times out,
+        returning a failed Result, or if the task is cancelled.
+        """
+        if None in [self.runner, self.env]:
+            return Result(
+                False, message="runner or env is not ready, Wine command terminated."
+            )
+
+        if self.terminal:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.run)
+
+        async def _run():
+            async with self.get_semaphore(self.config):
+                return await self.__run_async(on_line)
+
+        try:
+            return await asyncio.wait_for(_run(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Command timed out after {timeout}s: {self.command}")
+            return Result(False, message="Wine command timed out.")
+
+    async def __run_async(
+        self, on_line: Optional[Callable[[str], None]]
+    ) -> Result[Optional[str]]:
+        logging.info(f"Executing command: {self.command}")
+
+        prefetch = self._get_prefetch()
+
+        argv = get_argv(self.command)
+        stderr = None
+        if self.config.Parameters.sandbox:
+            argv = self._get_sandbox_manager().get_argv(self.command)
+            stderr = asyncio.subprocess.DEVNULL
+
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=stderr,
+                env=self.env,
+                cwd=self.cwd,
+                start_new_session=True,
+            )
+        except FileNotFoundError:
+            return Result(False, message="File not found")
+        except OSError as e:
+            return Result(False, message=str(e))
+
+        if prefetch is not None:
+            prefetch.start()
+
+        shell_execute_failed = False
+        output = WineOutput(self.output_limit)
+        try:
+            while chunk := await proc.stdout.read(WineOutput.chunk_size):
+                for line in output.feed(chunk):
+                    shell_execute_failed |= "ShellExecuteEx" in line
+                    if on_line is not None:
+                        on_line(line)
+            for line in output.close():
+                shell_execute_failed |= "ShellExecuteEx" in line
+                if on_line is not None:
+                    on_line(line)
+            await proc.wait()
+        except BaseException:
+            # cancelled or timed out, don't leave the command behind, the
+            # wineserver is not affected as it runs in its own session
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(proc.pid, signal.SIGKILL)
+            await proc.wait()
+            raise
+        finally:
+            if prefetch is not None:
+                prefetch.stop()
+
+        rv = output.text
+        if shell_execute_failed:
             logging.warning("ShellExecuteEx exception seems occurred.")
             return Result(
                 False, data=rv, message="ShellExecuteEx exception seems occurred."
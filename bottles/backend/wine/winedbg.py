@@ -1,6 +1,5 @@
 import re
 import time
-import subprocess
 from typing import Optional
 
 from bottles.backend.logger import Logger
@@ -8,6 +7,7 @@ from bottles.backend.wine.wineprogram import WineProgram
 from bottles.backend.wine.wineserver import WineServer
 from bottles.backend.wine.wineboot import WineBoot
 from bottles.backend.utils.decorators import cache
+from bottles.backend.utils.proc import ProcUtils
 
 logging = Logger()
 
@@ -29,14 +29,9 @@ class WineDbg(WineProgram):
         if not self.__wineserver_status():
             return processes
 
-        res = self.launch(
-            args='--command "info proc"', communicate=True, action_name="get_processes"
-        )
-        if not res.ready:
-            return processes
-
-        lines = res.data.split("\n")
-        for w in lines[1:]:  # remove the first line from the output (the header)
+        lines = self.stream(args='--command "info proc"', action_name="get_processes")
+        next(lines, None)  # remove the first line from the output (the header)
+        for w in lines:
             w = re.sub("\\s{2,}", " ", w)[1:].replace("'", "")
 
             if "\\_" in w:
@@ -94,12 +89,8 @@ class WineDbg(WineProgram):
             )
             res = self.launch(args=args, communicate=True, action_name="kill_process")
             if res.has_data and "error 5" in res.data and name:
-                subprocess.Popen(
-                    f"kill $(pgrep {name[:15]})",
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    shell=True,
-                )
+                for proc in ProcUtils.get_by_name(f"({name[:15]}"):
+                    proc.kill()
                 return
             wineboot.kill()
 
@@ -1,5 +1,9 @@
+import os
 import re
+import threading
+from collections import OrderedDict
 from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
 
 from bottles.backend.logger import Logger
 from bottles.backend.utils.manager import ManagerUtils
@@ -7,11 +11,84 @@ from bottles.backend.wine.wineprogram import WineProgram
 
 logging = Logger()
 
+_DRIVE = re.compile(r"^([A-Za-z]):(?:[\\/]|$)")
+_SHORT_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ012345"
+# characters wine never keeps in a short name
+_INVALID_DOS = set('*?<>|"\\/+,;=[] ~.')
+
+
+def _lower(c: str) -> int:
+    return ord(c.lower()[:1] or c)
+
+
+def get_short_name(name: str) -> str:
+    """
+    Return the 8.3 name wine gives to a file: legal 8.3 names are kept,
+    other names are mangled with the hash wine uses for them.
+    """
+    if is_legal_8dot3(name):
+        return name
+
+    # same hash as wine's hash_short_file_name, on a case-insensitive fs
+    hash_ = 0xBEEF
+    for i in range(len(name) - 1):
+        hash_ = (
+            (hash_ << 3) ^ (hash_ >> 5) ^ _lower(name[i]) ^ (_lower(name[i + 1]) << 8)
+        )
+        hash_ &= 0xFFFF
+    hash_ = ((hash_ << 3) ^ (hash_ >> 5) ^ _lower(name[-1])) & 0xFFFF
+
+    ext = name.rfind(".", 1, len(name) - 1)
+    stem = name[:ext] if ext > 0 else name
+    short = "".join("_" if c in _INVALID_DOS else c for c in stem[:4])
+    short = short.ljust(5, "~")
+    short += _SHORT_CHARS[(hash_ >> 10) & 0x1F]
+    short += _SHORT_CHARS[(hash_ >> 5) & 0x1F]
+    short += _SHORT_CHARS[hash_ & 0x1F]
+    if ext > 0:
+        short += "." + "".join(
+            "_" if c in _INVALID_DOS else c for c in name[ext + 1 :][:3]
+        )
+    return short.upper()
+
+
+def is_legal_8dot3(name: str) -> bool:
+    if len(name) > 12:
+        return False
+    if name.startswith("."):
+        return name in (".", "..")
+
+    dot = -1
+    for i, c in enumerate(name):
+        if ord(c) > 0x7F:
+            return False
+        if c in _INVALID_DOS:
+            if c != "." or dot != -1:
+                return False
+            dot = i
+    if dot == -1:
+        return len(name) <= 8
+    return dot <= 8 and 1 < len(name) - dot < 5
+
 
 class WinePath(WineProgram):
+    """
+    Convert paths between the Windows and the Unix namespace of a
+    bottle. Paths are resolved in Python from the dosdevices links, with
+    case-insensitive and 8.3 matching of the components like wine does,
+    only what can't be resolved that way is asked to winepath.
+    """
+
     program = "Wine path converter"
     command = "winepath"
 
+    # conversions kept per bottle
+    cache_size = 512
+
+    # bottle path -> (dosdevices mtime, drives, conversions)
+    _cache: Dict[str, Tuple[int, Dict[str, str], "OrderedDict[tuple, str]"]] = {}
+    _cache_lock = threading.Lock()
+
     @staticmethod
     @lru_cache
     def is_windows(path: str):
@@ -27,7 +104,189 @@ class WinePath(WineProgram):
     def __clean_path(path):
         return path.replace("\n", " ").replace("\r", " ").replace("\t", " ").strip()
 
-    @lru_cache
+    def __convert(self, args: str, action_name: str) -> str:
+        # winepath prints the converted path first, don't wait for the rest
+        lines = self.stream(args=args, action_name=action_name)
+        try:
+            return next(lines, "")
+        finally:
+            lines.close()
+
+    @property
+    def dosdevices(self) -> str:
+        return os.path.join(ManagerUtils.get_bottle_path(self.config), "dosdevices")
+
+    def get_drives(self) -> Dict[str, str]:
+        """Return the drive letters of the bottle with their dosdevices link."""
+        return self.__get_state()[1]
+
+    def __get_state(self):
+        dosdevices = self.dosdevices
+        try:
+            stamp = os.stat(dosdevices).st_mtime_ns
+        except OSError:
+            stamp = -1
+
+        with self._cache_lock:
+            state = self._cache.get(dosdevices)
+            if state is not None and state[0] == stamp:
+                return state
+
+        drives = {}
+        if stamp != -1:
+            for name in sorted(os.listdir(dosdevices)):
+                link = os.path.join(dosdevices, name)
+                if re.fullmatch(r"[a-z]:", name) and os.path.isdir(link):
+                    drives[name[0].upper()] = link
+
+        state = (stamp, drives, OrderedDict())
+        with self._cache_lock:
+            self._cache[dosdevices] = state
+        return state
+
+    def __cached(
+        self, action: str, path: str, resolve: Callable[[Dict[str, str]], tuple]
+    ) -> Optional[str]:
+        """
+        Return the conversion from the bottle cache or resolve it, only
+        conversions of existing paths are kept since the others may
+        change as soon as the path is created.
+        """
+        _stamp, drives, entries = self.__get_state()
+        key = (action, path)
+        with self._cache_lock:
+            if key in entries:
+                entries.move_to_end(key)
+                return entries[key]
+
+        result, exists = resolve(drives)
+        if result is not None and exists:
+            with self._cache_lock:
+                entries[key] = result
+                entries.move_to_end(key)
+                while len(entries) > self.cache_size:
+                    entries.popitem(last=False)
+        return result
+
+    @classmethod
+    def invalidate(cls, config=None):
+        """Drop the cached conversions of a bottle, or of every bottle."""
+        with cls._cache_lock:
+            if config is None:
+                cls._cache.clear()
+            else:
+                bottle = ManagerUtils.get_bottle_path(config)
+                cls._cache.pop(os.path.join(bottle, "dosdevices"), None)
+
+    @staticmethod
+    def __split_windows(path: str) -> Optional[Tuple[str, List[str]]]:
+        for prefix in ("\\\\?\\", "\\??\\"):
+            if path.startswith(prefix):
+                path = path[len(prefix) :]
+        match = _DRIVE.match(path)
+        if match is None:
+            return None
+        parts = [p for p in re.split(r"[\\/]+", path[2:]) if p not in ("", ".")]
+        return match.group(1).upper(), parts
+
+    @staticmethod
+    def __match(directory: str, name: str) -> Optional[str]:
+        """Return the entry of the directory wine would open for the name."""
+        if os.path.lexists(os.path.join(directory, name)):
+            return name
+        try:
+            entries = sorted(os.listdir(directory))
+        except OSError:
+            return None
+
+        folded = name.casefold()
+        for entry in entries:
+            if entry.casefold() == folded:
+                return entry
+        if "~" in name and len(name) <= 12:
+            upper = name.upper()
+            for entry in entries:
+                if not is_legal_8dot3(entry) and get_short_name(entry) == upper:
+                    return entry
+        return None
+
+    def __walk(
+        self, drives: Dict[str, str], path: str
+    ) -> Optional[Tuple[str, List[str], int]]:
+        """
+        Walk the Windows path in the bottle, return the drive, the real
+        names of the components and how many of them exist.
+        """
+        split = self.__split_windows(path)
+        if split is None or split[0] not in drives:
+            return None
+        letter, parts = split
+
+        current = drives[letter]
+        names: List[str] = []
+        found = 0
+        for part in parts:
+            if part == "..":
+                if names:
+                    names.pop()
+                    found = min(found, len(names))
+                    current = os.path.dirname(current)
+                continue
+            entry = None
+            if found == len(names):
+                entry = self.__match(current, part)
+            if entry is not None:
+                found += 1
+            names.append(entry or part)
+            current = os.path.join(current, entry or part)
+        return letter, names, found
+
+    def __native_unix(self, drives: Dict[str, str], path: str):
+        walk = self.__walk(drives, path)
+        if walk is None:
+            return None, False
+        letter, names, found = walk
+        result = os.path.join(drives[letter], *names)
+        if path.endswith(("\\", "/")) and names:
+            result += "/"
+        return result, found == len(names)
+
+    def __native_windows(self, drives: Dict[str, str], path: str):
+        roots: Dict[tuple, str] = {}
+        for letter, link in drives.items():
+            try:
+                st = os.stat(link)
+            except OSError:
+                continue
+            roots.setdefault((st.st_dev, st.st_ino), letter)
+
+        path = os.path.normpath(os.path.abspath(path))
+        head, tail = path, []
+        while True:
+            try:
+                st = os.stat(head)
+            except OSError:
+                st = None
+            if st is not None and (st.st_dev, st.st_ino) in roots:
+                letter = roots[(st.st_dev, st.st_ino)]
+                return f"{letter}:\\" + "\\".join(reversed(tail)), os.path.exists(path)
+            parent, name = os.path.split(head)
+            if parent == head:
+                return None, False
+            head = parent
+            tail.append(name)
+
+    def __native_name(self, drives: Dict[str, str], path: str, short: bool):
+        walk = self.__walk(drives, path)
+        if walk is None or walk[2] != len(walk[1]):
+            # GetLongPathName and GetShortPathName need an existing path
+            return None, False
+        letter, names, _found = walk
+        if short:
+            names = [get_short_name(n) for n in names]
+        result = f"{letter}:\\" + "\\".join(names)
+        return result, True
+
     def to_unix(self, path: str, native: bool = False):
         if native:
             bottle_path = ManagerUtils.get_bottle_path(self.config)
@@ -36,11 +295,15 @@ class WinePath(WineProgram):
                 path[0:2], f"{bottle_path}/dosdevices/{path[0:2].lower()}"
             )
             return self.__clean_path(path)
-        args = f"--unix '{path}'"
-        res = self.launch(args=args, communicate=True, action_name="--unix")
-        return self.__clean_path(res.data)
 
-    @lru_cache
+        path = self.__clean_path(path)
+        result = self.__cached(
+            "unix", path, lambda drives: self.__native_unix(drives, path)
+        )
+        if result is not None:
+            return result
+        return self.__fallback("unix", f"--unix '{path}'", "--unix", path)
+
     def to_windows(self, path: str, native: bool = False):
         path = re.sub(r"\s+", " ", path).strip()
 
@@ -59,18 +322,36 @@ class WinePath(WineProgram):
             path = path.replace("/", "\\")
             return self.__clean_path(path)
 
-        args = f"--windows '{path}'"
-        res = self.launch(args=args, communicate=True, action_name="--windows")
-        return self.__clean_path(res.data)
+        result = self.__cached(
+            "windows", path, lambda drives: self.__native_windows(drives, path)
+        )
+        if result is not None:
+            return result
+        return self.__fallback("windows", f"--windows '{path}'", "--windows", path)
 
-    @lru_cache
     def to_long(self, path: str):
-        args = f"--long '{path}'"
-        res = self.launch(args=args, communicate=True, action_name="--long")
-        return self.__clean_path(res.data)
+        path = self.__clean_path(path)
+        result = self.__cached(
+            "long", path, lambda drives: self.__native_name(drives, path, False)
+        )
+        if result is not None:
+            return result
+        return self.__fallback("long", f"--long '{path}'", "--long", path)
 
-    @lru_cache
     def to_short(self, path: str):
-        args = f"--short '{path}'"
-        res = self.launch(args=args, communicate=True, action_name="--short")
-        return self.__clean_path(res.data)
+        path = self.__clean_path(path)
+        result = self.__cached(
+            "short", path, lambda drives: self.__native_name(drives, path, True)
+        )
+        if result is not None:
+            return result
+        return self.__fallback("short", f"--short '{path}'", "--short", path)
+
+    def __fallback(self, action: str, args: str, action_name: str, path: str) -> str:
+        logging.debug(f"Resolving {path} with winepath {action_name}")
+
+        def _resolve(_drives):
+            result = self.__clean_path(self.__convert(args, action_name))
+            return result, bool(result)
+
+        return self.__cached(action, path, _resolve)
@@ -1,9 +1,11 @@
 import os
-from typing import Optional
+from typing import Callable, Generator, Optional
 
 from bottles.backend.logger import Logger
 from bottles.backend.globals import Paths
 from bottles.backend.models.config import BottleConfig
+from bottles.backend.models.result import Result
+from bottles.backend.utils.aio import run_sync
 from bottles.backend.wine.winecommand import WineCommand
 
 logging = Logger()
@@ -49,7 +51,14 @@ class WineProgram:
         post_script_args: Optional[str] = None,
         cwd: Optional[str] = None,
         action_name: str = "launch",
+        on_line: Optional[Callable[[str], None]] = None,
+        output_limit: Optional[int] = None,
+        timeout: Optional[float] = None,
     ):
+        """
+        Launch the program and wait for it. With a timeout the command
+        goes through launch_async and is killed when the timeout expires.
+        """
         if environment is None:
             environment = {}
 
@@ -78,12 +87,80 @@ class WineProgram:
             post_script_args=post_script_args,
             cwd=cwd,
             arguments=program_args,
+            output_limit=output_limit,
         )
 
         # logging.info("Executing command:", res.command)
-        res = res.run()
+        if timeout is not None:
+            return run_sync(res.run_async(timeout, on_line))
+        res = res.run(on_line)
         return res
 
+    async def launch_async(
+        self,
+        args: tuple | str | None = None,
+        minimal: bool = True,
+        environment: Optional[dict] = None,
+        cwd: Optional[str] = None,
+        action_name: str = "launch_async",
+        on_line: Optional[Callable[[str], None]] = None,
+        output_limit: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Result:
+        """
+        Asyncio version of launch, see WineCommand.run_async for the
+        concurrency limits, timeout and cancellation.
+        """
+        if not self.silent:
+            logging.info(f"Using {self.program} -- {action_name}")
+
+        program_args = None
+        if isinstance(args, tuple):
+            args, program_args = args
+
+        command = WineCommand(
+            self.config,
+            command=self.get_command(args),
+            minimal=minimal,
+            colors=self.colors,
+            environment=environment or {},
+            cwd=cwd,
+            arguments=program_args,
+            output_limit=output_limit,
+        )
+        return await command.run_async(timeout, on_line)
+
+    def stream(
+        self,
+        args: tuple | str | None = None,
+        minimal: bool = True,
+        environment: Optional[dict] = None,
+        cwd: Optional[str] = None,
+        action_name: str = "stream",
+        output_limit: Optional[int] = None,
+    ) -> Generator[str, None, Result]:
+        """
+        Launch the program and yield its output lines as they are read,
+        callers can stop iterating once they got what they need.
+        """
+        if not self.silent:
+            logging.info(f"Using {self.program} -- {action_name}")
+
+        program_args = None
+        if isinstance(args, tuple):
+            args, program_args = args
+
+        return WineCommand(
+            self.config,
+            command=self.get_command(args),
+            minimal=minimal,
+            colors=self.colors,
+            environment=environment or {},
+            cwd=cwd,
+            arguments=program_args,
+            output_limit=output_limit,
+        ).stream()
+
     def launch_terminal(self, args: Optional[str] = None):
         self.launch(args=args, terminal=True, action_name="launch_terminal")
 
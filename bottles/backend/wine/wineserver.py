@@ -1,6 +1,8 @@
 import os
+import re
 import subprocess
 import time
+from typing import Optional
 
 from bottles.backend.logger import Logger
 from bottles.backend.utils.manager import ManagerUtils
@@ -10,11 +12,61 @@ from bottles.backend.wine.wineprogram import WineProgram
 
 logging = Logger()
 
+_LOCK_ENTRY = re.compile(r"\s[0-9a-f]+:[0-9a-f]+:(\d+)\s")
+
 
 class WineServer(WineProgram):
     program = "Wine Server"
     command = "wineserver"
 
+    @staticmethod
+    def get_server_dir(prefix: str) -> Optional[str]:
+        """
+        Return the directory wineserver uses for the given prefix,
+        wine derives it from the device and inode of the prefix.
+        """
+        try:
+            st = os.stat(prefix)
+        except OSError:
+            return None
+        return os.path.join(
+            "/tmp", f".wine-{os.getuid()}", f"server-{st.st_dev:x}-{st.st_ino:x}"
+        )
+
+    def is_alive_native(self) -> Optional[bool]:
+        """
+        Check if a wineserver is running for the bottle by looking for
+        the lock it holds on its server directory, without spawning
+        anything. Return None when this can't be determined.
+        """
+        config = self.config
+        bottle = ManagerUtils.get_bottle_path(config)
+        if config.Environment == "Steam":
+            bottle = config.Path
+
+        server_dir = self.get_server_dir(bottle)
+        if server_dir is None:
+            return None
+
+        try:
+            st = os.stat(os.path.join(server_dir, "lock"))
+        except FileNotFoundError:
+            return False
+        except OSError:
+            return None
+
+        # match on the inode only, some filesystems (e.g. btrfs) report a
+        # different device in stat() than in /proc/locks
+        try:
+            with open("/proc/locks", "r") as f:
+                for line in f:
+                    match = _LOCK_ENTRY.search(line)
+                    if match and int(match.group(1)) == st.st_ino:
+                        return True
+        except OSError:
+            return None
+        return False
+
     def is_alive(self):
         config = self.config
 
@@ -22,6 +74,11 @@ class WineServer(WineProgram):
         if not config.Runner:
             return False
 
+        # Look for the server lock before wasting time spawning processes
+        native = self.is_alive_native()
+        if native is not None:
+            return native
+
         # Perform native check before wasting time using wine
         res = subprocess.run(["pgrep", "wineserver"], capture_output=True)
         if not res.stdout:
@@ -42,14 +99,16 @@ class WineServer(WineProgram):
         env["WINEPREFIX"] = bottle
         if not config.Runner.startswith("sys-"):
             env["PATH"] = f"{runner}/bin:{env['PATH']}"
-        res = subprocess.Popen(
-            "wineserver -w",
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            shell=True,
-            cwd=bottle,
-            env=env,
-        )
+        try:
+            res = subprocess.Popen(
+                ["wineserver", "-w"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=bottle,
+                env=env,
+            )
+        except FileNotFoundError:
+            return False
         time.sleep(0.5)
         if res.poll() is None:
             res.kill()  # kill the process to avoid zombie incursion
@@ -72,13 +131,56 @@ class WineServer(WineProgram):
         env["WINEPREFIX"] = bottle
         env["PATH"] = f"{runner}/bin:{env['PATH']}"
 
-        subprocess.run(
-            "wineserver -w",
-            shell=True,
-            cwd=bottle,
-            env=env,
-            capture_output=True,
-        )
+        try:
+            subprocess.run(
+                ["wineserver", "-w"],
+                cwd=bottle,
+                env=env,
+                capture_output=True,
+            )
+        except FileNotFoundError:
+            logging.warning("wineserver not found, not waiting for it")
+
+    def persist(self, delay: int = 30) -> bool:
+        """
+        Start a wineserver for the bottle that stays up for the given
+        seconds after its last process exits, so consecutive commands
+        share it instead of starting a new one each. Nothing happens if
+        a server is already running, return whether one was started.
+        """
+        config = self.config
+        if not config.Runner or self.is_alive_native() is not False:
+            return False
+
+        bottle = ManagerUtils.get_bottle_path(config)
+        runner = ManagerUtils.get_runner_path(config.Runner)
+
+        if config.Environment == "Steam":
+            bottle = config.Path
+            runner = config.RunnerPath
+
+        if SteamUtils.is_proton(runner):
+            runner = SteamUtils.get_dist_directory(runner)
+
+        env = os.environ.copy()
+        env["WINEPREFIX"] = bottle
+        if not config.Runner.startswith("sys-"):
+            env["PATH"] = f"{runner}/bin:{env['PATH']}"
+
+        try:
+            # the server detaches itself, don't keep pipes it would inherit
+            subprocess.run(
+                ["wineserver", f"-p{delay}"],
+                cwd=bottle,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=10,
+            )
+        except (FileNotFoundError, subprocess.TimeoutExpired):
+            logging.warning("Could not start a persistent wineserver")
+            return False
+        return True
 
     def kill(self, signal: int = -1):
         args = "-k"
@@ -49,6 +49,7 @@ from bottles.backend.models.config import BottleConfig
 from bottles.backend.models.registry_rule import RegistryRule
 from bottles.backend.runner import Runner
 from bottles.backend.utils import json, yaml
+from bottles.backend.utils.file import FileUtils
 from bottles.backend.utils.manager import ManagerUtils
 from bottles.backend.wine.cmd import CMD
 from bottles.backend.wine.control import Control
@@ -57,6 +58,7 @@ from bottles.backend.wine.explorer import Explorer
 from bottles.backend.wine.reg import Reg
 from bottles.backend.wine.regedit import Regedit
 from bottles.backend.wine.regkeys import RegKeys
+from bottles.backend.wine.regview import RegistryView
 from bottles.backend.wine.taskmgr import Taskmgr
 from bottles.backend.wine.uninstaller import Uninstaller
 from bottles.backend.wine.winecfg import WineCfg
@@ -141,11 +143,13 @@ class CLI:
 
         reg_parser = subparsers.add_parser("reg", help="Manage registry")
         reg_parser.add_argument(
-            "action", choices=["add", "edit", "del"], help="Action to perform"
+            "action", choices=["get", "add", "edit", "del"], help="Action to perform"
         )
         reg_parser.add_argument("-b", "--bottle", help="Bottle name", required=True)
         reg_parser.add_argument("-k", "--key", help="Registry key", required=True)
-        reg_parser.add_argument("-v", "--value", help="Registry value", required=True)
+        reg_parser.add_argument(
+            "-v", "--value", help="Registry value (all values if omitted for get)"
+        )
         reg_parser.add_argument("-d", "--data", help="Data to be set")
         reg_parser.add_argument(
             "-t",
@@ -255,6 +259,19 @@ class CLI:
             help="Arguments to pass to the executable",
         )
 
+        deps_parser = subparsers.add_parser(
+            "dependencies", help="Install dependencies in a bottle"
+        )
+        deps_parser.add_argument("-b", "--bottle", help="Bottle name", required=True)
+        deps_parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Show the install plan without installing anything",
+        )
+        deps_parser.add_argument(
+            "names", nargs="+", help="Dependencies to install (e.g. 'vcredist2019')"
+        )
+
         standalone_parser = subparsers.add_parser(
             "standalone",
             help="Generate a standalone script to launch commands "
@@ -330,6 +347,10 @@ class CLI:
         elif self.args.command == "shell":
             self.run_shell()
 
+        # DEPENDENCIES parser
+        elif self.args.command == "dependencies":
+            self.install_dependencies()
+
         # STANDALONE parser
         elif self.args.command == "standalone":
             self.generate_standalone()
@@ -536,6 +557,38 @@ class CLI:
         allowed_types = ["REG_SZ", "REG_DWORD", "REG_BINARY", "REG_MULTI_SZ"]
         _key_type = "REG_SZ" if _key_type is None else _key_type.upper()
 
+        if _action == "get":
+            try:
+                view = RegistryView(bottle)
+                if _value is None:
+                    values = view.enumerate(_key)
+                else:
+                    values = {_value: view.get(_key, _value)}
+            except ValueError as e:
+                sys.stderr.write(f"{e}\n")
+                exit(1)
+
+            if not values or None in values.values():
+                sys.stderr.write("Registry key or value not found\n")
+                exit(1)
+
+            values = {
+                name: data.hex() if isinstance(data, bytes) else data
+                for name, data in values.items()
+            }
+            if self.args.json:
+                sys.stdout.write(json.dumps(values) + "\n")
+                return
+            for name, data in values.items():
+                if isinstance(data, list):
+                    data = "\\0".join(data)
+                sys.stdout.write(f"{name or '@'}={data}\n")
+            return
+
+        if _value is None:
+            sys.stderr.write("Missing value name\n")
+            exit(1)
+
         if _action in ["add", "edit"]:
             if _data is None or _key_type not in allowed_types:
                 sys.stderr.write("Missing or invalid data or key type\n")
@@ -624,6 +677,45 @@ class CLI:
 
     # endregion
 
+    # region DEPENDENCIES
+    def install_dependencies(self):
+        _bottle = self.args.bottle
+
+        mng = Manager(g_settings=self.settings, is_cli=True)
+        mng.check_bottles()
+        if _bottle not in mng.local_bottles:
+            sys.stderr.write(f"Bottle {_bottle} not found\n")
+            exit(1)
+
+        bottle = mng.local_bottles[_bottle]
+        plan = mng.dependency_manager.plan(
+            bottle, self.args.names, remote_sizes=self.args.dry_run
+        )
+
+        if self.args.dry_run:
+            if self.args.json:
+                sys.stdout.write(json.dumps(plan.to_dict()))
+                exit(0 if plan.ok else 1)
+
+            for name in plan.missing:
+                sys.stderr.write(f"Dependency {name} not found\n")
+            sys.stdout.write(f"Install plan for {_bottle}:\n")
+            for i, name in enumerate(plan.names, start=1):
+                sys.stdout.write(f"{i}. {name}\n")
+            size = FileUtils.get_human_size(plan.download_size)
+            sys.stdout.write(f"Download size: {size}")
+            if plan.unknown_sizes:
+                sys.stdout.write(f" (+{plan.unknown_sizes} files of unknown size)")
+            sys.stdout.write("\n")
+            exit(0 if plan.ok else 1)
+
+        res = mng.dependency_manager.install_plan(bottle, plan)
+        if not res.ok:
+            sys.stderr.write(f"{res.message}\n")
+            exit(1)
+
+    # endregion
+
     # region EDIT
     def edit_bottle(self):
         _bottle = self.args.bottle
@@ -359,7 +359,6 @@ class Bottles(Adw.Application):
                 "orjson https://github.com/ijl/orjson",
                 "libadwaita https://gitlab.gnome.org/GNOME/libadwaita",
                 "icoextract https://github.com/jlu5/icoextract",
-                "vmtouch https://github.com/hoytech/vmtouch",
                 "FVS https://github.com/mirkobrombin/FVS",
                 "pathvalidate https://github.com/thombashi/pathvalidate",
             ],
@@ -14,13 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
+from gettext import gettext as _
 from typing import Dict
 from uuid import UUID
 
 from gi.repository import Adw, Gtk
 
 from bottles.backend.models.result import Result
-from bottles.backend.state import TaskManager
+from bottles.backend.state import ExecutionClass, TaskManager
 
 
 @Gtk.Template(resource_path="/com/usebottles/bottles/task-entry.ui")
@@ -32,7 +33,7 @@ class TaskEntry(Adw.ActionRow):
 
     # endregion
 
-    def __init__(self, window, title, cancellable=True, **kwargs):
+    def __init__(self, window, title, cancellable=True, background=False, **kwargs):
         super().__init__(**kwargs)
 
         self.window = window
@@ -44,6 +45,11 @@ class TaskEntry(Adw.ActionRow):
         self.set_title(title)
         if not cancellable:
             self.btn_cancel.hide()
+        if background:
+            label = Gtk.Label(label=_("Background"), valign=Gtk.Align.CENTER)
+            label.add_css_class("dim-label")
+            label.set_tooltip_text(_("Runs with low CPU and disk priority"))
+            self.add_suffix(label)
 
     def update(self, subtitle: str):
         self.set_subtitle(subtitle)
@@ -57,9 +63,9 @@ class TaskSyncer:
     def __init__(self, window):
         self.window = window
 
-    def _new_widget(self, title, cancellable=True) -> TaskEntry:
+    def _new_widget(self, title, cancellable=True, background=False) -> TaskEntry:
         """create TaskEntry widget & add to task list"""
-        task_entry = TaskEntry(self.window, title, cancellable)
+        task_entry = TaskEntry(self.window, title, cancellable, background)
         self.window.page_details.list_tasks.append(task_entry)
         return task_entry
 
@@ -70,7 +76,11 @@ class TaskSyncer:
         """handler for Signals.TaskAdded"""
         task_id: UUID = res.data
         task = TaskManager.get(task_id)
-        self._TASK_WIDGETS[task_id] = self._new_widget(task.title, task.cancellable)
+        self._TASK_WIDGETS[task_id] = self._new_widget(
+            task.title,
+            task.cancellable,
+            task.execution_class is ExecutionClass.BACKGROUND,
+        )
         self._set_task_btn_visible(True)
 
     def task_updated_handler(self, res: Result):
@@ -22,14 +22,6 @@ from gettext import gettext as _
 
 from gi.repository import Adw, Gdk, Gtk
 
-from bottles.backend.globals import (
-    gamemode_available,
-    gamescope_available,
-    mangohud_available,
-    obs_vkc_available,
-    vkbasalt_available,
-    vmtouch_available,
-)
 from bottles.backend.logger import Logger
 from bottles.backend.managers.library import LibraryManager
 from bottles.backend.managers.runtime import RuntimeManager
@@ -38,7 +30,7 @@ from bottles.backend.models.enum import Arch
 from bottles.backend.models.result import Result
 from bottles.backend.runner import Runner
 from bottles.backend.utils.display import DisplayUtils
-from bottles.backend.utils.gpu import GPUUtils, GPUVendors
+from bottles.backend.utils.host import HostCapabilities
 from bottles.backend.utils.manager import ManagerUtils
 from bottles.backend.utils.threading import RunAsync
 from bottles.backend.wine.regkeys import RegKeys
@@ -54,7 +46,7 @@ from bottles.frontend.windows.mangohud import MangoHudDialog
 from bottles.frontend.windows.protonalert import ProtonAlertDialog
 from bottles.frontend.windows.sandbox import SandboxDialog
 from bottles.frontend.windows.vkbasalt import VkBasaltDialog
-from bottles.frontend.windows.vmtouch import VmtouchDialog
+from bottles.frontend.windows.prefetch import PrefetchDialog
 
 logging = Logger()
 
@@ -71,7 +63,7 @@ class PreferencesView(Adw.PreferencesPage):
     btn_manage_mangohud = Gtk.Template.Child()
     btn_manage_sandbox = Gtk.Template.Child()
     btn_manage_versioning_patterns = Gtk.Template.Child()
-    btn_manage_vmtouch = Gtk.Template.Child()
+    btn_manage_prefetch = Gtk.Template.Child()
     btn_cwd_reset = Gtk.Template.Child()
     btn_cwd = Gtk.Template.Child()
     row_nvapi = Gtk.Template.Child()
@@ -80,8 +72,9 @@ class PreferencesView(Adw.PreferencesPage):
     row_gamescope = Gtk.Template.Child()
     row_mangohud = Gtk.Template.Child()
     row_gamemode = Gtk.Template.Child()
-    row_vmtouch = Gtk.Template.Child()
+    row_prefetch = Gtk.Template.Child()
     row_obsvkc = Gtk.Template.Child()
+    row_shared_shader_cache = Gtk.Template.Child()
     row_wayland = Gtk.Template.Child()
     row_winebridge = Gtk.Template.Child()
     row_manage_display = Gtk.Template.Child()
@@ -96,6 +89,7 @@ class PreferencesView(Adw.PreferencesPage):
     entry_name = Gtk.Template.Child()
     switch_mangohud = Gtk.Template.Child()
     switch_obsvkc = Gtk.Template.Child()
+    switch_shared_shader_cache = Gtk.Template.Child()
     switch_vkbasalt = Gtk.Template.Child()
     switch_wayland = Gtk.Template.Child()
     switch_winebridge = Gtk.Template.Child()
@@ -110,7 +104,7 @@ class PreferencesView(Adw.PreferencesPage):
     switch_versioning_compression = Gtk.Template.Child()
     switch_auto_versioning = Gtk.Template.Child()
     switch_versioning_patterns = Gtk.Template.Child()
-    switch_vmtouch = Gtk.Template.Child()
+    switch_prefetch = Gtk.Template.Child()
     combo_runner = Gtk.Template.Child()
     combo_dxvk = Gtk.Template.Child()
     combo_vkd3d = Gtk.Template.Child()
@@ -149,6 +143,12 @@ class PreferencesView(Adw.PreferencesPage):
         self.details = details
 
         _not_available = _("This feature is unavailable on your system.")
+        host = HostCapabilities.get()
+        gamemode_available = bool(host.gamemode)
+        gamescope_available = bool(host.gamescope)
+        vkbasalt_available = host.vkbasalt
+        mangohud_available = bool(host.mangohud)
+        obs_vkc_available = bool(host.obs_vkc)
 
         if not gamemode_available:
             self.switch_gamemode.set_tooltip_text(_not_available)
@@ -173,10 +173,6 @@ class PreferencesView(Adw.PreferencesPage):
             self.switch_obsvkc.set_tooltip_text(_not_available)
             self.__add_unavailable_indicator(self.row_obsvkc, None)
 
-        if not vmtouch_available:
-            self.switch_vmtouch.set_tooltip_text(_not_available)
-            self.__add_unavailable_indicator(self.row_vmtouch, None)
-
         # region signals
         self.row_manage_display.connect("activated", self.__show_display_settings)
         self.row_overrides.connect(
@@ -199,8 +195,8 @@ class PreferencesView(Adw.PreferencesPage):
         self.btn_manage_sandbox.connect(
             "clicked", self.__show_feature_dialog, SandboxDialog
         )
-        self.btn_manage_vmtouch.connect(
-            "clicked", self.__show_feature_dialog, VmtouchDialog
+        self.btn_manage_prefetch.connect(
+            "clicked", self.__show_feature_dialog, PrefetchDialog
         )
         self.btn_manage_versioning_patterns.connect(
             "clicked", self.__show_feature_dialog, ExclusionPatternsDialog
@@ -209,6 +205,9 @@ class PreferencesView(Adw.PreferencesPage):
         self.btn_cwd_reset.connect("clicked", self.reset_cwd, True)
         self.switch_mangohud.connect("state-set", self.__toggle_feature_cb, "mangohud")
         self.switch_obsvkc.connect("state-set", self.__toggle_feature_cb, "obsvkc")
+        self.switch_shared_shader_cache.connect(
+            "state-set", self.__toggle_feature_cb, "shared_shader_cache"
+        )
         self.switch_vkbasalt.connect("state-set", self.__toggle_feature_cb, "vkbasalt")
         self.switch_wayland.connect("state-set", self.__toggle_wayland)
         self.switch_winebridge.connect(
@@ -233,7 +232,7 @@ class PreferencesView(Adw.PreferencesPage):
         self.switch_versioning_patterns.connect(
             "state-set", self.__toggle_feature_cb, "versioning_exclusion_patterns"
         )
-        self.switch_vmtouch.connect("state-set", self.__toggle_feature_cb, "vmtouch")
+        self.switch_prefetch.connect("state-set", self.__toggle_feature_cb, "vmtouch")
         self.combo_runner.connect("notify::selected", self.__set_runner)
         self.combo_dxvk.connect("notify::selected", self.__set_dxvk)
         self.combo_vkd3d.connect("notify::selected", self.__set_vkd3d)
@@ -247,7 +246,7 @@ class PreferencesView(Adw.PreferencesPage):
         # endregion
 
         """Set DXVK_NVAPI related rows to visible when an NVIDIA GPU is detected (invisible by default)"""
-        is_nvidia_gpu = GPUUtils.is_gpu(GPUVendors.NVIDIA)
+        is_nvidia_gpu = host.nvidia_device
         self.row_nvapi.set_visible(is_nvidia_gpu)
         self.combo_nvapi.set_visible(is_nvidia_gpu)
 
@@ -266,7 +265,6 @@ class PreferencesView(Adw.PreferencesPage):
         self.switch_mangohud.set_sensitive(mangohud_available)
         self.btn_manage_mangohud.set_sensitive(mangohud_available)
         self.switch_obsvkc.set_sensitive(obs_vkc_available)
-        self.switch_vmtouch.set_sensitive(vmtouch_available)
 
         is_wayland_session = DisplayUtils.display_server_type() == "wayland"
         self.switch_wayland.set_sensitive(is_wayland_session)
@@ -487,6 +485,7 @@ class PreferencesView(Adw.PreferencesPage):
         self.switch_winebridge.handler_block_by_func(self.__toggle_feature_cb)
         self.switch_fsr.handler_block_by_func(self.__toggle_feature_cb)
         self.switch_obsvkc.handler_block_by_func(self.__toggle_feature_cb)
+        self.switch_shared_shader_cache.handler_block_by_func(self.__toggle_feature_cb)
         self.switch_gamemode.handler_block_by_func(self.__toggle_feature_cb)
         self.switch_gamescope.handler_block_by_func(self.__toggle_feature_cb)
         self.switch_sandbox.handler_block_by_func(self.__toggle_feature_cb)
@@ -507,6 +506,7 @@ class PreferencesView(Adw.PreferencesPage):
         self.combo_language.handler_block_by_func(self.__set_language)
         self.switch_mangohud.set_active(parameters.mangohud)
         self.switch_obsvkc.set_active(parameters.obsvkc)
+        self.switch_shared_shader_cache.set_active(parameters.shared_shader_cache)
         self.switch_vkbasalt.set_active(parameters.vkbasalt)
         self.switch_wayland.set_active(parameters.wayland)
         self.switch_winebridge.set_active(parameters.winebridge)
@@ -521,7 +521,7 @@ class PreferencesView(Adw.PreferencesPage):
             parameters.versioning_exclusion_patterns
         )
         self.switch_steam_runtime.set_active(parameters.use_steam_runtime)
-        self.switch_vmtouch.set_active(parameters.vmtouch)
+        self.switch_prefetch.set_active(parameters.vmtouch)
 
         # self.toggle_sync.set_active(parameters["sync"] == "wine")
         # self.toggle_esync.set_active(parameters["sync"] == "esync")
@@ -625,6 +625,9 @@ class PreferencesView(Adw.PreferencesPage):
         self.switch_winebridge.handler_unblock_by_func(self.__toggle_feature_cb)
         self.switch_fsr.handler_unblock_by_func(self.__toggle_feature_cb)
         self.switch_obsvkc.handler_unblock_by_func(self.__toggle_feature_cb)
+        self.switch_shared_shader_cache.handler_unblock_by_func(
+            self.__toggle_feature_cb
+        )
         self.switch_gamemode.handler_unblock_by_func(self.__toggle_feature_cb)
         self.switch_gamescope.handler_unblock_by_func(self.__toggle_feature_cb)
         self.switch_sandbox.handler_unblock_by_func(self.__toggle_feature_cb)
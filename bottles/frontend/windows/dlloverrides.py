@@ -20,6 +20,11 @@ from gettext import gettext as _
 from gi.repository import Adw, GLib, Gtk
 
 from bottles.backend.dlls.dll import DLLComponent
+from bottles.backend.logger import Logger
+from bottles.backend.utils.threading import RunAsync
+from bottles.backend.wine.regview import RegistryView
+
+logging = Logger()
 
 
 @Gtk.Template(resource_path="/com/usebottles/bottles/dll-override-entry.ui")
@@ -88,6 +93,7 @@ class DLLOverridesDialog(Adw.PreferencesWindow):
     # region Widgets
     entry_row = Gtk.Template.Child()
     group_overrides = Gtk.Template.Child()
+    group_registry_overrides = Gtk.Template.Child()
     menu_invalid_override = Gtk.Template.Child()
 
     # endregion
@@ -102,6 +108,7 @@ class DLLOverridesDialog(Adw.PreferencesWindow):
         self.config = config
 
         self.__populate_overrides_list()
+        self.__populate_registry_overrides_list()
 
         # connect signals
         self.entry_row.connect("changed", self.__check_override)
@@ -164,3 +171,29 @@ class DLLOverridesDialog(Adw.PreferencesWindow):
         for override in overrides:
             _entry = DLLEntry(window=self.window, config=self.config, override=override)
             GLib.idle_add(self.group_overrides.add, _entry)
+
+    def __populate_registry_overrides_list(self):
+        """
+        This function populate the list of overrides stored in the
+        bottle registry, read natively from the hive files off the
+        main loop
+        """
+
+        def get_overrides() -> dict:
+            try:
+                return RegistryView(self.config).enumerate(
+                    "HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides"
+                )
+            except ValueError as e:
+                logging.warning(f"Failed to read the registry DLL overrides: {e}")
+                return {}
+
+        def callback(overrides, _error=None):
+            for dll, value in sorted((overrides or {}).items()):
+                if not isinstance(value, str):
+                    continue
+                _row = Adw.ActionRow(title=dll, subtitle=value)
+                self.group_registry_overrides.add(_row)
+                self.group_registry_overrides.set_visible(True)
+
+        RunAsync(get_overrides, callback=callback)
@@ -1,4 +1,4 @@
-# vmtouch.py
+# prefetch.py
 #
 # Copyright 2025 axtlos <axtlos@tar.black>
 #
@@ -20,9 +20,9 @@
 from gi.repository import Adw, GLib, Gtk
 
 
-@Gtk.Template(resource_path="/com/usebottles/bottles/dialog-vmtouch.ui")
-class VmtouchDialog(Adw.Window):
-    __gtype_name__ = "VmtouchDialog"
+@Gtk.Template(resource_path="/com/usebottles/bottles/dialog-prefetch.ui")
+class PrefetchDialog(Adw.Window):
+    __gtype_name__ = "PrefetchDialog"
 
     # region Widgets
     switch_cache_cwd = Gtk.Template.Child()
@@ -0,0 +1,254 @@
+"""Unit tests for the dependency install plans and resource prefetch"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from bottles.backend.managers.dependency import DependencyManager
+from bottles.backend.managers.download_cache import DownloadCacheManager
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.models.result import Result
+from bottles.backend.state import TaskType
+
+MANIFESTS = {
+    "vcredist": {
+        "Dependencies": ["runtime", "installed"],
+        "Steps": [
+            {
+                "action": "download_archive",
+                "url": "https://example.com/a.cab",
+                "file_name": "a.cab",
+            },
+            {
+                "action": "download_archive",
+                "url": "https://example.com/b.cab",
+                "file_name": "b.cab",
+                "file_checksum": "abc",
+                "file_size": 1000,
+            },
+            {
+                "action": "download_archive",
+                "url": "https://example.com/32.cab",
+                "file_name": "32.cab",
+                "for": "win32",
+            },
+        ],
+    },
+    "runtime": {
+        "Uninstaller": "NO_UNINSTALLER",
+        "Steps": [
+            {
+                "action": "download_archive",
+                "url": "https://example.com/runtime.cab",
+                "file_name": "runtime.cab",
+                "file_size": 24,
+            },
+            {
+                "action": "download_archive",
+                "url": "https://example.com/a.cab",
+                "file_name": "a.cab",
+            },
+        ],
+    },
+    "dotnet": {"Dependencies": ["runtime", "loop"], "Steps": []},
+    "loop": {"Dependencies": ["dotnet"], "Steps": []},
+    "installed": {"Steps": []},
+}
+
+
+class _Components:
+    def __init__(self):
+        self.calls = []
+        self.running = 0
+        self.concurrent = 0
+        self.lock = threading.Lock()
+
+    def download(self, download_url, file, rename="", checksum="", **kwargs):
+        with self.lock:
+            self.calls.append((threading.current_thread().name, file, checksum))
+            self.running += 1
+            self.concurrent = max(self.concurrent, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return Result(True)
+
+
+@pytest.fixture
+def dependencies(monkeypatch, tmp_path):
+    monkeypatch.setattr("bottles.backend.managers.dependency.Paths.temp", str(tmp_path))
+    monkeypatch.setattr(
+        "bottles.backend.managers.dependency.Paths.download_cache",
+        str(tmp_path / "download_cache"),
+    )
+    monkeypatch.setattr(
+        "bottles.backend.managers.dependency.RegistryRuleManager.apply_rules",
+        lambda *args, **kwargs: None,
+    )
+    fetched = []
+    writes = []
+
+    def _get(name, plain=False):
+        fetched.append(name)
+        return MANIFESTS.get(name)
+
+    def _update_config(config, key, value, scope=""):
+        writes.append((key, value, dict(config.Uninstallers)))
+        config[key] = value
+
+    repo = SimpleNamespace(get=_get, fetched=fetched, writes=writes)
+    manager = SimpleNamespace(
+        repository_manager=SimpleNamespace(get_repo=lambda name, offline: repo),
+        utils_conn=None,
+        supported_dependencies={
+            name: {} for name in ("runtime", "installed", "dotnet", "loop")
+        },
+        component_manager=_Components(),
+        update_config=_update_config,
+    )
+    config = BottleConfig(Name="Test", Arch="win64")
+    config.Installed_Dependencies = ["installed"]
+    dependencies = DependencyManager(manager)
+    dependencies.repo = repo
+    return dependencies, manager.component_manager, config
+
+
+def test_prefetch_before_steps(dependencies):
+    manager, components, config = dependencies
+    messages = []
+
+    res = manager.install(config, ["vcredist", {}], progress_cb=messages.append)
+    assert res.ok
+    assert messages[1] == "Downloading 3 files…"
+
+    prefetched = [c for c in components.calls if c[0].startswith("BottlesDependency")]
+    assert sorted(c[1] for c in prefetched) == ["a.cab", "b.cab", "runtime.cab"]
+    assert ("b.cab", "abc") in [(c[1], c[2]) for c in prefetched]
+    assert components.concurrent > 1
+
+    # the steps run afterwards, in order, against the temp directory
+    steps = components.calls[len(prefetched) :]
+    assert [c[1] for c in steps] == ["runtime.cab", "a.cab", "a.cab", "b.cab"]
+    assert all(not c[0].startswith("BottlesDependency") for c in steps)
+
+
+def test_no_prefetch(dependencies):
+    manager, components, config = dependencies
+    manager.prefetch_workers = 1
+    assert manager.install(config, ["runtime", {}], prefetch=False).ok
+    assert [c[1] for c in components.calls] == ["runtime.cab", "a.cab"]
+
+
+def test_plan(dependencies, tmp_path):
+    manager, _components, config = dependencies
+    (tmp_path / "a.cab").write_bytes(b"cached")
+
+    plan = manager.plan(config, ["vcredist", "dotnet", "installed", "unknown"])
+    # requested dependencies are installed again, before their dependents
+    assert plan.names == ["runtime", "installed", "vcredist", "loop", "dotnet"]
+    assert plan.missing == ["unknown"]
+    assert not plan.ok
+    # a.cab is already in temp, b.cab and runtime.cab declare their size
+    assert plan.download_size == 1024
+    assert plan.unknown_sizes == 0
+    # every manifest is fetched once
+    assert sorted(manager.repo.fetched) == sorted(plan.names + ["unknown"])
+
+    res = manager.install_plan(config, plan)
+    assert not res.ok and res.data == {"dependency": "unknown"}
+
+    # files only left in the download cache are not downloaded again
+    (tmp_path / "b.cab").write_bytes(b"cached")
+    DownloadCacheManager.publish(str(tmp_path / "b.cab"), "b.cab", "abc")
+    plan = manager.plan(config, ["vcredist"])
+    assert plan.download_size == 24
+
+
+def test_install_plan_writes_config_once(dependencies):
+    manager, _components, config = dependencies
+    plan = manager.plan(config, ["vcredist", "dotnet"])
+    assert manager.install_plan(config, plan).ok
+
+    assert manager.repo.writes == [
+        (
+            "Installed_Dependencies",
+            ["installed", "runtime", "vcredist", "loop", "dotnet"],
+            {
+                "runtime": "NO_UNINSTALLER",
+                "vcredist": True,
+                "loop": True,
+                "dotnet": True,
+            },
+        )
+    ]
+    # installed prerequisites are not planned again
+    assert manager.plan(config, ["dotnet"]).names == ["dotnet"]
+
+
+def test_install_plan_stops_wineserver(dependencies, monkeypatch):
+    manager, _components, config = dependencies
+    calls = []
+
+    class _WineServer:
+        def __init__(self, config):
+            pass
+
+        def persist(self):
+            calls.append("persist")
+            return True
+
+        def kill(self):
+            calls.append("kill")
+
+        def wait(self):
+            calls.append("wait")
+
+    monkeypatch.setattr("bottles.backend.managers.dependency.WineServer", _WineServer)
+    monkeypatch.setattr(
+        "bottles.backend.managers.dependency.RegistryRuleManager.apply_rules",
+        lambda *args, **kwargs: calls.append("rules"),
+    )
+    assert manager.install_plan(config, manager.plan(config, ["runtime"])).ok
+    # the registry rules are written once the server is gone
+    assert calls == ["persist", "kill", "wait", "rules"]
+
+
+def test_install_plan_cancel(dependencies):
+    manager, components, config = dependencies
+    cancel_event = threading.Event()
+    plan = manager.plan(config, ["vcredist"])
+
+    def _download(*args, **kwargs):
+        cancel_event.set()
+        return Result(True)
+
+    components.download = _download
+    res = manager.install_plan(config, plan, prefetch=False, cancel_event=cancel_event)
+    assert not res.ok and res.data == {"dependency": "vcredist", "cancelled": True}
+    # the dependency installed before the cancellation is still recorded
+    assert manager.repo.writes == [
+        (
+            "Installed_Dependencies",
+            ["installed", "runtime"],
+            {"runtime": "NO_UNINSTALLER"},
+        )
+    ]
+
+
+def test_prefetch_follows_throttle(dependencies, monkeypatch):
+    manager, components, config = dependencies
+    sized = []
+
+    def _get_workers(task_type, workers):
+        sized.append((task_type, workers))
+        return 1
+
+    monkeypatch.setattr(
+        "bottles.backend.managers.dependency.BackgroundExecutor.get_workers",
+        _get_workers,
+    )
+    assert manager.install(config, ["vcredist", {}]).ok
+    assert sized == [(TaskType.Download, 3)]
+    assert components.concurrent == 1
@@ -0,0 +1,214 @@
+"""Unit tests for the content-addressed download cache"""
+
+import hashlib
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from bottles.backend.globals import Paths
+from bottles.backend.managers.component import ComponentManager
+from bottles.backend.managers.download_cache import DownloadCacheManager
+from bottles.backend.models.result import Result
+from bottles.backend.utils.file import FileUtils
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    monkeypatch.setattr(Paths, "temp", str(temp))
+    monkeypatch.setattr(Paths, "download_cache", str(tmp_path / "download_cache"))
+    monkeypatch.setattr(DownloadCacheManager, "quota", 0)
+    return temp
+
+
+def _md5(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def test_publish_and_lookup(cache):
+    (cache / "a.cab").write_bytes(b"cabinet")
+    stored = DownloadCacheManager.publish(
+        str(cache / "a.cab"), "a.cab", _md5(b"cabinet").upper()
+    )
+    assert not (cache / "a.cab").exists()
+    assert os.path.basename(stored) == f"md5-{_md5(b'cabinet')}"
+
+    # checksummed files are found by checksum whatever their name
+    assert DownloadCacheManager.lookup("other.cab", _md5(b"cabinet")) == stored
+    assert DownloadCacheManager.lookup("a.cab") is None
+
+    (cache / "b.exe").write_bytes(b"installer")
+    stored = DownloadCacheManager.publish(str(cache / "b.exe"), "b.exe")
+    assert DownloadCacheManager.lookup("b.exe") == stored
+
+    DownloadCacheManager.link(stored, str(cache / "b.exe"))
+    assert (cache / "b.exe").read_bytes() == b"installer"
+
+    stats = DownloadCacheManager.get_stats()
+    assert (stats["hits"], stats["misses"], stats["files"]) == (2, 1, 2)
+    assert stats["size_bytes"] == len(b"cabinet") + len(b"installer")
+
+
+def test_corrupted_hit(cache):
+    (cache / "a.cab").write_bytes(b"cabinet")
+    stored = DownloadCacheManager.publish(str(cache / "a.cab"), "a.cab")
+    with open(stored, "wb") as f:
+        f.write(b"CABINET")
+    os.utime(stored, ns=(0, 0))
+
+    assert DownloadCacheManager.lookup("a.cab") is None
+    assert not os.path.exists(stored)
+    assert DownloadCacheManager.get_stats()["files"] == 0
+
+
+def test_evict_least_recently_used(cache):
+    for name in ("old", "used", "new"):
+        (cache / name).write_bytes(name.encode() * 100)
+        DownloadCacheManager.publish(str(cache / name), name)
+    assert DownloadCacheManager.lookup("used")
+
+    freed = DownloadCacheManager.evict(quota=700)
+    assert freed == 300
+    assert DownloadCacheManager.lookup("old") is None
+    assert DownloadCacheManager.lookup("used") and DownloadCacheManager.lookup("new")
+    assert DownloadCacheManager.get_stats()["evictions"] == 1
+
+    # publishing past the quota never evicts the new file
+    DownloadCacheManager.quota = 100
+    (cache / "big").write_bytes(b"x" * 500)
+    DownloadCacheManager.publish(str(cache / "big"), "big")
+    assert DownloadCacheManager.lookup("big")
+    assert DownloadCacheManager.get_stats()["files"] == 1
+
+
+class _Curl:
+    URL = FOLLOWLOCATION = HTTPHEADER = NOBODY = RESPONSE_CODE = EFFECTIVE_URL = 0
+
+    def setopt(self, *args):
+        pass
+
+    def perform(self):
+        pass
+
+    def getinfo(self, info):
+        return 200 if info == self.RESPONSE_CODE else "https://example.com/a.cab"
+
+    def close(self):
+        pass
+
+
+def test_component_download(cache, monkeypatch):
+    downloads = []
+
+    class _Downloader:
+        def __init__(self, url, file, checksum_algorithm=None, **kwargs):
+            self.file = file
+            self.algorithm = checksum_algorithm
+
+        def download(self):
+            downloads.append((self.file, self.algorithm))
+            with open(self.file, "wb") as f:
+                f.write(b"cabinet")
+            digest = hashlib.new(self.algorithm, b"cabinet").hexdigest()
+            return Result(True, {"algorithm": self.algorithm, "checksum": digest})
+
+    monkeypatch.setattr("bottles.backend.managers.component.Downloader", _Downloader)
+    monkeypatch.setattr("bottles.backend.managers.component.pycurl.Curl", _Curl)
+    manager = SimpleNamespace(
+        check_app_dirs=lambda: None,
+        repository_manager=SimpleNamespace(get_repo=lambda name, offline: None),
+        utils_conn=None,
+    )
+    components = ComponentManager(manager, offline=True)
+
+    def _download():
+        return components.download(
+            "https://example.com/a.cab", "a.cab", checksum=_md5(b"cabinet")
+        )
+
+    assert _download().ok
+    assert (cache / "a.cab").read_bytes() == b"cabinet"
+    assert downloads[0][1] == "md5"
+
+    # a cleaned temp directory is filled again from the cache
+    os.remove(cache / "a.cab")
+    assert _download().ok
+    assert (cache / "a.cab").read_bytes() == b"cabinet"
+    assert len(downloads) == 1
+
+    # left over partial files are downloaded again
+    DownloadCacheManager.clear()
+    (cache / "a.cab").write_bytes(b"cab")
+    assert _download().ok
+    assert len(downloads) == 2
+    assert DownloadCacheManager.lookup("a.cab", _md5(b"cabinet"))
+
+
+def test_temp_file_recorded(cache, monkeypatch):
+    hashed = []
+    get_checksum = FileUtils.get_checksum
+
+    def _get_checksum(path, algorithm="md5"):
+        hashed.append(algorithm)
+        return get_checksum(path, algorithm)
+
+    monkeypatch.setattr(FileUtils, "get_checksum", _get_checksum)
+    manager = SimpleNamespace(
+        check_app_dirs=lambda: None,
+        repository_manager=SimpleNamespace(get_repo=lambda name, offline: None),
+        utils_conn=None,
+    )
+    components = ComponentManager(manager, offline=True)
+    (cache / "a.cab").write_bytes(b"cabinet")
+
+    for _ in range(3):
+        assert components.download(
+            "https://example.com/a.cab", "a.cab", checksum=_md5(b"cabinet")
+        ).ok
+    # verified once, then found in the cache by its stamp
+    assert hashed == ["md5"]
+    assert (cache / "a.cab").read_bytes() == b"cabinet"
+
+
+def test_hit_without_rehash(cache, monkeypatch):
+    sha256 = hashlib.sha256(b"runner").hexdigest()
+    (cache / "runner.tar.xz").write_bytes(b"runner")
+    DownloadCacheManager.publish(
+        str(cache / "runner.tar.xz"), "runner.tar.xz", f"sha256:{sha256}"
+    )
+
+    hashed = []
+    get_checksum = FileUtils.get_checksum
+
+    def _get_checksum(path, algorithm="md5"):
+        hashed.append(algorithm)
+        return get_checksum(path, algorithm)
+
+    monkeypatch.setattr(FileUtils, "get_checksum", _get_checksum)
+    assert DownloadCacheManager.lookup("runner.tar.xz", sha256)
+    assert hashed == []
+
+    # changed files are hashed again
+    stored = DownloadCacheManager.lookup("runner.tar.xz", f"sha256:{sha256}")
+    os.utime(stored, ns=(0, 0))
+    assert DownloadCacheManager.lookup("runner.tar.xz", sha256) == stored
+    assert hashed == ["sha256"]
+    assert DownloadCacheManager.lookup("runner.tar.xz", sha256) == stored
+    assert hashed == ["sha256"]
+
+
+def test_evict_removes_links(cache):
+    for name in ("old", "new"):
+        (cache / name).write_bytes(name.encode() * 100)
+        stored = DownloadCacheManager.publish(str(cache / name), name)
+        DownloadCacheManager.link(stored, str(cache / name))
+    # a file replacing a link is not the cache's to remove
+    os.remove(cache / "new")
+    (cache / "new").write_bytes(b"mine")
+
+    assert DownloadCacheManager.evict(quota=400) == 300
+    assert not (cache / "old").exists()
+    DownloadCacheManager.clear()
+    assert (cache / "new").read_bytes() == b"mine"
@@ -0,0 +1,86 @@
+"""Unit tests for the page cache prefetch profiles"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bottles.backend.managers.prefetch import PrefetchManager
+from bottles.backend.models.config import BottleConfig
+
+# opens the files named on stdin and keeps them open
+_READER = """
+import sys
+files = []
+for line in sys.stdin:
+    files.append(open(line.strip(), "rb"))
+    print("ok", flush=True)
+"""
+
+
+@pytest.fixture
+def bottle(tmp_path):
+    path = tmp_path / "bottle"
+    (path / "drive_c/Game").mkdir(parents=True)
+    config = BottleConfig(Name="Test", Path=str(path), Custom_Path=True)
+    return config, path / "drive_c/Game"
+
+
+def _reader(config):
+    env = dict(os.environ, WINEPREFIX=config.Path)
+    return subprocess.Popen(
+        [sys.executable, "-c", _READER],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        env=env,
+        text=True,
+    )
+
+
+def test_record_profile(bottle):
+    config, game = bottle
+    for name in ("game.exe", "a.pak", "b.pak", "own.pak"):
+        (game / name).write_bytes(b"x" * 16)
+
+    prefetch = PrefetchManager(config, str(game / "game.exe"))
+    assert prefetch.files == []
+    reader = _reader(config)
+    own = open(game / "own.pak", "rb")
+    try:
+        for name in ("b.pak", "a.pak"):
+            reader.stdin.write(f"{game / name}\n")
+            reader.stdin.flush()
+            reader.stdout.readline()
+            prefetch.sample()
+        prefetch.start()
+        prefetch.stop()
+    finally:
+        own.close()
+        reader.kill()
+        reader.wait()
+
+    # ordered by first access, the other processes are ignored
+    recorded = [f for f in prefetch.files if f.startswith(str(game))]
+    assert recorded == [str(game / "b.pak"), str(game / "a.pak")]
+    assert PrefetchManager(config, str(game / "game.exe")).files == prefetch.files
+    assert PrefetchManager(config, str(game / "other.exe")).files == []
+
+
+def test_targets(bottle, monkeypatch):
+    config, game = bottle
+    (game / "game.exe").write_bytes(b"x" * 10)
+    (game / "data.pak").write_bytes(b"x" * 10)
+    prefetch = PrefetchManager(config, str(game / "game.exe"))
+
+    # first run: the program, and its directory when asked
+    assert prefetch.get_targets() == [str(game / "game.exe")]
+    assert prefetch.get_targets(str(game)) == [
+        str(game / "game.exe"),
+        str(game / "data.pak"),
+    ]
+
+    prefetch.files = [str(game / "data.pak"), "/missing", str(game / "game.exe")]
+    monkeypatch.setattr(PrefetchManager, "max_bytes", 15)
+    assert prefetch.get_targets() == [str(game / "data.pak")]
+    assert [f.result() for f in prefetch.warm()] == [True]
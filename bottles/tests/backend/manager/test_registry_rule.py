@@ -0,0 +1,117 @@
+"""Unit tests for merging and applying registry rules"""
+
+from bottles.backend.managers.registry_rule import RegistryRuleManager
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.models.registry_rule import RegistryRule
+from bottles.backend.wine.reg import Reg
+
+RULE_A = """REGEDIT4
+
+[HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides]
+"d3d9"="native"
+"dxgi"="native"
+
+[HKEY_CURRENT_USER\\Software\\Old]
+"x"="1"
+"""
+
+RULE_B = """[HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides]
+"D3D9"="builtin"
+
+[-HKEY_CURRENT_USER\\Software\\Old]
+
+[HKEY_CURRENT_USER\\Software\\App]
+"Blob"=hex:01,02,\\
+  03
+"""
+
+
+def _setup(tmp_path, monkeypatch, rules):
+    bottle = tmp_path / "bottle"
+    bottle.mkdir()
+    config = BottleConfig(
+        Name="Test",
+        Path=str(bottle),
+        Custom_Path=True,
+        Registry_Rules=[rule.to_dict() for rule in rules],
+    )
+    imports = []
+
+    def _launch(self, args, **_kwargs):
+        with open(args.split(" ", 1)[1]) as reg_file:
+            imports.append(reg_file.read())
+
+    monkeypatch.setattr(
+        "bottles.backend.managers.registry_rule.ManagerUtils.get_temp_path",
+        lambda dest: str(tmp_path / dest),
+    )
+    monkeypatch.setattr(Reg, "launch", _launch)
+    return config, imports
+
+
+def test_merge_rules_last_rule_wins():
+    bundle = RegistryRuleManager.merge_rules(
+        [RegistryRule("a", keys=RULE_A), RegistryRule("b", keys=RULE_B)]
+    )
+
+    assert bundle["deleted"] == ["HKEY_CURRENT_USER\\Software\\Old"]
+    assert [key for key, _values in bundle["keys"]] == [
+        "HKEY_CURRENT_USER\\Software\\App",
+        "HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides",
+    ]
+    assert bundle["keys"][0][1] == {"blob": '"Blob"=hex:01,02,03'}
+    assert bundle["keys"][1][1] == {
+        "d3d9": '"D3D9"="builtin"',
+        "dxgi": '"dxgi"="native"',
+    }
+    assert RegistryRuleManager.merge_rules([RegistryRule("empty")]) is None
+
+
+def test_apply_rules_imports_once(tmp_path, monkeypatch):
+    rules = [RegistryRule("a", keys=RULE_A), RegistryRule("b", keys=RULE_B)]
+    config, imports = _setup(tmp_path, monkeypatch, rules)
+
+    RegistryRuleManager.apply_rules(config)
+    assert len(imports) == 1
+    assert imports[0].startswith("REGEDIT4\n\n[-HKEY_CURRENT_USER\\Software\\Old]")
+    assert imports[0].count("[HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides]") == 1
+
+    # the same rule set is already applied to the prefix
+    RegistryRuleManager.apply_rules(config)
+    assert len(imports) == 1
+
+
+def test_apply_rules_imports_only_changes(tmp_path, monkeypatch):
+    config, imports = _setup(tmp_path, monkeypatch, [RegistryRule("a", keys=RULE_A)])
+    RegistryRuleManager.apply_rules(config)
+
+    config.Registry_Rules = [
+        RegistryRule(
+            "a", keys=RULE_A.replace('"dxgi"="native"', '"dxgi"="builtin"')
+        ).to_dict()
+    ]
+    RegistryRuleManager.apply_rules(config)
+
+    assert len(imports) == 2
+    assert '"dxgi"="builtin"' in imports[1]
+    assert '"d3d9"' not in imports[1]
+    assert "Software\\Old" not in imports[1]
+
+
+def test_apply_rules_after_registry_changes(tmp_path, monkeypatch):
+    config, imports = _setup(tmp_path, monkeypatch, [RegistryRule("a", keys=RULE_A)])
+    hive = tmp_path / "bottle" / "user.reg"
+    hive.write_text("WINE REGISTRY Version 2\n")
+    RegistryRuleManager.apply_rules(config, trigger="start_program")
+    RegistryRuleManager.apply_rules(config, trigger="start_program")
+    assert len(imports) == 1
+
+    # something else wrote the registry, the rules are imported again
+    hive.write_text("WINE REGISTRY Version 2\n;; changed\n")
+    RegistryRuleManager.apply_rules(config, trigger="start_program")
+    assert len(imports) == 2
+    assert imports[1] == imports[0]
+
+    # rules asked for explicitly are always imported
+    RegistryRuleManager.apply_rules(config, rule_names=["a"])
+    assert len(imports) == 3
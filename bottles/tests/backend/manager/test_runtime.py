@@ -0,0 +1,106 @@
+"""Unit tests for the runtime detection"""
+
+import os
+import time
+
+import pytest
+
+from bottles.backend.managers.runtime import RuntimeManager
+
+
+@pytest.fixture
+def runtimes(tmp_path, monkeypatch):
+    root = tmp_path / "runtimes"
+    root.mkdir()
+    monkeypatch.setattr("bottles.backend.managers.runtime.Paths.runtimes", str(root))
+    monkeypatch.setattr(RuntimeManager, "_cache", {})
+    return root
+
+
+def _synthetic_runtime(root, dirs: int):
+    for name in ("lib", "lib32"):
+        (root / name).mkdir(parents=True)
+    for i in range(dirs):
+        (root / "lib" / f"pkg{i // 100}" / f"dir{i}").mkdir(parents=True)
+
+
+def test_large_runtime_probed_without_walking(runtimes, monkeypatch):
+    _synthetic_runtime(runtimes, 20000)
+    (runtimes / "EasyAntiCheatRuntime").mkdir()
+
+    def _no_walk(*_args, **_kwargs):
+        raise AssertionError("the runtime tree should not be walked")
+
+    monkeypatch.setattr(os, "walk", _no_walk)
+    start = time.monotonic()
+    found = RuntimeManager.get_runtimes("bottles")
+    elapsed = time.monotonic() - start
+
+    assert found == [
+        f"{runtimes}/lib",
+        f"{runtimes}/lib32",
+        f"{runtimes}/EasyAntiCheatRuntime",
+    ]
+    assert elapsed < 0.1
+    assert RuntimeManager.get_runtime_env() == f":{runtimes}/lib:{runtimes}/lib32"
+    assert RuntimeManager.get_eac() == f"{runtimes}/EasyAntiCheatRuntime"
+    assert RuntimeManager.get_be() is False
+
+
+def test_runtime_in_versioned_directory(runtimes):
+    _synthetic_runtime(runtimes / "runtime", 0)
+    (runtimes / "runtime/manifest.yml").write_text("version: 1.0\n")
+
+    assert RuntimeManager.get_runtimes("bottles") == [
+        f"{runtimes}/runtime/lib",
+        f"{runtimes}/runtime/lib32",
+    ]
+
+
+def test_runtime_cached_until_changed(runtimes, monkeypatch):
+    assert RuntimeManager.get_runtimes("bottles") == []
+
+    probes = []
+    refresh = RuntimeManager.refresh
+
+    def _refresh(*args, **kwargs):
+        probes.append(args)
+        return refresh(*args, **kwargs)
+
+    monkeypatch.setattr(RuntimeManager, "refresh", staticmethod(_refresh))
+    assert RuntimeManager.get_runtimes("bottles") == []
+    assert probes == []
+
+    # installing a runtime changes the stamp
+    _synthetic_runtime(runtimes / "runtime", 0)
+    (runtimes / "runtime/manifest.yml").write_text("version: 1.0\n")
+    assert len(RuntimeManager.get_runtimes("bottles")) == 2
+    assert len(probes) == 1
+
+    # a manifest update is noticed as well
+    (runtimes / "runtime/manifest.yml").write_text("version: 1.1\n")
+    os.utime(runtimes / "runtime/manifest.yml", ns=(1, 1))
+    RuntimeManager.get_runtimes("bottles")
+    assert len(probes) == 2
+
+
+def test_background_refresh(runtimes, monkeypatch):
+    calls = []
+
+    def _steam():
+        calls.append(1)
+        return {"sniper": {"name": "sniper"}} if len(calls) > 1 else {}
+
+    monkeypatch.setattr(RuntimeManager, "_RuntimeManager__get_steam_runtime", _steam)
+    assert RuntimeManager.get_runtimes("steam") is False
+    assert RuntimeManager.get_runtimes("steam") is False
+    assert len(calls) == 1
+
+    monkeypatch.setattr(RuntimeManager, "refresh_interval", 0)
+    # the cached result is served while the refresh runs
+    assert RuntimeManager.get_runtimes("steam") is False
+    for _ in range(100):
+        if RuntimeManager.get_runtimes("steam"):
+            break
+        time.sleep(0.01)
+    assert "sniper" in RuntimeManager.get_runtimes("steam")
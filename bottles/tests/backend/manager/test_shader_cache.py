@@ -0,0 +1,106 @@
+"""Unit tests for the shader cache accounting, eviction and sharing"""
+
+import os
+
+import pytest
+
+from bottles.backend.globals import Paths
+from bottles.backend.managers.shader_cache import ShaderCacheManager
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.gpu import GPUUtils
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    sysfs = tmp_path / "sys"
+    device = sysfs / "class/drm/card0/device"
+    device.mkdir(parents=True)
+    (device / "vendor").write_text("0x10de\n")
+    (device / "device").write_text("0x2484\n")
+    (device / "boot_vga").write_text("1\n")
+    driver = sysfs / "bus/pci/drivers/nvidia"
+    driver.mkdir(parents=True)
+    (device / "driver").symlink_to(driver)
+    (sysfs / "module/nvidia").mkdir(parents=True)
+    (sysfs / "module/nvidia/version").write_text("550.54.14\n")
+
+    monkeypatch.setattr(GPUUtils, "sysfs", str(sysfs))
+    monkeypatch.setattr(GPUUtils, "get_boot_id", classmethod(lambda cls: "boot-1"))
+    monkeypatch.setattr(ShaderCacheManager, "_gpu_keys", {})
+    monkeypatch.setattr(Paths, "shader_cache", str(tmp_path / "shader_cache"))
+    return tmp_path
+
+
+def _bottle(root, name: str) -> BottleConfig:
+    path = root / name
+    for kind in ShaderCacheManager.kinds:
+        (path / "cache" / kind).mkdir(parents=True)
+    return BottleConfig(Name=name, Path=str(path), Custom_Path=True, DXVK="dxvk-2.3")
+
+
+def _write(path, size: int, used: float):
+    path.write_bytes(b"x" * size)
+    os.utime(path, (used, used))
+
+
+def test_gpu_key(caches):
+    assert ShaderCacheManager.get_gpu_key() == "nvidia-2484-nvidia-550.54.14"
+
+
+def test_shared_path(caches):
+    config = _bottle(caches, "A")
+    assert ShaderCacheManager.get_path(config, "dxvk_state") == os.path.join(
+        config.Path, "cache", "dxvk_state"
+    )
+
+    config.Parameters.shared_shader_cache = True
+    key = "nvidia-2484-nvidia-550.54.14"
+    dxvk = ShaderCacheManager.get_path(config, "dxvk_state")
+    assert dxvk == os.path.join(Paths.shader_cache, key, "dxvk_state", "dxvk-2.3")
+    assert os.path.isdir(dxvk)
+    # the GL caches only depend on the driver
+    gl = ShaderCacheManager.get_path(config, "gl_shader")
+    assert gl == os.path.join(Paths.shader_cache, key, "gl_shader")
+
+
+def test_details(caches):
+    a, b = _bottle(caches, "A"), _bottle(caches, "B")
+    _write(caches / "A/cache/dxvk_state/game.dxvk-cache", 100, 1000)
+    _write(caches / "A/cache/mesa_shader/index", 20, 1000)
+    _write(caches / "B/cache/vkd3d_shader/vkd3d-proton.cache", 50, 1000)
+    b.Parameters.shared_shader_cache = True
+    shared = ShaderCacheManager.get_path(b, "gl_shader")
+    _write(caches / shared / "cache.bin", 30, 1000)
+
+    details = ShaderCacheManager.get_details([a, b])
+    assert details["size_bytes"] == 200
+    assert details["bottles"][0]["kinds"]["dxvk_state"] == 100
+    assert details["bottles"][0]["size_bytes"] == 120
+    assert details["bottles"][1]["shared"]
+    assert details["shared"] == [
+        {"key": "nvidia-2484-nvidia-550.54.14", "size": "30.0B", "size_bytes": 30}
+    ]
+
+
+def test_evict_least_recently_used(caches):
+    a, b = _bottle(caches, "A"), _bottle(caches, "B")
+    old = caches / "A/cache/dxvk_state/old.dxvk-cache"
+    mid = caches / "B/cache/gl_shader/mid.bin"
+    new = caches / "A/cache/vkd3d_shader/new.cache"
+    _write(old, 100, 1000)
+    _write(mid, 100, 2000)
+    _write(new, 100, 3000)
+
+    assert ShaderCacheManager.evict([a, b], quota=0) == 0
+    assert ShaderCacheManager.evict([a, b], quota=250) == 100
+    assert not old.exists() and mid.exists() and new.exists()
+    assert ShaderCacheManager.evict([a, b], quota=100) == 100
+    assert not mid.exists() and new.exists()
+
+
+def test_clear(caches):
+    config = _bottle(caches, "A")
+    _write(caches / "A/cache/dxvk_state/game.dxvk-cache", 100, 1000)
+    ShaderCacheManager.clear(config)
+    assert ShaderCacheManager.get_bottle_usage(config)["dxvk_state"] == 0
+    assert os.path.isdir(caches / "A/cache/dxvk_state")
@@ -0,0 +1,160 @@
+"""Unit tests for the batched and cached cabinet extraction"""
+
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+from bottles.backend.cabextract import CabExtract
+from bottles.backend.globals import Paths
+
+# stands in for cabextract, the cabinets are JSON maps of member -> data
+_CABEXTRACT = """
+import fnmatch, json, os, sys
+
+args = sys.argv[1:]
+with open(LOG, "a") as f:
+    f.write(json.dumps(args) + "\\n")
+
+filters, dest, listing = [], ".", False
+while args and args[0].startswith("-"):
+    flag = args.pop(0)
+    if flag == "-F":
+        # brackets are matched literally
+        filters.append(args.pop(0).lower().replace("[", "[[]"))
+    elif flag == "-d":
+        dest = args.pop(0)
+    elif flag == "-l":
+        listing = True
+
+for cabinet in args:
+    with open(cabinet) as f:
+        members = json.load(f)
+    for name, data in members.items():
+        if filters and not any(fnmatch.fnmatch(name.lower(), p) for p in filters):
+            continue
+        if listing:
+            print(f"{len(data):>10} | 01.01.2000 00:00:00 | {name}")
+            continue
+        path = os.path.join(dest, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as out:
+            out.write(data)
+"""
+
+
+@pytest.fixture
+def cabextract(tmp_path, monkeypatch):
+    log = tmp_path / "calls.log"
+    binary = tmp_path / "cabextract"
+    binary.write_text(
+        f"#!{sys.executable}\nLOG = {str(log)!r}\n{_CABEXTRACT}", encoding="utf-8"
+    )
+    binary.chmod(binary.stat().st_mode | stat.S_IXUSR)
+
+    cabinet = tmp_path / "vcrun.cab"
+    cabinet.write_text(
+        json.dumps(
+            {
+                "msvcp140.dll": "msvcp",
+                "vcruntime140.dll": "vcruntime",
+                "x86/mfc140.dll": "mfc",
+            }
+        )
+    )
+
+    monkeypatch.setattr(Paths, "cab_cache", str(tmp_path / "cache"))
+    monkeypatch.setattr(CabExtract, "_digests", {})
+    monkeypatch.setattr(CabExtract, "quota", 0)
+    monkeypatch.setattr(
+        "bottles.backend.cabextract.shutil.which", lambda name: str(binary)
+    )
+
+    def calls():
+        if not log.exists():
+            return []
+        return [json.loads(line) for line in log.read_text().splitlines()]
+
+    return str(cabinet), calls, tmp_path
+
+
+def test_single_pass(cabextract):
+    cabinet, calls, tmp_path = cabextract
+    dest = tmp_path / "bottle1"
+
+    assert CabExtract().run(
+        cabinet, files=["msvcp140.dll", "x86/mfc140.dll"], destination=str(dest)
+    )
+    assert (dest / "msvcp140.dll").read_text() == "msvcp"
+    assert (dest / "mfc140.dll").read_text() == "mfc"
+    assert not (dest / "vcruntime140.dll").exists()
+
+    # one listing and one extraction with every filter
+    extractions = [c for c in calls() if "-l" not in c]
+    assert len(extractions) == 1
+    assert extractions[0].count("-F") == 2
+
+
+def test_cache_shared_between_bottles(cabextract):
+    cabinet, calls, tmp_path = cabextract
+    assert CabExtract().run(cabinet, destination=str(tmp_path / "bottle1"))
+    count = len(calls())
+
+    dest = tmp_path / "bottle2"
+    assert CabExtract().run(cabinet, files=["vcruntime140"], destination=str(dest))
+    assert (dest / "vcruntime140.dll").read_text() == "vcruntime"
+    assert len(calls()) == count
+
+    # copies are independent from the store
+    (dest / "vcruntime140.dll").write_text("patched")
+    store = CabExtract.get_store(cabinet)
+    with open(os.path.join(store, "vcruntime140.dll")) as f:
+        assert f.read() == "vcruntime"
+
+
+def test_missing_cabextract_uses_cache(cabextract, monkeypatch):
+    cabinet, _calls, tmp_path = cabextract
+    assert CabExtract().run(cabinet, destination=str(tmp_path / "bottle1"))
+
+    monkeypatch.setattr("bottles.backend.cabextract.shutil.which", lambda name: None)
+    dest = tmp_path / "bottle2"
+    assert CabExtract().run(cabinet, files=["msvcp140.dll"], destination=str(dest))
+    assert (dest / "msvcp140.dll").exists()
+    # a cabinet never extracted can't be
+    other = tmp_path / "other.cab"
+    other.write_text(json.dumps({"a.dll": "a"}))
+    assert not CabExtract().run(str(other), destination=str(dest))
+
+
+def test_filter_brackets(cabextract):
+    _cabinet, _calls, tmp_path = cabextract
+    cabinet = tmp_path / "brackets.cab"
+    cabinet.write_text(json.dumps({"a[1].dll": "a", "a1.dll": "b"}))
+
+    dest = tmp_path / "bottle1"
+    assert CabExtract().run(str(cabinet), files=["a[1].dll"], destination=str(dest))
+    assert os.listdir(dest) == ["a[1].dll"]
+
+
+def test_evict_least_recently_used(cabextract):
+    cabinet, _calls, tmp_path = cabextract
+    other = tmp_path / "other.cab"
+    other.write_text(json.dumps({"a.dll": "a" * 100}))
+    for path in (cabinet, str(other)):
+        assert CabExtract().run(path, destination=str(tmp_path / "bottle1"))
+
+    old = CabExtract.get_store(cabinet)
+    new = CabExtract.get_store(str(other))
+    os.utime(os.path.join(old, ".members.json"), (0, 0))
+    assert CabExtract.evict(quota=150) > 0
+    assert not os.path.exists(old)
+    assert os.path.isfile(os.path.join(new, "a.dll"))
+
+    # the store being extracted is kept even past the quota
+    CabExtract.quota = 1
+    dest = tmp_path / "bottle2"
+    assert CabExtract().run(cabinet, destination=str(dest))
+    assert os.listdir(Paths.cab_cache) == [os.path.basename(old)]
+    assert (dest / "msvcp140.dll").read_text() == "msvcp"
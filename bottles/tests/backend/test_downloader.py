@@ -0,0 +1,191 @@
+"""Unit tests for the resumable and segmented downloads"""
+
+import hashlib
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from bottles.backend.downloader import Downloader
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves PAYLOAD with range support, like a static file server."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.server.requests.append(("HEAD", None, None))
+        self.send_response(200)
+        self.__send_headers(len(self.server.payload))
+
+    def do_GET(self):
+        payload = self.server.payload
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if_range = self.headers.get("If-Range")
+        self.server.requests.append(("GET", self.headers.get("Range"), if_range))
+
+        if match and (if_range is None or if_range == self.server.etag):
+            start = int(match.group(1))
+            end = int(match.group(2) or len(payload) - 1)
+            if start >= len(payload):
+                self.send_response(416)
+                self.end_headers()
+                return
+            body = payload[start : end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(payload)}")
+        else:
+            body = payload
+            self.send_response(200)
+        self.__send_headers(len(body))
+
+        if self.server.cut:
+            # drop the connection in the middle of the body
+            body = body[: self.server.cut]
+            self.server.cut = 0
+            self.wfile.write(body)
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def __send_headers(self, length: int):
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", self.server.etag)
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.payload = PAYLOAD
+    httpd.etag = '"v1"'
+    httpd.ranges = True
+    httpd.cut = 0
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/file.tar.gz"
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(Downloader, "min_segment_size", 128 * 1024)
+    monkeypatch.setattr(Downloader, "chunk_size", 32 * 1024)
+
+
+def test_segmented(server, tmp_path):
+    dest = tmp_path / "file.tar.gz"
+    progress = []
+    res = Downloader(
+        _url(server), str(dest), update_func=lambda *a, **k: progress.append(a)
+    ).download()
+
+    assert res.ok
+    assert dest.read_bytes() == PAYLOAD
+    assert os.listdir(tmp_path) == ["file.tar.gz"]
+    ranges = [r for method, r, _ in server.requests if method == "GET"]
+    assert len(ranges) == 4 and all(ranges)
+    assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+
+
+def test_no_range_support(server, tmp_path):
+    server.ranges = False
+    dest = tmp_path / "file.tar.gz"
+    assert Downloader(_url(server), str(dest)).download().ok
+    assert dest.read_bytes() == PAYLOAD
+    assert [r for method, r, _ in server.requests if method == "GET"] == [None]
+
+
+def test_resume_stream(server, tmp_path):
+    dest = tmp_path / "file.tar.gz"
+    server.cut = 300 * 1024
+    assert not Downloader(_url(server), str(dest), segments=1).download().ok
+    assert not dest.exists()
+    part = tmp_path / "file.tar.gz.part"
+    received = part.stat().st_size
+    assert 0 < received < len(PAYLOAD)
+
+    res = Downloader(
+        _url(server), str(dest), segments=1, checksum_algorithm="sha256"
+    ).download()
+    assert res.ok
+    assert dest.read_bytes() == PAYLOAD
+    assert server.requests[-1] == ("GET", f"bytes={received}-", '"v1"')
+    # the digest covers the bytes of both attempts
+    assert res.data == {
+        "algorithm": "sha256",
+        "checksum": hashlib.sha256(PAYLOAD).hexdigest(),
+    }
+
+
+def test_resume_segments(server, tmp_path):
+    dest = tmp_path / "file.tar.gz"
+    server.cut = 100 * 1024
+    assert not Downloader(_url(server), str(dest)).download().ok
+    assert (tmp_path / "file.tar.gz.part.json").exists()
+
+    server.requests.clear()
+    res = Downloader(_url(server), str(dest), checksum_algorithm="md5").download()
+    assert res.ok
+    assert dest.read_bytes() == PAYLOAD
+    assert res.data["checksum"] == hashlib.md5(PAYLOAD).hexdigest()
+    # the bytes already received are not requested again
+    requested = 0
+    for method, header, if_range in server.requests:
+        if method == "GET":
+            start, end = map(int, header[len("bytes=") :].split("-"))
+            requested += end + 1 - start
+            assert if_range == '"v1"'
+    assert 0 < requested <= len(PAYLOAD) - 96 * 1024
+
+
+def test_changed_resource(server, tmp_path):
+    dest = tmp_path / "file.tar.gz"
+    server.cut = 300 * 1024
+    assert not Downloader(_url(server), str(dest), segments=1).download().ok
+
+    # the old bytes can't be reused once the resource changes
+    server.payload = PAYLOAD[::-1]
+    server.etag = '"v2"'
+    assert Downloader(_url(server), str(dest), segments=1).download().ok
+    assert dest.read_bytes() == PAYLOAD[::-1]
+    # the range was requested, the server answered with the whole file
+    assert server.requests[-1][1] == f"bytes={300 * 1024 // (32 * 1024) * 32 * 1024}-"
+
+    server.cut = 100 * 1024
+    dest.unlink()
+    assert not Downloader(_url(server), str(dest)).download().ok
+    server.payload = PAYLOAD
+    server.etag = '"v3"'
+    assert Downloader(_url(server), str(dest)).download().ok
+    assert dest.read_bytes() == PAYLOAD
+
+
+@pytest.mark.parametrize("segments", [1, 4])
+def test_checksum(server, tmp_path, monkeypatch, segments):
+    # the digest is computed while downloading, never from the whole file
+    monkeypatch.setattr(
+        "bottles.backend.downloader.FileUtils.get_checksum",
+        lambda *args: pytest.fail("the file was hashed again"),
+    )
+    dest = tmp_path / "file.tar.gz"
+    res = Downloader(
+        _url(server), str(dest), segments=segments, checksum_algorithm="md5"
+    ).download()
+    assert res.data["checksum"] == hashlib.md5(PAYLOAD).hexdigest()
+    assert Downloader(_url(server), str(tmp_path / "other")).download().data is None
@@ -0,0 +1,63 @@
+"""Unit tests for the background execution class"""
+
+import os
+import threading
+
+import pytest
+
+from bottles.backend.state import ExecutionClass, Task, TaskType
+from bottles.backend.utils.background import BackgroundExecutor
+
+
+class _Settings:
+    def __init__(self, **keys):
+        self.keys = keys
+
+    def get_boolean(self, key: str) -> bool:
+        return self.keys.get(key, False)
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setattr(BackgroundExecutor, "_pool", None)
+    monkeypatch.setattr(BackgroundExecutor, "_settings", None)
+    yield BackgroundExecutor
+    if BackgroundExecutor._pool is not None:
+        BackgroundExecutor._pool.shutdown()
+
+
+def _job():
+    return threading.current_thread().name, os.getpriority(os.PRIO_PROCESS, 0)
+
+
+def test_background_class(executor):
+    assert executor.get_class(TaskType.Backup) is ExecutionClass.BACKGROUND
+    assert executor.get_class(None) is ExecutionClass.NORMAL
+
+    name, nice = executor.run(TaskType.Backup, _job)
+    assert name.startswith("BottlesBackground")
+    assert nice == executor.nice
+    # the caller keeps its priority
+    assert os.getpriority(os.PRIO_PROCESS, 0) < 19
+
+    # nested jobs run inline instead of waiting on the pool
+    inner = executor.run(TaskType.Backup, executor.run, TaskType.Checksum, _job)
+    assert inner[0].startswith("BottlesBackground")
+    assert executor.get_workers(TaskType.Backup, 8) == 4
+
+
+def test_settings_select_class(executor):
+    executor.configure(_Settings(**{"background-backup": True}))
+    assert executor.get_class(TaskType.Backup) is ExecutionClass.BACKGROUND
+    assert executor.get_class(TaskType.Versioning) is ExecutionClass.NORMAL
+
+    name, _nice = executor.run(TaskType.Versioning, _job)
+    assert name == threading.current_thread().name
+    assert executor.get_workers(TaskType.Versioning, 8) == 8
+    assert executor._pool is None
+
+    task = Task(title="Committing", task_type=TaskType.Versioning)
+    assert task.execution_class is ExecutionClass.NORMAL
+    assert Task(title="Backup", task_type=TaskType.Backup).execution_class is (
+        ExecutionClass.BACKGROUND
+    )
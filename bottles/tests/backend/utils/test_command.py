@@ -0,0 +1,88 @@
+"""Unit tests for the argv command builder"""
+
+import subprocess
+
+import pytest
+
+from bottles.backend.managers.sandbox import SandboxManager
+from bottles.backend.utils.command import Command, get_argv, needs_shell
+
+DIRECT = [
+    "/opt/wine/bin/wine cmd /c ver",
+    "wine start /unix '/games/My Game/game.exe' -windowed",
+    'wine "C:\\Program Files\\app.exe"',
+    "wine C:\\\\windows\\\\notepad.exe",
+    "wine reg add 'HKCU\\Software\\Wine' /v 'a b' /d '$quoted'",
+]
+
+SHELL = [
+    "sh pre.sh ; wine game.exe",
+    "vmtouch -t game.exe && wine game.exe",
+    "wine winedbg << END\nquit\nEND",
+    "wine $HOME/game.exe",
+    'wine "$HOME/game.exe"',
+    "wine `pwd`/game.exe",
+    "wine *.exe",
+    "wine ~/game.exe",
+    "WINEDEBUG=-all wine game.exe",
+    "wine game.exe # comment",
+    "wine 'unterminated",
+]
+
+
+@pytest.mark.parametrize("command", DIRECT)
+def test_direct_matches_shell(command):
+    assert not needs_shell(command)
+    argv = get_argv(command)
+
+    # the words sh would pass to the program
+    printed = subprocess.run(
+        ["/bin/sh", "-c", "printf '%s\\n' " + command],
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert printed.splitlines() == argv
+
+
+@pytest.mark.parametrize("command", SHELL)
+def test_shell_features(command):
+    assert needs_shell(command)
+    assert get_argv(command) == ["/bin/sh", "-c", command]
+
+
+def test_command_builder():
+    command = Command("cabextract", "-d", "/tmp/my dir").add("-F", None, "*.dll")
+    command.add_if(False, "-q").prepend(None)
+
+    assert command.argv == ["cabextract", "-d", "/tmp/my dir", "-F", "*.dll"]
+    assert str(command) == "cabextract -d '/tmp/my dir' -F '*.dll'"
+
+
+def test_sandbox_argv():
+    sandbox = SandboxManager(
+        envs={"WINEDLLOVERRIDES": "winemenubuilder=''", "EMPTY": ""},
+        chdir="/games/My Game",
+        share_host_ro=False,
+        share_sound=False,
+        share_gpu=False,
+        share_display=False,
+    )
+
+    argv = sandbox.get_argv("wine 'game.exe'")
+    assert argv[:7] == [
+        "bwrap",
+        "--setenv",
+        "WINEDLLOVERRIDES",
+        "winemenubuilder=''",
+        "--setenv",
+        "EMPTY",
+        "",
+    ]
+    assert argv[-2:] == ["wine", "game.exe"]
+
+    # shell features are kept inside the sandbox
+    assert sandbox.get_argv("sh pre.sh ; wine game.exe")[-3:] == [
+        "/bin/sh",
+        "-c",
+        "sh pre.sh ; wine game.exe",
+    ]
@@ -0,0 +1,123 @@
+"""Unit tests for the sysfs based GPU detection"""
+
+import pytest
+
+from bottles.backend.utils import gpu
+from bottles.backend.utils.gpu import GPUUtils, GPUVendors
+
+
+def _add_card(sysfs, name: str, vendor: str, boot_vga=None, driver=None):
+    device = sysfs / "class/drm" / name / "device"
+    device.mkdir(parents=True)
+    (device / "vendor").write_text(f"{vendor}\n")
+    if boot_vga is not None:
+        (device / "boot_vga").write_text(f"{boot_vga}\n")
+    if driver is not None:
+        target = sysfs / "bus/pci/drivers" / driver
+        target.mkdir(parents=True, exist_ok=True)
+        (device / "driver").symlink_to(target)
+    # connectors live next to the cards and must be ignored
+    (sysfs / "class/drm" / f"{name}-DP-1").mkdir()
+
+
+@pytest.fixture
+def sysfs(tmp_path, monkeypatch):
+    root = tmp_path / "sys"
+    (root / "class/drm").mkdir(parents=True)
+    boot_id = tmp_path / "boot_id"
+    boot_id.write_text("boot-1\n")
+
+    monkeypatch.setattr(GPUUtils, "sysfs", str(root))
+    monkeypatch.setattr(GPUUtils, "boot_id_path", str(boot_id))
+    monkeypatch.setattr(GPUUtils, "cache_path", str(tmp_path / "gpu_cache.json"))
+    monkeypatch.setattr(GPUUtils, "_cache", None)
+    monkeypatch.setattr(gpu, "get_nvidia_dll_path", lambda: "/usr/lib/nvidia/wine")
+    monkeypatch.setattr(gpu.VulkanUtils, "__init__", lambda self: None)
+    monkeypatch.setattr(
+        gpu.VulkanUtils, "get_vk_icd", lambda self, vendor, as_string=False: vendor
+    )
+    return root
+
+
+def test_list_cards(sysfs):
+    _add_card(sysfs, "card0", "0x8086", boot_vga=1, driver="i915")
+    _add_card(sysfs, "card1", "0x10de", boot_vga=0, driver="nvidia")
+    _add_card(sysfs, "card2", "0x1af4")
+
+    assert GPUUtils.list_cards() == [
+        {"card": "card0", "vendor": "intel", "boot_vga": True, "driver": "i915"},
+        {"card": "card1", "vendor": "nvidia", "boot_vga": False, "driver": "nvidia"},
+    ]
+    assert GPUUtils().list_all() == ["intel", "nvidia"]
+    assert GPUUtils.is_gpu(GPUVendors.NVIDIA)
+    assert not GPUUtils.is_gpu(GPUVendors.AMD)
+
+
+def test_prime_from_boot_vga(sysfs):
+    _add_card(sysfs, "card0", "0x1002", boot_vga=1)
+    _add_card(sysfs, "card1", "0x10de", boot_vga=0)
+
+    result = GPUUtils().get_gpu()
+    assert result["prime"]["integrated"]["vendor"] == "amd"
+    assert result["prime"]["discrete"]["vendor"] == "nvidia"
+    assert result["vendors"]["nvidia"]["nvngx_path"] == "/usr/lib/nvidia/wine"
+    assert result["vendors"]["nvidia"]["icd"] == "nvidia"
+
+
+def test_prime_same_vendor(sysfs):
+    _add_card(sysfs, "card0", "0x1002", boot_vga=1)
+    _add_card(sysfs, "card1", "0x1002", boot_vga=0)
+
+    result = GPUUtils().get_gpu()
+    assert list(result["vendors"]) == ["amd"]
+    assert result["prime"]["discrete"]["envs"] == {"DRI_PRIME": "1"}
+
+
+def test_no_prime_when_display_on_discrete(sysfs):
+    _add_card(sysfs, "card0", "0x10de", boot_vga=1)
+    _add_card(sysfs, "card1", "0x8086", boot_vga=0)
+
+    assert GPUUtils().get_gpu()["prime"] == {"integrated": None, "discrete": None}
+
+
+def test_nouveau(sysfs):
+    _add_card(sysfs, "card0", "0x10de", boot_vga=1)
+    (sysfs / "module/nouveau").mkdir(parents=True)
+
+    nvidia = GPUUtils().get_gpu()["vendors"]["nvidia"]
+    assert nvidia["envs"] == {"DRI_PRIME": "1"}
+    assert nvidia["icd"] == ""
+
+
+def test_cached_per_boot(sysfs, tmp_path, monkeypatch):
+    _add_card(sysfs, "card0", "0x8086", boot_vga=1)
+    first = GPUUtils().get_gpu()
+    _add_card(sysfs, "card1", "0x10de", boot_vga=0)
+
+    # same boot: served from memory, then from the file in a new process
+    assert GPUUtils().get_gpu() == first
+    monkeypatch.setattr(GPUUtils, "_cache", None)
+    assert GPUUtils().get_gpu() == first
+
+    (tmp_path / "boot_id").write_text("boot-2\n")
+    assert "nvidia" in GPUUtils().get_gpu()["vendors"]
+
+
+def test_driver_paths_not_cached(sysfs, monkeypatch):
+    _add_card(sysfs, "card0", "0x8086", boot_vga=1)
+    _add_card(sysfs, "card1", "0x10de", boot_vga=0)
+    GPUUtils().get_gpu()
+
+    # a driver update in the same boot moves the ICD and the nvngx path
+    monkeypatch.setattr(gpu, "get_nvidia_dll_path", lambda: "/opt/nvidia/wine")
+    monkeypatch.setattr(
+        gpu.VulkanUtils,
+        "get_vk_icd",
+        lambda self, vendor, as_string=False: f"/new/{vendor}",
+    )
+    monkeypatch.setattr(GPUUtils, "_cache", None)
+
+    result = GPUUtils().get_gpu()
+    assert result["vendors"]["intel"]["icd"] == "/new/intel"
+    assert result["prime"]["discrete"]["icd"] == "/new/nvidia"
+    assert result["prime"]["discrete"]["nvngx_path"] == "/opt/nvidia/wine"
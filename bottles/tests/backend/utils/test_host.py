@@ -0,0 +1,92 @@
+"""Unit tests for the host capability snapshot"""
+
+import os
+import time
+
+import pytest
+
+from bottles.backend.utils.host import HostCapabilities
+
+
+@pytest.fixture
+def host(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    probes = []
+
+    def _probe(cls, stamp=None):
+        probes.append(stamp)
+        return cls(
+            boot_id=stamp[0],
+            stamp=stamp,
+            gamescope=str(bin_dir / "gamescope")
+            if (bin_dir / "gamescope").exists()
+            else "",
+            runtimes=["/rt/lib", "/rt/lib32", "/rt/EasyAntiCheatRuntime"],
+        )
+
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setattr(HostCapabilities, "probe", classmethod(_probe))
+    monkeypatch.setattr(HostCapabilities, "get_boot_id", staticmethod(lambda: "b-1"))
+    monkeypatch.setattr(
+        HostCapabilities, "cache_path", str(tmp_path / "host_capabilities.json")
+    )
+    monkeypatch.setattr(HostCapabilities, "_snapshot", None)
+    return bin_dir, probes
+
+
+def test_snapshot_persisted_per_stamp(host, monkeypatch):
+    bin_dir, probes = host
+    first = HostCapabilities.get()
+    assert HostCapabilities.get() is first
+    assert len(probes) == 1
+
+    # a new process loads the snapshot from disk
+    monkeypatch.setattr(HostCapabilities, "_snapshot", None)
+    assert HostCapabilities.get() == first
+    assert len(probes) == 1
+
+    # a new boot probes again
+    monkeypatch.setattr(HostCapabilities, "_snapshot", None)
+    monkeypatch.setattr(HostCapabilities, "get_boot_id", staticmethod(lambda: "b-2"))
+    assert HostCapabilities.get().boot_id == "b-2"
+    assert len(probes) == 2
+
+
+def test_refresh_follows_directory_changes(host):
+    bin_dir, probes = host
+    assert HostCapabilities.get().gamescope == ""
+
+    HostCapabilities.refresh()
+    assert len(probes) == 1
+
+    (bin_dir / "gamescope").touch()
+    os.utime(bin_dir, ns=(1, 1))
+    assert HostCapabilities.refresh().gamescope.endswith("gamescope")
+    assert HostCapabilities.get().gamescope.endswith("gamescope")
+
+
+def test_background_refresh(host, monkeypatch):
+    bin_dir, probes = host
+    HostCapabilities.get()
+    monkeypatch.setattr(HostCapabilities, "refresh_interval", 0)
+
+    (bin_dir / "gamescope").touch()
+    os.utime(bin_dir, ns=(1, 1))
+    # the stale snapshot is returned at once, the new one comes later
+    assert HostCapabilities.get().gamescope == ""
+    for _ in range(100):
+        if HostCapabilities.get().gamescope:
+            break
+        time.sleep(0.01)
+    assert HostCapabilities.get().gamescope.endswith("gamescope")
+
+
+def test_runtime_env(host, monkeypatch):
+    monkeypatch.setenv("LD_LIBRARY_PATH", "/usr/lib")
+    snapshot = HostCapabilities.get()
+
+    assert snapshot.get_runtime_env() == ":/rt/lib:/rt/lib32:/usr/lib"
+    assert snapshot.get_eac() == "/rt/EasyAntiCheatRuntime"
+    assert snapshot.get_be() is False
+    assert HostCapabilities().get_runtime_env() is False
@@ -0,0 +1,142 @@
+"""Unit tests for the scheduling and cgroup launch options"""
+
+import pytest
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.host import HostCapabilities
+from bottles.backend.utils.launch import LaunchOptions
+from bottles.backend.wine.winecommand import WineCommand
+
+TOOLS = {
+    "systemd_run": "/usr/bin/systemd-run",
+    "taskset": "/usr/bin/taskset",
+    "nice": "/usr/bin/nice",
+    "ionice": "/usr/bin/ionice",
+}
+
+
+def test_prefix():
+    options = LaunchOptions(
+        cpu_affinity="0-7, 16",
+        nice=5,
+        ionice_class="idle",
+        cgroup_scope=True,
+        cgroup_cpu_weight=200,
+        cgroup_memory_high="8G",
+        cgroup_io_weight=500,
+    )
+    assert options.get_prefix(**TOOLS).argv == [
+        "/usr/bin/systemd-run",
+        "--user",
+        "--scope",
+        "--quiet",
+        "--collect",
+        "-p",
+        "CPUWeight=200",
+        "-p",
+        "MemoryHigh=8G",
+        "-p",
+        "IOWeight=500",
+        "--",
+        "/usr/bin/taskset",
+        "-c",
+        "0-7,16",
+        "/usr/bin/nice",
+        "-n",
+        "5",
+        "/usr/bin/ionice",
+        "-t",
+        "-c",
+        "3",
+    ]
+
+
+def test_prefix_skips_invalid_and_missing():
+    assert len(LaunchOptions().get_prefix(**TOOLS)) == 0
+
+    options = LaunchOptions(
+        cpu_affinity="all",
+        nice=-40,
+        ionice_class="fast",
+        cgroup_scope=True,
+        cgroup_cpu_weight=20000,
+        cgroup_memory_high="lots",
+    )
+    assert options.get_prefix(**TOOLS).argv == [
+        "/usr/bin/systemd-run",
+        "--user",
+        "--scope",
+        "--quiet",
+        "--collect",
+        "--",
+        "/usr/bin/nice",
+        "-n",
+        "-20",
+    ]
+    # tools missing on the host are left out
+    assert options.get_prefix(nice="nice").argv == ["nice", "-n", "-20"]
+
+    # values from program entries may not be numbers
+    options = LaunchOptions(
+        nice="high", cgroup_scope=True, cgroup_cpu_weight="", cgroup_io_weight="x"
+    )
+    assert options.get_prefix(**TOOLS).argv == [
+        "/usr/bin/systemd-run",
+        "--user",
+        "--scope",
+        "--quiet",
+        "--collect",
+        "--",
+    ]
+
+
+def test_program_overrides():
+    config = BottleConfig()
+    config.Parameters.nice = 10
+    config.Parameters.cpu_affinity = "0-3"
+
+    options = LaunchOptions.from_params(
+        config.Parameters, {"nice": 0, "cpu_affinity": None, "unknown": 1}
+    )
+    assert options.nice == 0
+    assert options.cpu_affinity == "0-3"
+
+
+@pytest.fixture
+def launcher(tmp_path, monkeypatch):
+    bottle_path = tmp_path / "TestBottle"
+    bottle_path.mkdir()
+    config = BottleConfig(Name="Test", Path=str(bottle_path), Runner="test")
+    config.Parameters.use_runtime = False
+    config.Parameters.use_eac_runtime = False
+    config.Parameters.use_be_runtime = False
+    host = HostCapabilities(**TOOLS)
+
+    monkeypatch.setattr(
+        "bottles.backend.wine.winecommand.ManagerUtils.get_bottle_path",
+        lambda _config: str(bottle_path),
+    )
+    monkeypatch.setattr(HostCapabilities, "get", staticmethod(lambda: host))
+    monkeypatch.setattr(WineCommand, "_get_runner_info", lambda self: ("wine", ""))
+    monkeypatch.setattr(WineCommand, "get_env", lambda self, *a, **kw: {})
+    return config
+
+
+def test_get_cmd(launcher):
+    config = launcher
+    config.Parameters.cpu_affinity = "2-5"
+    config.Parameters.cgroup_scope = True
+    config.Parameters.cgroup_cpu_weight = 50
+
+    command = WineCommand(config, command="game.exe", launch_options={"nice": 3})
+    assert command.command == (
+        "/usr/bin/systemd-run --user --scope --quiet --collect -p CPUWeight=50 -- "
+        "/usr/bin/taskset -c 2-5 /usr/bin/nice -n 3 wine game.exe"
+    )
+    assert command.get_cmd("game.exe", return_steam_cmd=True).startswith(
+        "systemd-run --user --scope"
+    )
+
+    # internal commands are not affected
+    minimal = WineCommand(config, command="reg query HKCU", minimal=True)
+    assert minimal.command == "wine reg query HKCU"
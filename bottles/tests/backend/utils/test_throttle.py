@@ -0,0 +1,129 @@
+"""Unit tests for the session throttle"""
+
+import threading
+import time
+
+import pytest
+
+from bottles.backend.models.process import ProcessFinishedPayload, ProcessStartedPayload
+from bottles.backend.models.result import Result
+from bottles.backend.state import SignalManager, Signals, TaskType, ThrottlePolicy
+from bottles.backend.utils.background import BackgroundExecutor
+from bottles.backend.utils.throttle import SessionThrottle
+
+
+class _Settings:
+    def __init__(self, **keys):
+        self.keys = keys
+
+    def get_boolean(self, key: str) -> bool:
+        return self.keys.get(key, True)
+
+    def get_int(self, key: str) -> int:
+        return self.keys.get(key, 0)
+
+
+@pytest.fixture
+def throttle(monkeypatch):
+    monkeypatch.setattr(SessionThrottle, "_settings", None)
+    monkeypatch.setattr(SessionThrottle, "_sessions", set())
+    monkeypatch.setattr(SessionThrottle, "_connected", False)
+    monkeypatch.setattr(SignalManager, "_SIGNALS", {})
+    monkeypatch.setattr(BackgroundExecutor, "_settings", None)
+    return SessionThrottle
+
+
+def _started(launch_id: str) -> Result:
+    return Result(True, ProcessStartedPayload(launch_id, "b", "b", "/b", "p", "/p"))
+
+
+def test_follows_sessions(throttle):
+    throttle.configure(_Settings(**{"session-download-rate": 512}))
+    assert not throttle.is_active()
+    assert throttle.get_rate(TaskType.Download) == 0
+    assert throttle.get_workers(TaskType.Extraction, 4) == 4
+
+    SignalManager.send(Signals.ProgramStarted, _started("one"))
+    SignalManager.send(Signals.ProgramStarted, _started("two"))
+    assert throttle.is_active()
+    assert throttle.get_rate(TaskType.Download) == 512 * 1024
+    assert throttle.get_workers(TaskType.Extraction, 4) == 1
+    assert BackgroundExecutor.get_workers(TaskType.Extraction, 8) == 1
+
+    finished = ProcessFinishedPayload("one", "success", 0)
+    SignalManager.send(Signals.ProgramFinished, Result(True, finished))
+    assert throttle.is_active()
+    throttle.session_finished("two")
+    assert not throttle.is_active()
+    assert throttle.get_rate(TaskType.Download) == 0
+
+
+def test_policy_settings(throttle):
+    assert throttle.get_policy(TaskType.Backup) is ThrottlePolicy.PAUSE
+    assert throttle.get_policy(TaskType.Catalog) is ThrottlePolicy.LIMIT
+    assert throttle.get_policy(None) is ThrottlePolicy.NONE
+
+    throttle.configure(_Settings(**{"session-pause-tasks": False}))
+    assert throttle.get_policy(TaskType.Backup) is ThrottlePolicy.LIMIT
+    throttle.configure(_Settings(**{"session-throttle": False}))
+    assert throttle.get_policy(TaskType.Download) is ThrottlePolicy.NONE
+
+    throttle.session_started("game")
+    assert not throttle.is_throttled(TaskType.Download)
+    assert throttle.wait(TaskType.Backup)
+
+
+def test_pause_until_sessions_end(throttle):
+    throttle.session_started("game")
+    finished = []
+
+    def _job():
+        finished.append(time.monotonic())
+
+    thread = threading.Thread(
+        target=BackgroundExecutor.run, args=(TaskType.Versioning, _job)
+    )
+    thread.start()
+    time.sleep(0.2)
+    assert finished == []
+
+    ended = time.monotonic()
+    throttle.session_finished("game")
+    thread.join(5)
+    assert finished and finished[0] >= ended
+
+    # limited jobs are never paused and cancelled waits give up
+    throttle.session_started("game")
+    assert throttle.wait(TaskType.Download)
+    cancel = threading.Event()
+    cancel.set()
+    assert not throttle.wait(TaskType.Template, cancel)
+
+
+def test_paused_jobs_keep_pool_free(throttle, monkeypatch):
+    monkeypatch.setattr(BackgroundExecutor, "_pool", None)
+    throttle.session_started("game")
+    paused = [
+        threading.Thread(target=BackgroundExecutor.run, args=(task_type, time.time))
+        for task_type in (TaskType.Backup, TaskType.Versioning)
+    ]
+    for thread in paused:
+        thread.start()
+    time.sleep(0.2)
+
+    # both paused jobs wait outside the pool, limited jobs still run
+    result = []
+    checksum = threading.Thread(
+        target=lambda: result.append(
+            BackgroundExecutor.run(TaskType.Checksum, len, "ab")
+        )
+    )
+    checksum.start()
+    checksum.join(2)
+    assert result == [2]
+    assert all(thread.is_alive() for thread in paused)
+
+    throttle.session_finished("game")
+    for thread in paused:
+        thread.join(5)
+    BackgroundExecutor._pool.shutdown()
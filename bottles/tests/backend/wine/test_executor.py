@@ -2,6 +2,7 @@
 
 from bottles.backend.models.config import BottleConfig, BottleParams
 from bottles.backend.models.result import Result
+from bottles.backend.utils.host import HostCapabilities
 from bottles.backend.utils.manager import ManagerUtils
 from bottles.backend.wine.executor import WineExecutor
 from bottles.backend.wine.winecommand import WineCommand, WineEnv
@@ -67,6 +68,7 @@ def test_run_program_substitutes_placeholders(monkeypatch):
         program_gamescope=None,
         program_virt_desktop=None,
         program_winebridge=None,
+        program_launch_options=None,
     ):
         # mimic original __init__ contract enough for run() stub
         self.config = config
@@ -78,6 +80,7 @@ def test_run_program_substitutes_placeholders(monkeypatch):
             "pre_script_args": pre_script_args,
             "post_script_args": post_script_args,
             "cwd": cwd,
+            "launch_options": program_launch_options,
         }
 
     def fake_run(self):
@@ -96,6 +99,8 @@ def test_run_program_substitutes_placeholders(monkeypatch):
         "post_script": None,
         "post_script_args": "--dir=%PROGRAM_DIR%",
         "folder": "%PROGRAM_DIR%",
+        "nice": 5,
+        "cpu_affinity": None,
     }
 
     result = WineExecutor.run_program(config=config, program=program, terminal=False)
@@ -108,6 +113,7 @@ def test_run_program_substitutes_placeholders(monkeypatch):
     assert data["pre_script_args"] == f"--prefix={ManagerUtils.get_bottle_path(config)}"
     assert data["post_script_args"] == "--dir=/games/awesome"
     assert data["cwd"] == "/games/awesome"
+    assert data["launch_options"] == {"nice": 5}
 
 
 def test_wine_env_respects_allowed_keys(monkeypatch):
@@ -161,10 +167,6 @@ def test_winecommand_filters_host_environment(monkeypatch, tmp_path):
     monkeypatch.setattr(
         "bottles.backend.wine.winecommand.SteamUtils.is_proton", lambda *_: False
     )
-    monkeypatch.setattr(
-        "bottles.backend.wine.winecommand.DisplayUtils.check_nvidia_device",
-        lambda: None,
-    )
     monkeypatch.setattr(
         "bottles.backend.wine.winecommand.DisplayUtils.display_server_type",
         lambda: "x11",
@@ -184,8 +186,8 @@ def test_winecommand_filters_host_environment(monkeypatch, tmp_path):
         _fake_gpu,
     )
     monkeypatch.setattr(
-        "bottles.backend.wine.winecommand.RuntimeManager.get_runtime_env",
-        lambda *_: [],
+        "bottles.backend.wine.winecommand.HostCapabilities.get",
+        lambda: HostCapabilities(),
     )
 
     winecmd = WineCommand.__new__(WineCommand)
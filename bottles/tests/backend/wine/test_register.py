@@ -0,0 +1,245 @@
+"""Unit tests for the native wine registry engine"""
+
+import os
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.wine.reg import Reg
+from bottles.backend.wine.register import (
+    REG_BINARY,
+    REG_DWORD,
+    REG_EXPAND_SZ,
+    REG_MULTI_SZ,
+    REG_SZ,
+    WinRegister,
+)
+
+SYSTEM_REG = """WINE REGISTRY Version 2
+;; All keys relative to \\\\Machine
+
+#arch=win64
+
+[Software\\\\Microsoft\\\\Windows NT\\\\CurrentVersion] 1700000000
+#time=1da0b0d6e6c5a1e
+"CurrentBuild"="19045"
+"CurrentMajorVersionNumber"=dword:0000000a
+"Path"=str(2):"%SystemRoot%\\\\system32"
+"Blob"=hex:01,02,\\
+  03,04
+
+[System\\\\ControlSet001\\\\Control\\\\ProductOptions] 1700000000
+#time=1da0b0d6e6c5a1e
+"ProductType"="WinNT"
+
+[System\\\\CurrentControlSet] 1700000000
+#time=1da0b0d6e6c5a1e
+#link
+"SymbolicLinkValue"=hex(6):5c,00,52,00,65,00,67,00,69,00,73,00,74,00,72,00,79,00,\\
+  5c,00,4d,00,61,00,63,00,68,00,69,00,6e,00,65,00,5c,00,53,00,79,00,73,00,74,\\
+  00,65,00,6d,00,5c,00,43,00,6f,00,6e,00,74,00,72,00,6f,00,6c,00,53,00,65,00,\\
+  74,00,30,00,30,00,31,00
+"""
+
+USER_REG = """WINE REGISTRY Version 2
+;; All keys relative to \\\\User\\\\S-1-5-21-0-0-0-1000
+
+#arch=win64
+
+[Control Panel\\\\Desktop] 1700000000
+#time=1da0b0d6e6c5a1e
+"LogPixels"=dword:00000060
+@="default"
+"""
+
+
+def _make_bottle(tmp_path):
+    bottle = tmp_path / "bottle"
+    bottle.mkdir()
+    (bottle / "system.reg").write_text(SYSTEM_REG)
+    (bottle / "user.reg").write_text(USER_REG)
+    return bottle
+
+
+def _records(path) -> dict:
+    return {r.key.lower(): r for r in WinRegister.iter_records(str(path))}
+
+
+def _read(path, key: str, name: str):
+    record = _records(path).get(key.lower())
+    if record is None:
+        return None
+    for _name, data in record.values.items():
+        if _name.lower() == name.lower():
+            return WinRegister.decode_value(data)[1]
+    return None
+
+
+def test_records_decode_values(tmp_path):
+    bottle = _make_bottle(tmp_path)
+    path = bottle / "system.reg"
+    key = "Software\\Microsoft\\Windows NT\\CurrentVersion"
+
+    assert _read(path, key, "CurrentBuild") == "19045"
+    assert _read(path, key.upper(), "currentmajorversionnumber") == 10
+    assert _read(path, key, "Path") == "%SystemRoot%\\system32"
+    assert _read(path, key, "Blob") == b"\x01\x02\x03\x04"
+
+
+def test_write_changes_roundtrip_is_lossless(tmp_path):
+    bottle = _make_bottle(tmp_path)
+    path = bottle / "system.reg"
+    WinRegister.write_changes(str(path), {})
+
+    assert path.read_text() == SYSTEM_REG
+    records = _records(path)
+    assert "#link" in records["system\\currentcontrolset"].meta["extra"]
+
+
+def test_escape_roundtrip():
+    text = 'C:\\a "quoted"\nline\0\u00e8\u4e16'
+    assert WinRegister.unescape(WinRegister.escape(text)) == text
+
+    # characters past the BMP are written as surrogate pairs, like wine
+    assert WinRegister.escape("\U0001f600") == "\\xd83d\\xde00"
+    assert WinRegister.unescape("a\\xd83d\\xde00b") == "a\U0001f600b"
+
+
+def test_resolve_hive_and_link(tmp_path):
+    bottle = _make_bottle(tmp_path)
+    records = _records(bottle / "system.reg")
+
+    def get_target(prefix):
+        record = records.get(prefix.lower())
+        if record is None or "#link" not in record.meta["extra"]:
+            return None
+        return WinRegister.decode_value(record.values["SymbolicLinkValue"])[1]
+
+    hive, path = WinRegister.resolve_hive(
+        "HKEY_LOCAL_MACHINE\\System\\CurrentControlSet\\Control\\ProductOptions"
+    )
+    assert hive == "system.reg"
+    assert (
+        WinRegister.follow_links(path, get_target)
+        == "System\\ControlSet001\\Control\\ProductOptions"
+    )
+    assert WinRegister.resolve_hive("HKCU\\Software\\Wine") == (
+        "user.reg",
+        "Software\\Wine",
+    )
+    assert WinRegister.resolve_hive("HKEY_USERS\\S-1-5-18") is None
+
+
+def test_encode_values():
+    assert WinRegister.encode_value("REG_DWORD", "96") == "dword:00000060"
+    assert WinRegister.encode_value("REG_DWORD", "0x1F") == "dword:0000001f"
+    assert WinRegister.encode_value("REG_BINARY", "0a0b") == "hex:0a,0b"
+    assert WinRegister.encode_value(None, 'a"b') == '"a\\"b"'
+    assert WinRegister.decode_value(
+        WinRegister.encode_value("REG_MULTI_SZ", "a\\0b")
+    ) == (
+        REG_MULTI_SZ,
+        ["a", "b"],
+    )
+    assert WinRegister.decode_value(
+        WinRegister.encode_value("REG_EXPAND_SZ", "%x%")
+    ) == (
+        REG_EXPAND_SZ,
+        "%x%",
+    )
+    assert WinRegister.encode_reg_file_value("dword", "00000578") == "dword:00000578"
+    assert WinRegister.decode_value("hex(0):") == (0, b"")
+    assert WinRegister.decode_value("hex:ff") == (REG_BINARY, b"\xff")
+    assert WinRegister.decode_value('"x"') == (REG_SZ, "x")
+    assert WinRegister.decode_value("dword:00000001") == (REG_DWORD, 1)
+
+
+def test_reg_applies_changes_offline(tmp_path, monkeypatch):
+    bottle = _make_bottle(tmp_path)
+    config = BottleConfig(Name="Test", Path=str(bottle), Custom_Path=str(bottle))
+
+    monkeypatch.setattr(
+        "bottles.backend.wine.reg.WineServer.is_alive_native", lambda self: False
+    )
+
+    def _no_launch(*_args, **_kwargs):
+        raise AssertionError("reg.exe should not be launched")
+
+    monkeypatch.setattr(Reg, "launch", _no_launch)
+
+    reg = Reg(config)
+    reg.add(
+        "HKEY_CURRENT_USER\\Control Panel\\Desktop", "LogPixels", "120", "REG_DWORD"
+    )
+    reg.add("HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides", "d3d9", "native")
+    reg.remove(
+        "HKEY_LOCAL_MACHINE\\System\\CurrentControlSet\\Control\\ProductOptions",
+        "ProductType",
+    )
+    reg.import_bundle(
+        {
+            "HKEY_LOCAL_MACHINE\\Software\\Microsoft\\Windows NT\\CurrentVersion": [
+                {"value": "CurrentBuild", "data": "-"},
+                {"value": "CSDVersion", "data": "00000300", "key_type": "dword"},
+            ]
+        }
+    )
+
+    user = bottle / "user.reg"
+    system = bottle / "system.reg"
+    assert _read(user, "Control Panel\\Desktop", "LogPixels") == 120
+    assert _read(user, "Control Panel\\Desktop", "") == "default"
+    assert _read(user, "Software\\Wine\\DllOverrides", "d3d9") == "native"
+    assert _records(user)["software\\wine\\dlloverrides"].meta["time"]
+    assert (
+        _read(system, "System\\ControlSet001\\Control\\ProductOptions", "ProductType")
+        is None
+    )
+    key = "Software\\Microsoft\\Windows NT\\CurrentVersion"
+    assert _read(system, key, "CurrentBuild") is None
+    assert _read(system, key, "CSDVersion") == 0x300
+    assert not [f for f in os.listdir(bottle) if f.startswith(".")]
+
+
+def test_reg_falls_back_when_server_alive(tmp_path, monkeypatch):
+    bottle = _make_bottle(tmp_path)
+    config = BottleConfig(Name="Test", Path=str(bottle), Custom_Path=str(bottle))
+    launched = []
+
+    monkeypatch.setattr(
+        "bottles.backend.wine.reg.WineServer.is_alive_native", lambda self: True
+    )
+    monkeypatch.setattr(
+        "bottles.backend.wine.reg.WineDbg.wait_for_process", lambda *_: True
+    )
+    monkeypatch.setattr(
+        Reg, "launch", lambda self, args, **kwargs: launched.append(args) or _Res()
+    )
+
+    Reg(config).add("HKEY_CURRENT_USER\\Software\\Wine", "Version", "win10")
+
+    assert launched
+    assert _read(bottle / "user.reg", "Software\\Wine", "Version") is None
+
+
+class _Res:
+    data = ""
+
+
+def test_wineserver_lock_detection(tmp_path, monkeypatch):
+    import fcntl
+
+    from bottles.backend.wine.wineserver import WineServer
+
+    bottle = _make_bottle(tmp_path)
+    server_dir = tmp_path / "server"
+    server_dir.mkdir()
+    config = BottleConfig(Name="Test", Path=str(bottle), Custom_Path=str(bottle))
+    monkeypatch.setattr(
+        WineServer, "get_server_dir", staticmethod(lambda _prefix: str(server_dir))
+    )
+
+    assert WineServer(config).is_alive_native() is False
+
+    with open(server_dir / "lock", "w") as lock:
+        assert WineServer(config).is_alive_native() is False
+        fcntl.lockf(lock, fcntl.LOCK_EX)
+        assert WineServer(config).is_alive_native() is True
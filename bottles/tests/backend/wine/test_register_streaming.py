@@ -0,0 +1,215 @@
+"""Unit tests for the streaming registry parser, differ and writer"""
+
+import codecs
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from bottles.backend.utils import json
+from bottles.backend.wine.register import UnsortedHiveError, WinRegister
+
+HEADER = "WINE REGISTRY Version 2\n;; All keys relative to \\\\Machine\n\n#arch=win64\n"
+
+
+def _key(name: str, values: dict, stamp: int = 1700000000) -> str:
+    lines = [f"\n[{WinRegister.escape(name, '[]')}] {stamp}", "#time=1da0b0d6e6c5a1e"]
+    lines += [f'"{n}"={v}' for n, v in values.items()]
+    return "\n".join(lines) + "\n"
+
+
+def _write_hive(path, keys: dict) -> str:
+    with open(path, "w") as hive:
+        hive.write(HEADER)
+        for name, values in keys.items():
+            hive.write(_key(name, values))
+    return str(path)
+
+
+def _synthetic_hive(path, count: int, changed=(), missing=()) -> str:
+    with open(path, "w") as hive:
+        hive.write(HEADER)
+        for i in range(count):
+            if i in missing:
+                continue
+            data = '"changed"' if i in changed else f'"{i:064d}"'
+            hive.write(_key(f"Software\\Vendor\\App{i:07d}", {"Data": data}))
+    return str(path)
+
+
+def test_iter_records_reads_wine_hive(tmp_path):
+    path = _write_hive(
+        tmp_path / "system.reg",
+        {"A\\B": {"x": '"1"'}, "A\\B\\C": {"y": "dword:00000002"}},
+    )
+    header = []
+    records = list(WinRegister.iter_records(path, header))
+
+    assert header[0].startswith("WINE REGISTRY Version 2")
+    assert [r.key for r in records] == ["A\\B", "A\\B\\C"]
+    assert records[1].values == {"y": "dword:00000002"}
+    assert records[0].meta["time"] == "1da0b0d6e6c5a1e"
+    with open(path, "rb") as hive:
+        hive.seek(records[1].start)
+        assert hive.read(records[1].end - records[1].start).startswith(b"[A\\\\B\\\\C]")
+
+
+def test_iter_records_reads_utf16_export(tmp_path):
+    path = tmp_path / "export.reg"
+    text = (
+        "Windows Registry Editor Version 5.00\r\n\r\n"
+        "[HKEY_CURRENT_USER\\Software\\Wine]\r\n"
+        '"Version"="win10"\r\n\r\n'
+        "[HKEY_CURRENT_USER\\Software\\Wine\\Drivers]\r\n"
+        '"Graphics"="x11"\r\n'
+    )
+    path.write_bytes(codecs.BOM_UTF16_LE + text.encode("utf-16-le"))
+
+    records = list(WinRegister.iter_records(str(path)))
+    assert [r.key for r in records] == [
+        "HKEY_CURRENT_USER\\Software\\Wine",
+        "HKEY_CURRENT_USER\\Software\\Wine\\Drivers",
+    ]
+    assert records[0].values == {"Version": '"win10"'}
+    assert WinRegister().new(str(path)).reg_dict[records[1].key] == {
+        "Graphics": '"x11"'
+    }
+
+
+def test_digest_ignores_modification_time(tmp_path):
+    one = _write_hive(tmp_path / "one.reg", {"A": {"x": '"1"'}})
+    two = tmp_path / "two.reg"
+    two.write_text(HEADER + _key("A", {"x": '"1"'}, stamp=1800000000))
+
+    assert not list(WinRegister.iter_diff(one, str(two)))
+
+
+def test_iter_diff_merges_sorted_hives(tmp_path):
+    old = _write_hive(
+        tmp_path / "old.reg",
+        {"A": {"x": '"1"'}, "A\\B": {"x": '"1"'}, "A B": {"x": '"1"'}},
+    )
+    new = _write_hive(
+        tmp_path / "new.reg",
+        {"A": {"x": '"2"'}, "A\\C": {"x": '"1"'}, "A B": {"x": '"1"'}},
+    )
+
+    diff = {
+        key: (a is not None, b is not None)
+        for key, a, b in WinRegister.iter_diff(old, new)
+    }
+    assert diff == {"A": (True, True), "A\\B": (True, False), "A\\C": (False, True)}
+
+
+def test_compare_and_update(tmp_path):
+    current = _write_hive(
+        tmp_path / "current.reg", {"A": {"x": '"new"'}, "B": {"y": '"same"'}}
+    )
+    snapshot = _write_hive(
+        tmp_path / "snapshot.reg", {"A": {"x": '"old"'}, "B": {"y": '"same"'}}
+    )
+
+    reg = WinRegister().new(current)
+    assert reg.compare(snapshot) == {"A": {"x": '"new"'}}
+
+    target = WinRegister().new(snapshot)
+    target.update(reg.diff)
+    assert WinRegister().new(snapshot).reg_dict == {
+        "A": {"x": '"new"'},
+        "B": {"y": '"same"'},
+    }
+    assert [f for f in os.listdir(tmp_path) if f.endswith(".bak")]
+
+
+def test_compare_falls_back_on_unsorted_hive(tmp_path):
+    unsorted = _write_hive(tmp_path / "unsorted.reg", {"B": {"x": '"1"'}, "A": {}})
+    other = _write_hive(tmp_path / "other.reg", {"A": {}, "B": {"x": '"2"'}})
+
+    with pytest.raises(UnsortedHiveError):
+        list(WinRegister.iter_diff(unsorted, other))
+    assert WinRegister().new(unsorted).compare(other) == {"B": {"x": '"1"'}}
+
+
+def test_write_changes_streams_edits(tmp_path):
+    path = _write_hive(
+        tmp_path / "system.reg",
+        {"A": {"x": '"1"'}, "A\\Sub": {"y": '"1"'}, "C": {"z": '"1"'}},
+    )
+
+    WinRegister.write_changes(
+        path,
+        {"B": {"new": '"1"'}, "a": {"X": '"2"', "w": '"3"'}, "A\\Sub": None},
+    )
+    records = list(WinRegister.iter_records(path))
+
+    assert [r.key for r in records] == ["A", "B", "C"]
+    assert records[0].values == {"x": '"2"', "w": '"3"'}
+    assert records[0].meta["stamp"] != "1700000000"
+    assert records[2].meta["stamp"] == "1700000000"
+
+
+def test_write_changes_appends_on_unsorted_hive(tmp_path):
+    path = _write_hive(tmp_path / "system.reg", {"C": {}, "A": {"x": '"1"'}})
+
+    WinRegister.write_changes(path, {"A": {"x": '"2"'}, "B": {"y": '"1"'}})
+    records = list(WinRegister.iter_records(path))
+
+    assert [r.key for r in records] == ["C", "A", "B"]
+    assert records[1].values == {"x": '"2"'}
+
+
+def test_export_json(tmp_path):
+    path = _write_hive(tmp_path / "system.reg", {"A": {"x": '"1"'}, "B": {}})
+    out = tmp_path / "out.json"
+    WinRegister().new(path).export_json(str(out))
+
+    with open(out) as f:
+        assert json.load(f) == {"A": {"x": '"1"'}, "B": {}}
+
+
+def test_diff_memory_is_bounded(tmp_path):
+    old = _synthetic_hive(tmp_path / "old.reg", 20000)
+    new = _synthetic_hive(tmp_path / "new.reg", 20000, changed={5, 999}, missing={7})
+    size = os.path.getsize(old)
+
+    tracemalloc.start()
+    diff = WinRegister().new(new).compare(old)
+    WinRegister.write_changes(old, diff)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert sorted(diff) == [
+        "Software\\Vendor\\App0000005",
+        "Software\\Vendor\\App0000999",
+    ]
+    assert peak < size / 4
+
+
+@pytest.mark.skipif(
+    not os.environ.get("BOTTLES_BENCHMARK"), reason="set BOTTLES_BENCHMARK=1 to run"
+)
+def test_benchmark_large_hive(tmp_path):
+    count = 400000  # ~80MB, the size of a system.reg with a few large games
+    old = _synthetic_hive(tmp_path / "old.reg", count)
+    new = _synthetic_hive(tmp_path / "new.reg", count, changed={10, count - 1})
+    size = os.path.getsize(old)
+
+    tracemalloc.start()
+    start = time.monotonic()
+    records = sum(1 for _ in WinRegister.iter_records(old))
+    parsed = time.monotonic()
+    diff = WinRegister().new(new).compare(old)
+    diffed = time.monotonic()
+    WinRegister.write_changes(old, diff)
+    written = time.monotonic()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"\n{size / 2**20:.1f}MB, {records} keys: parse {parsed - start:.2f}s, "
+        f"diff {diffed - parsed:.2f}s, write {written - diffed:.2f}s, "
+        f"peak {peak / 2**20:.1f}MB"
+    )
+    assert len(diff) == 2
+    assert peak < 16 * 2**20
@@ -0,0 +1,113 @@
+"""Unit tests for the read-only RegistryView"""
+
+import os
+from collections import OrderedDict
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.wine.regview import RegistryView
+from bottles.backend.wine.register import WinRegister
+
+USER_REG = """WINE REGISTRY Version 2
+;; All keys relative to \\\\User\\\\S-1-5-21-0-0-0-1000
+
+#arch=win64
+
+[Software\\\\Wine\\\\DllOverrides] 1700000000
+#time=1da0b0d6e6c5a1e
+"d3d9"="native,builtin"
+"*dxgi"="native"
+
+[Software\\\\Wine\\\\Drivers] 1700000000
+#time=1da0b0d6e6c5a1e
+"Graphics"="x11,wayland"
+"""
+
+SYSTEM_REG = """WINE REGISTRY Version 2
+;; All keys relative to \\\\Machine
+
+#arch=win64
+
+[System\\\\ControlSet001\\\\Control\\\\ProductOptions] 1700000000
+#time=1da0b0d6e6c5a1e
+"ProductType"="WinNT"
+
+[System\\\\CurrentControlSet] 1700000000
+#time=1da0b0d6e6c5a1e
+#link
+"SymbolicLinkValue"=hex(6):5c,00,52,00,65,00,67,00,69,00,73,00,74,00,72,00,79,00,\\
+  5c,00,4d,00,61,00,63,00,68,00,69,00,6e,00,65,00,5c,00,53,00,79,00,73,00,74,\\
+  00,65,00,6d,00,5c,00,43,00,6f,00,6e,00,74,00,72,00,6f,00,6c,00,53,00,65,00,\\
+  74,00,30,00,30,00,31,00
+"""
+
+
+def _make_view(tmp_path):
+    bottle = tmp_path / "bottle"
+    bottle.mkdir()
+    (bottle / "user.reg").write_text(USER_REG)
+    (bottle / "system.reg").write_text(SYSTEM_REG)
+    config = BottleConfig(Name="Test", Path=str(bottle), Custom_Path=str(bottle))
+    return bottle, RegistryView(config)
+
+
+def test_get_and_enumerate(tmp_path):
+    _bottle, view = _make_view(tmp_path)
+    key = "HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides"
+
+    assert view.get(key, "D3D9") == "native,builtin"
+    assert view.get(key, "missing", "x") == "x"
+    assert view.enumerate(key) == {"d3d9": "native,builtin", "*dxgi": "native"}
+    assert view.enumerate("HKCU\\Software\\Nothing") == {}
+    assert sorted(view.subkeys("HKCU\\Software\\Wine")) == ["DllOverrides", "Drivers"]
+    assert view.subkeys("HKCU\\Software") == ["Wine"]
+
+
+def test_follows_links(tmp_path):
+    _bottle, view = _make_view(tmp_path)
+    key = "HKLM\\System\\CurrentControlSet\\Control\\ProductOptions"
+
+    assert view.get(key, "ProductType") == "WinNT"
+
+
+def test_reindexes_changed_hive(tmp_path):
+    bottle, view = _make_view(tmp_path)
+    key = "HKCU\\Software\\Wine\\DllOverrides"
+    path = str(bottle / "user.reg")
+
+    assert view.get(key, "d3d9") == "native,builtin"
+    assert view.get("HKCU\\Software\\Wine\\Drivers", "Graphics") == "x11,wayland"
+    index = RegistryView._indexes[path]
+    assert view.get(key, "d3d9") == "native,builtin"
+    assert RegistryView._indexes[path] is index
+
+    WinRegister.write_changes(
+        path, {"Software\\Wine\\DllOverrides": {"d3d9": '"disabled"'}}
+    )
+    os.utime(path, ns=(1, 1))
+
+    assert view.get(key, "d3d9") == "disabled"
+    reindexed = RegistryView._indexes[path]
+    assert reindexed is not index
+    # the untouched key is served from the parsed values of the old index
+    drivers = reindexed.keys["software\\wine\\drivers"][3]
+    assert drivers in reindexed.parsed
+
+
+def test_keeps_recent_hives(tmp_path, monkeypatch):
+    monkeypatch.setattr(RegistryView, "_indexes", OrderedDict())
+    monkeypatch.setattr(RegistryView, "max_indexes", 2)
+    key = "HKCU\\Software\\Wine\\DllOverrides"
+    views = []
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        bottle, view = _make_view(tmp_path / name)
+        views.append((str(bottle / "user.reg"), view))
+
+    assert views[0][1].get(key, "d3d9") == "native,builtin"
+    assert views[0][1].get(key.replace("HKCU", "HKLM"), "x") is None
+    assert views[1][1].get(key, "d3d9") == "native,builtin"
+    # the least recently used hive was dropped
+    assert list(RegistryView._indexes) == [
+        str(tmp_path / "a" / "bottle" / "system.reg"),
+        views[1][0],
+    ]
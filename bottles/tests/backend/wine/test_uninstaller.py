@@ -0,0 +1,84 @@
+"""Unit tests for the native Uninstall keys enumeration"""
+
+import os
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.wine.uninstaller import Uninstaller
+
+SYSTEM_REG = """WINE REGISTRY Version 2
+;; All keys relative to \\\\Machine
+
+#arch=win64
+
+[Software\\\\Microsoft\\\\Windows\\\\CurrentVersion\\\\Uninstall\\\\Game] 1700000000
+#time=1da0b0d6e6c5a1e
+"DisplayName"="Some Game"
+"InstallLocation"="C:\\\\Games\\\\Some Game"
+"UninstallString"="C:\\\\Games\\\\Some Game\\\\unins000.exe"
+
+[Software\\\\Microsoft\\\\Windows\\\\CurrentVersion\\\\Uninstall\\\\Hidden] 1700000000
+#time=1da0b0d6e6c5a1e
+"DisplayName"="Hidden runtime"
+"SystemComponent"=dword:00000001
+"UninstallString"="hidden.exe"
+
+[Software\\\\Wow6432Node\\\\Microsoft\\\\Windows\\\\CurrentVersion\\\\Uninstall\\\\{0D2C9A8B-AAAA-4E2B-8C9E-123456789ABC}] 1700000000
+#time=1da0b0d6e6c5a1e
+"DisplayName"="Microsoft Visual C++ 2010 x86 Redistributable"
+"WindowsInstaller"=dword:00000001
+"""
+
+USER_REG = """WINE REGISTRY Version 2
+;; All keys relative to \\\\User\\\\S-1-5-21-0-0-0-1000
+
+#arch=win64
+"""
+
+
+def _make_bottle(tmp_path):
+    bottle = tmp_path / "bottle"
+    bottle.mkdir()
+    (bottle / "system.reg").write_text(SYSTEM_REG)
+    (bottle / "user.reg").write_text(USER_REG)
+    return bottle, BottleConfig(Name="Test", Path=str(bottle), Custom_Path=True)
+
+
+def test_list_programs(tmp_path):
+    _bottle, config = _make_bottle(tmp_path)
+    programs = Uninstaller(config).list_programs()
+
+    assert [(p.uuid, p.view) for p in programs] == [
+        ("Game", "HKLM"),
+        ("{0D2C9A8B-AAAA-4E2B-8C9E-123456789ABC}", "HKLM32"),
+    ]
+    assert programs[0].install_location == "C:\\Games\\Some Game"
+    assert programs[0].uninstall_string.endswith("unins000.exe")
+    assert programs[1].uninstall_string == (
+        "msiexec /x{0D2C9A8B-AAAA-4E2B-8C9E-123456789ABC}"
+    )
+    assert Uninstaller(config).list_programs() is programs
+
+
+def test_get_uuid_without_wine(tmp_path, monkeypatch):
+    bottle, config = _make_bottle(tmp_path)
+
+    def _no_launch(*_args, **_kwargs):
+        raise AssertionError("wine should not be launched")
+
+    monkeypatch.setattr(Uninstaller, "launch", _no_launch)
+    uninstaller = Uninstaller(config)
+
+    assert uninstaller.get_uuid("visual c++ 2010").data == (
+        "{0D2C9A8B-AAAA-4E2B-8C9E-123456789ABC}"
+    )
+    assert not uninstaller.get_uuid("missing").ready
+    assert uninstaller.get_uuid().data.splitlines()[0] == "Game|||Some Game"
+
+    # the cache follows the hive
+    with open(bottle / "system.reg", "a") as hive:
+        hive.write(
+            "\n[Software\\\\Microsoft\\\\Windows\\\\CurrentVersion\\\\Uninstall"
+            '\\\\Tool] 1700000001\n"DisplayName"="Tool"\n"UninstallString"="x"\n'
+        )
+    os.utime(bottle / "system.reg", ns=(1, 1))
+    assert uninstaller.get_uuid("tool").data == "Tool"
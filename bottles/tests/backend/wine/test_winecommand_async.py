@@ -0,0 +1,88 @@
+"""Unit tests for the asyncio WineCommand API"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.aio import run_all, run_sync
+from bottles.backend.utils.host import HostCapabilities
+from bottles.backend.wine.winecommand import WineCommand
+
+
+@pytest.fixture
+def command(tmp_path, monkeypatch):
+    monkeypatch.setattr(HostCapabilities, "get", staticmethod(HostCapabilities))
+
+    def _command(cmd: str, bottle: str = "bottle"):
+        winecmd = WineCommand.__new__(WineCommand)
+        winecmd.config = BottleConfig(Name=bottle, Path=str(tmp_path / bottle))
+        winecmd.runner = "wine"
+        winecmd.env = dict(os.environ)
+        winecmd.cwd = str(tmp_path)
+        winecmd.command = cmd
+        winecmd.terminal = False
+        return winecmd
+
+    return _command
+
+
+def test_run_async(command):
+    seen = []
+    res = asyncio.run(command("printf 'a\\nb\\n'").run_async(on_line=seen.append))
+
+    assert res.status
+    assert res.data == "a\nb\n"
+    assert seen == ["a", "b"]
+
+
+def test_timeout_kills_command(command, tmp_path):
+    marker = tmp_path / "marker"
+    start = time.monotonic()
+    res = asyncio.run(command(f"sleep 1.5 && touch {marker}").run_async(timeout=0.1))
+
+    assert not res.status
+    assert res.message == "Wine command timed out."
+    assert time.monotonic() - start < 1
+    # the command would have created the marker by now
+    time.sleep(max(0.0, start + 2 - time.monotonic()))
+    assert not marker.exists()
+
+
+def test_cancellation_kills_command(command):
+    async def _cancel():
+        task = asyncio.create_task(command("sleep 5").run_async())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.monotonic()
+    asyncio.run(_cancel())
+    assert time.monotonic() - start < 1
+
+
+def test_per_bottle_concurrency(command, monkeypatch):
+    monkeypatch.setattr(WineCommand, "bottle_concurrency", 1)
+
+    async def _run(bottles):
+        start = time.monotonic()
+        await asyncio.gather(
+            *(command("sleep 0.5", bottle).run_async() for bottle in bottles)
+        )
+        return time.monotonic() - start
+
+    assert asyncio.run(_run(["a", "a"])) >= 1
+    assert asyncio.run(_run(["a", "b"])) < 0.9
+
+
+def test_sync_facade(command):
+    assert run_sync(command("echo ok").run_async()).data == "ok\n"
+
+    results = run_all(command(f"echo {i}", str(i)).run_async() for i in range(8))
+    assert [r.data for r in results] == [f"{i}\n" for i in range(8)]
+
+    with pytest.raises(TimeoutError):
+        run_sync(asyncio.sleep(1), timeout=0.05)
@@ -0,0 +1,124 @@
+"""Unit tests for the memoized WineCommand launch environment"""
+
+import os
+import time
+
+import pytest
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.gpu import GPUUtils
+from bottles.backend.utils.host import HostCapabilities
+from bottles.backend.wine.winecommand import WineCommand
+
+
+@pytest.fixture
+def launcher(tmp_path, monkeypatch):
+    bottle_path = tmp_path / "TestBottle"
+    bottle_path.mkdir()
+    runner_path = tmp_path / "runner"
+    (runner_path / "lib/wine/x86_64-unix").mkdir(parents=True)
+    (runner_path / "bin").mkdir()
+    (runner_path / "bin/wine").touch()
+
+    config = BottleConfig(Name="Test", Path=str(bottle_path), Runner="test")
+    config.Parameters.use_runtime = False
+    config.Parameters.use_eac_runtime = False
+    config.Parameters.use_be_runtime = False
+    host = HostCapabilities()
+    builds = []
+
+    def _get_gpu(self):
+        builds.append(1)
+        return {
+            "prime": {"discrete": None, "integrated": None},
+            "vendors": {"amd": {"icd": "/tmp/amd.json", "envs": {}}},
+        }
+
+    monkeypatch.setattr(
+        "bottles.backend.wine.winecommand.ManagerUtils.get_bottle_path",
+        lambda _config: str(bottle_path),
+    )
+    monkeypatch.setattr(
+        "bottles.backend.wine.winecommand.ManagerUtils.get_runner_path",
+        lambda _runner: str(runner_path),
+    )
+    monkeypatch.setattr(HostCapabilities, "get", staticmethod(lambda: host))
+    monkeypatch.setattr(GPUUtils, "get_gpu", _get_gpu)
+    monkeypatch.setattr(WineCommand, "_env_cache", {})
+
+    def _launch(command: str = "reg query HKCU", **kwargs):
+        return WineCommand(config, command=command, minimal=True, **kwargs)
+
+    return config, _launch, builds
+
+
+def test_env_reused_between_launches(launcher):
+    config, launch, builds = launcher
+    first = launch().env
+    assert first["WINEPREFIX"] == config.Path
+    assert first["VK_ICD_FILENAMES"] == "/tmp/amd.json"
+
+    # callers may change their copy without affecting later launches
+    first["WINEPREFIX"] = "/elsewhere"
+    second = launch("winepath -u C:\\").env
+    assert second["WINEPREFIX"] == config.Path
+    assert len(builds) == 1
+
+
+def test_env_follows_dynamic_inputs(launcher, monkeypatch):
+    config, launch, builds = launcher
+    base = launch().env
+
+    env = launch(environment={"WINEDLLOVERRIDES": "mscoree=d"}).env
+    assert env["WINEDLLOVERRIDES"].startswith("mscoree=d;")
+    assert "mscoree" not in base["WINEDLLOVERRIDES"]
+
+    monkeypatch.setenv("BOTTLES_TEST_VAR", "1")
+    assert launch().env["BOTTLES_TEST_VAR"] == "1"
+
+    config.Parameters.fsr = True
+    assert launch().env["WINE_FULLSCREEN_FSR"] == "1"
+    assert len(builds) == 4
+
+
+def test_env_invalidated_by_update(launcher):
+    config, launch, builds = launcher
+    launch()
+    WineCommand.invalidate_env(config)
+    launch()
+    assert len(builds) == 2
+
+
+def test_env_follows_host_snapshot(launcher, monkeypatch):
+    _config, launch, builds = launcher
+    launch()
+    monkeypatch.setattr(
+        HostCapabilities, "get", staticmethod(lambda: HostCapabilities(gamescope="x"))
+    )
+    launch()
+    assert len(builds) == 2
+
+
+@pytest.mark.skipif(
+    not os.environ.get("BOTTLES_BENCHMARK"), reason="set BOTTLES_BENCHMARK=1 to run"
+)
+def test_benchmark_helper_launches(launcher):
+    _config, launch, _builds = launcher
+    count = 1000
+
+    start = time.monotonic()
+    for _ in range(count):
+        WineCommand._env_cache.clear()
+        launch()
+    cold = time.monotonic() - start
+
+    start = time.monotonic()
+    for _ in range(count):
+        launch()
+    warm = time.monotonic() - start
+
+    print(
+        f"\n{count} helper launches: uncached {cold * 1000:.1f}ms, "
+        f"cached {warm * 1000:.1f}ms"
+    )
+    assert warm < cold
@@ -0,0 +1,102 @@
+"""Unit tests for the streamed WineCommand output"""
+
+import os
+
+import pytest
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.host import HostCapabilities
+from bottles.backend.wine.winecommand import WineCommand, WineOutput
+
+
+def _read(output: WineOutput, *chunks: bytes) -> list:
+    lines = []
+    for chunk in chunks:
+        lines += output.feed(chunk)
+    return lines + output.close()
+
+
+def test_lines_split_across_chunks():
+    output = WineOutput(limit=1024)
+    lines = _read(output, b"first li", b"ne\r", b"\nsecond\nthird")
+
+    assert lines == ["first line", "second", "third"]
+    assert output.text == "first line\r\nsecond\nthird"
+    assert output.encoding in ("ascii", "utf-8")
+
+
+def test_encoding_locked_on_prefix(monkeypatch):
+    detected = []
+
+    def _detect(text, locale_hint=None):
+        detected.append(len(text))
+        return "cp932"
+
+    monkeypatch.setattr("bottles.backend.wine.winecommand.detect_encoding", _detect)
+    monkeypatch.setattr(WineOutput, "probe_size", 16)
+    output = WineOutput(limit=1024)
+    text = "ファイル\n" * 100
+    data = text.encode("cp932")
+
+    lines = _read(output, *(data[i : i + 7] for i in range(0, len(data), 7)))
+    assert detected == [16]
+    assert lines == ["ファイル"] * 100
+    assert output.text == text
+
+
+def test_ring_buffer_is_capped():
+    output = WineOutput(limit=10)
+    lines = _read(output, b"".join(b"line%d\n" % i for i in range(100)))
+
+    assert len(lines) == 100
+    assert output.text == "line99\n"
+    assert output.truncated
+    assert _read(WineOutput(limit=4), b"a long line") == ["line"]
+
+
+def test_undecodable_output_is_escaped(monkeypatch):
+    monkeypatch.setattr(
+        "bottles.backend.wine.winecommand.detect_encoding", lambda *_: None
+    )
+    output = WineOutput(limit=1024)
+    assert _read(output, b"caf\xe9\n") == ["caf\\xe9"]
+
+
+@pytest.fixture
+def command(tmp_path, monkeypatch):
+    monkeypatch.setattr(HostCapabilities, "get", staticmethod(HostCapabilities))
+
+    def _command(cmd: str, output_limit: int = WineCommand.output_limit):
+        winecmd = WineCommand.__new__(WineCommand)
+        winecmd.config = BottleConfig(Name="Test", Path=str(tmp_path))
+        winecmd.runner = "wine"
+        winecmd.env = dict(os.environ)
+        winecmd.cwd = str(tmp_path)
+        winecmd.command = cmd
+        winecmd.terminal = False
+        winecmd.output_limit = output_limit
+        return winecmd
+
+    return _command
+
+
+def test_run_streams_lines(command):
+    seen = []
+    res = command("printf 'a\\nb\\nc\\n'", output_limit=4).run(seen.append)
+
+    assert seen == ["a", "b", "c"]
+    assert res.status
+    assert res.data == "b\nc\n"
+
+
+def test_stream_stops_early(command):
+    lines = command("yes line").stream()
+
+    assert [next(lines) for _ in range(3)] == ["line"] * 3
+    lines.close()
+
+
+def test_shell_execute_error(command):
+    res = command("echo 'ShellExecuteEx failed'").run()
+    assert not res.status
+    assert res.data == "ShellExecuteEx failed\n"
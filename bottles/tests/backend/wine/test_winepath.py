@@ -0,0 +1,102 @@
+"""Unit tests for the dosdevices based WinePath resolver"""
+
+import os
+
+import pytest
+
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.wine.winepath import WinePath, get_short_name
+
+
+@pytest.fixture
+def bottle(tmp_path, monkeypatch):
+    path = tmp_path / "bottle"
+    game = path / "drive_c/Program Files/My Game"
+    game.mkdir(parents=True)
+    (game / "Game.exe").write_bytes(b"MZ")
+    (path / "dosdevices").mkdir()
+    os.symlink("../drive_c", path / "dosdevices/c:")
+    os.symlink(str(tmp_path), path / "dosdevices/d:")
+
+    calls = []
+
+    def _convert(self, args, action_name):
+        calls.append(args)
+        return "from-wine\n"
+
+    monkeypatch.setattr(WinePath, "_WinePath__convert", _convert)
+    monkeypatch.setattr(WinePath, "_cache", {})
+    config = BottleConfig(Name="Test", Path=str(path), Custom_Path=True)
+    return WinePath(config), str(path), calls
+
+
+def test_short_names():
+    assert get_short_name("Program Files") == "PROG~FBU"
+    assert get_short_name("My Documents.lnk") == "MY_D~1EQ.LNK"
+    assert get_short_name("Game.exe") == "Game.exe"
+
+
+def test_to_unix(bottle):
+    winepath, path, calls = bottle
+    dosdevices = os.path.join(path, "dosdevices")
+
+    exe = winepath.to_unix("c:\\PROGRAM FILES\\my game\\game.EXE")
+    assert exe == f"{dosdevices}/c:/Program Files/My Game/Game.exe"
+    assert winepath.to_unix("C:\\PROG~FBU\\My Game\\") == (
+        f"{dosdevices}/c:/Program Files/My Game/"
+    )
+    # missing components are kept as they are
+    assert winepath.to_unix("C:\\program files\\New\\a.txt") == (
+        f"{dosdevices}/c:/Program Files/New/a.txt"
+    )
+    assert calls == []
+
+    # unmapped drives are left to winepath
+    assert winepath.to_unix("X:\\file") == "from-wine"
+    assert winepath.to_unix("X:\\file") == "from-wine"
+    assert calls == ["--unix 'X:\\file'"]
+
+
+def test_to_windows(bottle):
+    winepath, path, calls = bottle
+    exe = os.path.join(path, "drive_c/Program Files/My Game/Game.exe")
+    # D: maps a parent of drive_c too, the deepest drive root wins
+    assert winepath.to_windows(exe) == "C:\\Program Files\\My Game\\Game.exe"
+    assert winepath.to_windows(os.path.join(path, "dosdevices/c:")) == "C:\\"
+    assert winepath.to_windows(os.path.dirname(path)) == "D:\\"
+    assert calls == []
+
+
+def test_long_and_short(bottle):
+    winepath, _path, calls = bottle
+    assert winepath.to_short("C:\\program files\\My Game\\Game.exe") == (
+        "C:\\PROG~FBU\\MY_G~Z5G\\Game.exe"
+    )
+    assert winepath.to_long("c:\\PROG~FBU\\MY_G~Z5G\\game.exe") == (
+        "C:\\Program Files\\My Game\\Game.exe"
+    )
+    assert calls == []
+
+    # only existing paths have a long and a short form
+    assert winepath.to_long("C:\\missing") == "from-wine"
+
+
+def test_cache_follows_dosdevices(bottle):
+    winepath, path, _calls = bottle
+    assert winepath.get_drives() == {
+        "C": os.path.join(path, "dosdevices/c:"),
+        "D": os.path.join(path, "dosdevices/d:"),
+    }
+    winepath.to_unix("C:\\Program Files")
+    entries = WinePath._cache[winepath.dosdevices][2]
+    assert ("unix", "C:\\Program Files") in entries
+
+    os.remove(os.path.join(path, "dosdevices/d:"))
+    os.utime(os.path.join(path, "dosdevices"), ns=(0, 0))
+    assert "D" not in winepath.get_drives()
+    assert WinePath._cache[winepath.dosdevices][2] == {}
+
+    # every instance of the bottle shares the cache
+    other = WinePath(BottleConfig(Name="Test", Path=path, Custom_Path=True))
+    other.to_unix("C:\\Program Files")
+    assert ("unix", "C:\\Program Files") in WinePath._cache[winepath.dosdevices][2]
@@ -0,0 +1,17 @@
+import os
+
+import pytest
+
+from bottles.tests.benchmark.harness import LaunchBench
+
+
+@pytest.fixture
+def bench(tmp_path, monkeypatch):
+    """
+    Launch harness on a temporary data dir, the report is written to
+    BOTTLES_BENCHMARK_OUTPUT when set.
+    """
+    bench = LaunchBench(tmp_path, monkeypatch)
+    yield bench
+    if output := os.environ.get("BOTTLES_BENCHMARK_OUTPUT"):
+        bench.write_report(output)
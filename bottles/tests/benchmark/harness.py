@@ -0,0 +1,269 @@
+"""Launch latency harness running the backend against a stand-in wine runner"""
+
+import contextlib
+import functools
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bottles.backend.globals import Paths
+from bottles.backend.managers.journal import JournalManager
+from bottles.backend.managers.runtime import RuntimeManager
+from bottles.backend.managers.sandbox import SandboxManager
+from bottles.backend.utils.gpu import GPUUtils
+from bottles.backend.utils.host import HostCapabilities
+from bottles.backend.wine.executor import WineExecutor
+from bottles.backend.wine.reg import Reg
+from bottles.backend.wine.winecommand import WineCommand
+
+RUNNER = "bench-wine"
+
+# Paths attribute -> location relative to the temporary data dir
+_PATHS = {
+    "base": "",
+    "temp": "temp",
+    "runtimes": "runtimes",
+    "winebridge": "winebridge",
+    "runners": "runners",
+    "bottles": "bottles",
+    "steam": "steam",
+    "dxvk": "dxvk",
+    "vkd3d": "vkd3d",
+    "nvapi": "nvapi",
+    "latencyflex": "latencyflex",
+    "templates": "templates",
+    "shader_cache": "shader_cache",
+    "cab_cache": "cab_cache",
+    "download_cache": "download_cache",
+}
+
+# every stub appends its argv and environment to the log as a JSON line,
+# winepath echoes the converted path and wineboot creates the hives wine
+# would create in the prefix
+_STUB = r"""
+import json, os, sys
+
+with open(LOG, "a") as f:
+    f.write(json.dumps({"tool": TOOL, "argv": sys.argv[1:], "env": dict(os.environ)}))
+    f.write("\n")
+
+args = sys.argv[1:]
+if TOOL == "winepath":
+    args = ["winepath"] + args
+prefix = os.environ.get("WINEPREFIX", "")
+
+if args[:1] == ["winepath"] and len(args) > 1:
+    path = args[-1]
+    print("Z:" + path.replace("/", "\\") if "-w" in args else path)
+elif args[:1] == ["wineboot"] and prefix:
+    os.makedirs(os.path.join(prefix, "drive_c", "users", "bench"), exist_ok=True)
+    for name, root in (
+        ("system.reg", "Machine"),
+        ("user.reg", "User\\\\S-1-5-21-0-0-0-1000"),
+    ):
+        path = os.path.join(prefix, name)
+        if not os.path.exists(path):
+            with open(path, "w") as hive:
+                hive.write("WINE REGISTRY Version 2\n;; All keys relative to ")
+                hive.write("\\\\" + root + "\n\n#arch=win64\n")
+"""
+
+# bwrap stand-in: drop the sandbox options, apply --setenv/--chdir and
+# run the wrapped command
+_BWRAP = r"""
+import os, sys
+
+arity = {"--setenv": 2, "--ro-bind": 2, "--bind": 2, "--dev-bind": 2, "--chdir": 1}
+args = sys.argv[1:]
+env = dict(os.environ)
+while args and args[0].startswith("--"):
+    opt, n = args[0], arity.get(args[0], 0)
+    if opt == "--setenv":
+        env[args[1]] = args[2]
+    elif opt == "--chdir":
+        os.chdir(args[1])
+    args = args[1 + n:]
+os.execvpe(args[0], args, env)
+"""
+
+
+def get_stats(samples: List[float]) -> dict:
+    """Summarize durations in seconds as milliseconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "count": len(ms),
+        "total_ms": round(sum(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "min_ms": round(min(ms), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+class LaunchBench:
+    """
+    Point Paths at a temporary data dir holding a stand-in runner whose
+    wine, wineserver and winepath are stub scripts, then time the launch
+    stages (environment build, GPU and host probes, sandbox command build,
+    process spawn) of each scenario run through it.
+    """
+
+    stages = {
+        "env_build": (WineCommand, "get_env"),
+        "gpu_probe": (GPUUtils, "get_gpu"),
+        "host_probe": (HostCapabilities, "probe"),
+        "sandbox_cmd": (SandboxManager, "get_argv"),
+    }
+
+    def __init__(self, root: Path, monkeypatch):
+        self.root = root
+        self.monkeypatch = monkeypatch
+        self.log = root / "stub.log"
+        self.timings: Dict[str, Dict[str, List[float]]] = {}
+        self._scenario: Optional[str] = None
+
+        data = root / "data"
+        for attr, rel in _PATHS.items():
+            path = data / rel
+            path.mkdir(parents=True, exist_ok=True)
+            monkeypatch.setattr(Paths, attr, str(path))
+        monkeypatch.setattr(Paths, "library", str(data / "library.yml"))
+        monkeypatch.setattr(Paths, "gpu_cache", str(data / "gpu_cache.json"))
+        monkeypatch.setattr(JournalManager, "path", str(data / "journal.yml"))
+        monkeypatch.setattr(GPUUtils, "cache_path", str(data / "gpu_cache.json"))
+        monkeypatch.setattr(GPUUtils, "_cache", None)
+        monkeypatch.setattr(
+            HostCapabilities, "cache_path", str(data / "host_capabilities.json")
+        )
+        monkeypatch.setattr(HostCapabilities, "_snapshot", None)
+        monkeypatch.setattr(RuntimeManager, "_cache", {})
+        monkeypatch.setattr(WineCommand, "_env_cache", {})
+
+        self.runner = Path(Paths.runners) / RUNNER
+        bin_dir = self.runner / "bin"
+        bin_dir.mkdir(parents=True)
+        (self.runner / "lib/wine/x86_64-unix").mkdir(parents=True)
+        for tool in ("wine", "wineserver", "winepath"):
+            header = f"LOG = {str(self.log)!r}\nTOOL = {tool!r}\n"
+            self.__write_script(bin_dir / tool, header + _STUB)
+        self.__write_script(bin_dir / "bwrap", _BWRAP)
+        monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+        self.__instrument()
+
+    @staticmethod
+    def __write_script(path: Path, content: str):
+        path.write_text(f"#!{sys.executable} -IS\n{content}")
+        path.chmod(0o755)
+
+    def __instrument(self):
+        for stage, (owner, name) in self.stages.items():
+            raw = inspect.getattr_static(owner, name)
+            func = raw.__func__ if isinstance(raw, (staticmethod, classmethod)) else raw
+            timed = self.__timed(stage, func)
+            if isinstance(raw, (staticmethod, classmethod)):
+                timed = type(raw)(timed)
+            self.monkeypatch.setattr(owner, name, timed)
+
+        bench = self
+
+        class _TimedPopen(subprocess.Popen):
+            def __init__(self, *args, **kwargs):
+                with bench.stage("spawn"):
+                    super().__init__(*args, **kwargs)
+
+        self.monkeypatch.setattr(subprocess, "Popen", _TimedPopen)
+
+    def __timed(self, stage: str, func):
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            with self.stage(stage):
+                return func(*args, **kwargs)
+
+        return _wrapper
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        """Time a stage of the running scenario, nested stages are kept."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._scenario is not None:
+                elapsed = time.perf_counter() - start
+                self.timings[self._scenario].setdefault(name, []).append(elapsed)
+
+    @contextlib.contextmanager
+    def scenario(self, name: str):
+        """Time one iteration of a scenario, stages are recorded under it."""
+        self.timings.setdefault(name, {})
+        self._scenario = name
+        try:
+            with self.stage("total"):
+                yield
+        finally:
+            self._scenario = None
+
+    def calls(self, tool: Optional[str] = None) -> List[dict]:
+        """Return the invocations recorded by the stub scripts."""
+        if not self.log.exists():
+            return []
+        with open(self.log) as f:
+            calls = [json.loads(line) for line in f]
+        return [c for c in calls if tool is None or c["tool"] == tool]
+
+    def report(self) -> dict:
+        return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scenarios": {
+                scenario: {stage: get_stats(s) for stage, s in stages.items()}
+                for scenario, stages in self.timings.items()
+            },
+        }
+
+    def write_report(self, path: Optional[str] = None) -> dict:
+        """Write the JSON report to the path, or print it without one."""
+        report = self.report()
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+        else:
+            print(json.dumps(report, indent=2))
+        return report
+
+
+def run_executor(bench: LaunchBench, config, exe: str):
+    with bench.scenario("executor_run"):
+        return WineExecutor(config, exec_path=exe, program_winebridge=False).run()
+
+
+def run_command(bench: LaunchBench, config, command: str = "cmd /c ver"):
+    with bench.scenario("command_run"):
+        return WineCommand(config, command=command, minimal=True).run()
+
+
+def run_sandboxed(bench: LaunchBench, config, command: str = "cmd /c ver"):
+    config.Parameters.sandbox = True
+    try:
+        with bench.scenario("sandboxed_command_run"):
+            return WineCommand(config, command=command, minimal=True).run()
+    finally:
+        config.Parameters.sandbox = False
+
+
+def run_import_bundle(bench: LaunchBench, config, bundle: dict):
+    with bench.scenario("reg_import_bundle"):
+        return Reg(config).import_bundle(bundle)
+
+
+def run_create_bottle(bench: LaunchBench, manager, name: str):
+    with bench.scenario("create_bottle"):
+        return manager.create_bottle(name=name, environment="custom", runner=RUNNER)
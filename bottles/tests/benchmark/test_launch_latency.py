@@ -0,0 +1,113 @@
+"""Launch latency benchmark, the full run needs BOTTLES_BENCHMARK=1"""
+
+import os
+
+import pytest
+
+from bottles.backend.globals import Paths
+from bottles.backend.managers.manager import Manager
+from bottles.backend.models.config import BottleConfig
+from bottles.backend.utils.manager import ManagerUtils
+from bottles.tests.benchmark import harness
+
+BUNDLE = {
+    "HKEY_CURRENT_USER\\Software\\Wine\\Direct3D": [
+        {"value": "csmt", "data": "1", "key_type": "dword"},
+        {"value": "renderer", "data": "vulkan"},
+    ],
+    "HKEY_CURRENT_USER\\Software\\Wine\\DllOverrides": [
+        {"value": "d3d11", "data": "native,builtin"},
+    ],
+}
+
+
+class _Settings:
+    @staticmethod
+    def get_boolean(_key: str) -> bool:
+        return False
+
+    @staticmethod
+    def get_int(_key: str) -> int:
+        return 0
+
+    @staticmethod
+    def get_string(_key: str) -> str:
+        return "default"
+
+
+@pytest.fixture
+def manager(bench, monkeypatch):
+    settings = _Settings()
+    manager = Manager(g_settings=settings, check_connection=False, is_cli=True)
+    monkeypatch.setattr(manager, "settings", settings)
+    monkeypatch.setattr(manager, "runners_available", [harness.RUNNER])
+    for component in ("dxvk", "vkd3d", "nvapi", "latencyflex"):
+        monkeypatch.setattr(manager, f"{component}_available", [f"{component}-x"])
+    return manager
+
+
+@pytest.fixture
+def bottle(bench, manager):
+    res = harness.run_create_bottle(bench, manager, "Bench")
+    assert res.status
+    # caching the template strips the returned config, load it back
+    config = BottleConfig.load(f"{Paths.bottles}/Bench/bottle.yml").data
+    # the stand-in runner has no runtime to offer
+    config.Parameters.use_runtime = False
+    config.Parameters.use_eac_runtime = False
+    config.Parameters.use_be_runtime = False
+
+    exe = os.path.join(ManagerUtils.get_bottle_path(config), "drive_c", "game.exe")
+    with open(exe, "wb") as f:
+        f.write(b"MZ")
+    return config, exe
+
+
+def test_stub_runner(bench, bottle):
+    config, exe = bottle
+    prefix = ManagerUtils.get_bottle_path(config)
+    assert os.path.isfile(os.path.join(prefix, "system.reg"))
+    assert any(c["argv"][:1] == ["wineboot"] for c in bench.calls("wine"))
+
+    assert harness.run_command(bench, config, "cmd /c ver").status
+    assert harness.run_executor(bench, config, exe).status
+    assert harness.run_sandboxed(bench, config).status
+    harness.run_import_bundle(bench, config, BUNDLE)
+
+    launches = [c for c in bench.calls("wine") if c["argv"][:1] == ["cmd"]]
+    assert len(launches) == 2
+    assert all(c["env"]["WINEPREFIX"] == prefix for c in launches)
+    assert any(c["argv"][-1:] == [exe] for c in bench.calls("wine"))
+    with open(os.path.join(prefix, "user.reg")) as f:
+        assert '"renderer"="vulkan"' in f.read()
+
+    scenarios = bench.report()["scenarios"]
+    assert set(scenarios) == {
+        "create_bottle",
+        "command_run",
+        "executor_run",
+        "sandboxed_command_run",
+        "reg_import_bundle",
+    }
+    assert {"total", "env_build", "spawn"} <= set(scenarios["command_run"])
+    assert "sandbox_cmd" in scenarios["sandboxed_command_run"]
+    assert scenarios["create_bottle"]["total"]["count"] == 1
+
+
+@pytest.mark.skipif(
+    not os.environ.get("BOTTLES_BENCHMARK"), reason="set BOTTLES_BENCHMARK=1 to run"
+)
+def test_launch_latency(bench, manager, bottle):
+    config, exe = bottle
+    count = int(os.environ.get("BOTTLES_BENCHMARK_ITERATIONS", 50))
+
+    for _ in range(count):
+        harness.run_command(bench, config)
+        harness.run_executor(bench, config, exe)
+        harness.run_sandboxed(bench, config)
+        harness.run_import_bundle(bench, config, BUNDLE)
+    for i in range(min(count, 5)):
+        assert harness.run_create_bottle(bench, manager, f"Bench {i}").status
+
+    if not os.environ.get("BOTTLES_BENCHMARK_OUTPUT"):
+        bench.write_report()